@@ -1,25 +1,64 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.routing import Match
+import asyncio
+import base64
+import json
+import math
 import os
-import shutil
+import time
 from pathlib import Path
 from dotenv import load_dotenv
 import uuid
-from typing import Dict
+from typing import Callable, Dict, List, Optional
 
+from app import metrics
 from app.services.transcription import TranscriptionService
 from app.services.qa_service import QAService
 from app.services.tts_service import TTSService
-
-# Global storage for audio context (in production, use Redis or database)
-audio_context_storage: Dict[str, str] = {}
+from app.services.concurrency import BATCH, BULK, INTERACTIVE, StageExecutor, current_priority
+from app.services.admission import AdmissionController, AdmissionMiddleware, Budget
+from app.services.cache import AnswerCache, DiskCache, LRUCache, SynthesisCache, TranscriptionCache
+from app.services.streaming import iter_sentences
+from app.services.retrieval import HashingEmbedder, TranscriptIndex
+from app.services.engines import create_stt_engine, create_tts_engine
+from app.services.session_store import AppendError, SessionStore, create_session_store
+from app.services.preprocess import AudioPreprocessor, duration_seconds
+from app.services.ingest import IngestedAudio, UploadTooLarge, cleanup_uploads, ingest_upload, spill_to_disk
+from app.services.jobs import TERMINAL_STATUSES, JobRunner, JobStore
+from app.services.upstream import UpstreamClient, UpstreamError
+from app.services.voice_session import Endpointer, encode_clip
+from app.services.audio_delivery import (
+    IMMUTABLE_CACHE_CONTROL,
+    REVALIDATE_CACHE_CONTROL,
+    RangeNotSatisfiable,
+    etag_for,
+    etag_matches,
+    is_content_hashed,
+    parse_range,
+    read_range,
+    text_header,
+)
 
 # Load environment variables
 load_dotenv()
 
 app = FastAPI(title="Voice Audio Q&A API")
 
+# Admission control for the expensive endpoints (see ADMISSION_* below). Added
+# before CORS so rejections still carry CORS headers.
+app.add_middleware(
+    AdmissionMiddleware,
+    routes={
+        "/ask-question/": "question",
+        "/ask-question-stream/": "question",
+        "/ask-batch/": "batch",
+        "/upload-audio/": "upload",
+    },
+    controller=lambda: admission_controller,
+)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -29,26 +68,411 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-request stage tracing: always on when REQUEST_TRACING is set, otherwise
+# only for requests that send an X-Trace-ID header
+REQUEST_TRACING = os.getenv("REQUEST_TRACING", "false").lower() in ("1", "true", "yes")
+
+
+def route_template(request: Request) -> str:
+    """
+    Path template of the route the request matches (e.g. /jobs/{job_id}), or
+    "unmatched", so path parameters and unknown paths don't explode label cardinality
+    """
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+@app.middleware("http")
+async def observe_requests(request: Request, call_next):
+    """
+    Record request latency and in-flight counts, and return the trace ID and
+    per-stage timings (Server-Timing header) for traced requests
+    """
+    trace_id = request.headers.get("x-trace-id")
+    if trace_id is None and REQUEST_TRACING:
+        trace_id = uuid.uuid4().hex
+    token = metrics.start_trace() if trace_id else None
+
+    endpoint = route_template(request)
+    start = time.perf_counter()
+    status = 500
+    metrics.REQUESTS_IN_FLIGHT.inc(endpoint=endpoint)
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        metrics.REQUESTS_IN_FLIGHT.dec(endpoint=endpoint)
+        metrics.REQUEST_DURATION.observe(
+            time.perf_counter() - start, endpoint=endpoint, method=request.method, status=status
+        )
+        trace = metrics.end_trace(token) if token else None
+
+    if trace_id:
+        response.headers["X-Trace-ID"] = trace_id
+        if trace:
+            response.headers["Server-Timing"] = metrics.server_timing(trace)
+    return response
+
+
 # Initialize services
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 if not GROQ_API_KEY:
     raise ValueError("GROQ_API_KEY not found in environment variables. Please check your .env file")
 
 UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+OUTPUT_DIR = os.getenv("OUTPUT_DIR", "outputs")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
-os.makedirs("outputs", exist_ok=True)
+os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+# Uploads are hashed and transcribed from Starlette's spooled buffer; only
+# long-audio mode spills them to UPLOAD_DIR, which is swept periodically
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(500 * 1024 * 1024)))
+UPLOAD_RETENTION_SECONDS = float(os.getenv("UPLOAD_RETENTION_SECONDS", "3600"))
+UPLOAD_DIR_MAX_BYTES = int(os.getenv("UPLOAD_DIR_MAX_BYTES", str(1024 * 1024 * 1024)))
+UPLOAD_CLEANUP_INTERVAL_SECONDS = float(os.getenv("UPLOAD_CLEANUP_INTERVAL_SECONDS", "600"))
+
+CACHE_DIR = os.getenv("CACHE_DIR", "cache")
+TRANSCRIPTION_CACHE_MEMORY_ITEMS = int(os.getenv("TRANSCRIPTION_CACHE_MEMORY_ITEMS", "256"))
+TRANSCRIPTION_CACHE_MAX_BYTES = int(os.getenv("TRANSCRIPTION_CACHE_MAX_BYTES", str(100 * 1024 * 1024)))
+
+# Response audio: content-addressed files in OUTPUT_DIR plus a per-sentence phrase cache
+OUTPUTS_MAX_BYTES = int(os.getenv("OUTPUTS_MAX_BYTES", str(500 * 1024 * 1024)))
+TTS_CACHE_MEMORY_ITEMS = int(os.getenv("TTS_CACHE_MEMORY_ITEMS", "512"))
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+
+# Long-audio mode: files above the threshold are split and transcribed in parallel
+LONG_AUDIO_THRESHOLD_BYTES = int(os.getenv("LONG_AUDIO_THRESHOLD_BYTES", str(20 * 1024 * 1024)))
+LONG_AUDIO_SEGMENT_SECONDS = float(os.getenv("LONG_AUDIO_SEGMENT_SECONDS", "300"))
+LONG_AUDIO_OVERLAP_SECONDS = float(os.getenv("LONG_AUDIO_OVERLAP_SECONDS", "2"))
+LONG_AUDIO_PARALLELISM = int(os.getenv("LONG_AUDIO_PARALLELISM", "4"))
+
+# Retrieval: only the top-k transcript passages are sent to the LLM
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "4"))
+RETRIEVAL_EMBEDDINGS = os.getenv("RETRIEVAL_EMBEDDINGS", "false").lower() in ("1", "true", "yes")
+INDEX_CACHE_ITEMS = int(os.getenv("INDEX_CACHE_ITEMS", "128"))
+
+# Answer cache: repeated questions about the same transcript reuse the answer and its audio
+ANSWER_CACHE_ITEMS = int(os.getenv("ANSWER_CACHE_ITEMS", "1024"))
+# Cosine similarity at which a differently worded question reuses a cached answer (0 = exact matches only)
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0"))
+
+# Batch Q&A: questions are answered QA_BATCH_SIZE at a time in one LLM call each
+QA_BATCH_SIZE = int(os.getenv("QA_BATCH_SIZE", "10"))
+MAX_BATCH_QUESTIONS = int(os.getenv("MAX_BATCH_QUESTIONS", "100"))
+
+# One keep-alive connection pool shared by every Groq call in this worker, with
+# retries (jittered exponential backoff), rate limiting, hedging and a circuit breaker
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+UPSTREAM_TIMEOUT_SECONDS = float(os.getenv("UPSTREAM_TIMEOUT_SECONDS", "120"))
+UPSTREAM_MAX_ATTEMPTS = int(os.getenv("UPSTREAM_MAX_ATTEMPTS", "3"))
+UPSTREAM_BACKOFF_BASE_SECONDS = float(os.getenv("UPSTREAM_BACKOFF_BASE_SECONDS", "0.5"))
+UPSTREAM_BACKOFF_MAX_SECONDS = float(os.getenv("UPSTREAM_BACKOFF_MAX_SECONDS", "8"))
+UPSTREAM_HEDGE_AFTER_SECONDS = float(os.getenv("UPSTREAM_HEDGE_AFTER_SECONDS", "0")) or None
+UPSTREAM_RATE_LIMIT_RPS = float(os.getenv("UPSTREAM_RATE_LIMIT_RPS", "0"))
+UPSTREAM_BREAKER_FAILURES = int(os.getenv("UPSTREAM_BREAKER_FAILURES", "5"))
+UPSTREAM_BREAKER_RESET_SECONDS = float(os.getenv("UPSTREAM_BREAKER_RESET_SECONDS", "30"))
+# Per-call deadlines (retries and rate-limit waits included)
+STT_DEADLINE_SECONDS = float(os.getenv("STT_DEADLINE_SECONDS", "300"))
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "60"))
+
+# Speech engines: "groq" or "faster-whisper" for STT, "gtts" or "piper" for TTS.
+# Local engines are loaded at startup and kept warm in a pool sized by ENGINE_POOL_SIZE.
+STT_ENGINE = os.getenv("STT_ENGINE", "groq")
+TTS_ENGINE = os.getenv("TTS_ENGINE", "gtts")
+
+# Background upload jobs (?background=true): a persistent job table so queued and
+# in-flight transcriptions survive restarts, worked by JOB_WORKERS tasks per process
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", os.path.join(CACHE_DIR, "jobs.db"))
+JOB_PAYLOAD_DIR = os.getenv("JOB_PAYLOAD_DIR", os.path.join(UPLOAD_DIR, "jobs"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", str(24 * 3600)))
+JOB_EVENTS_POLL_SECONDS = float(os.getenv("JOB_EVENTS_POLL_SECONDS", "0.5"))
+os.makedirs(JOB_PAYLOAD_DIR, exist_ok=True)
+
+# Audio is trimmed, downmixed to 16 kHz mono and re-encoded (flac, opus or wav)
+# before it is sent to STT, unless that wouldn't make it smaller
+AUDIO_PREPROCESSING = os.getenv("AUDIO_PREPROCESSING", "true").lower() in ("1", "true", "yes")
+PREPROCESS_FORMAT = os.getenv("PREPROCESS_FORMAT", "flac")
+
+# Voice sessions (/ws/voice): silence that ends an utterance, and audio pending before the
+# utterance so far is transcribed at the next short pause (0 = transcribe only at the end)
+VOICE_END_SILENCE_MS = int(os.getenv("VOICE_END_SILENCE_MS", "700"))
+VOICE_CHUNK_SECONDS = float(os.getenv("VOICE_CHUNK_SECONDS", "2"))
+VOICE_MAX_UTTERANCE_SECONDS = float(os.getenv("VOICE_MAX_UTTERANCE_SECONDS", "60"))
+# Stop the current answer when the user starts speaking over it
+VOICE_BARGE_IN = os.getenv("VOICE_BARGE_IN", "true").lower() in ("1", "true", "yes")
+
+# Session store: "memory://" (single worker) or "sqlite:///path" (shared by all workers)
+SESSION_STORE_URL = os.getenv("SESSION_STORE_URL", "memory://")
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "3600"))
+SESSION_MAX_COUNT = int(os.getenv("SESSION_MAX_COUNT", "1000"))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Admission control: requests share ADMISSION_CAPACITY slots, each endpoint within its own
+# concurrency budget. Excess requests wait in a bounded per-endpoint queue, served by
+# priority (questions, then batches, then uploads) and fairly across sessions, and get
+# 503 with Retry-After when the queue is full or the wait runs out. A session may have
+# ADMISSION_SESSION_LIMIT requests running or queued (429 beyond; 0 = unlimited).
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "true").lower() in ("1", "true", "yes")
+ADMISSION_CAPACITY = int(os.getenv("ADMISSION_CAPACITY", "64"))
+ADMISSION_SESSION_LIMIT = int(os.getenv("ADMISSION_SESSION_LIMIT", "8"))
+ADMISSION_QUESTION_CONCURRENCY = int(os.getenv("ADMISSION_QUESTION_CONCURRENCY", "48"))
+ADMISSION_QUESTION_QUEUE = int(os.getenv("ADMISSION_QUESTION_QUEUE", "128"))
+ADMISSION_QUESTION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_QUESTION_MAX_WAIT_SECONDS", "10"))
+ADMISSION_BATCH_CONCURRENCY = int(os.getenv("ADMISSION_BATCH_CONCURRENCY", "4"))
+ADMISSION_BATCH_QUEUE = int(os.getenv("ADMISSION_BATCH_QUEUE", "16"))
+ADMISSION_BATCH_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_BATCH_MAX_WAIT_SECONDS", "30"))
+ADMISSION_UPLOAD_CONCURRENCY = int(os.getenv("ADMISSION_UPLOAD_CONCURRENCY", "8"))
+ADMISSION_UPLOAD_QUEUE = int(os.getenv("ADMISSION_UPLOAD_QUEUE", "32"))
+ADMISSION_UPLOAD_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_UPLOAD_MAX_WAIT_SECONDS", "30"))
 
 # Initialize services (will be created on startup)
 transcription_service = None
 qa_service = None
 tts_service = None
+stage_executor = None
+transcription_cache = None
+synthesis_cache = None
+answer_cache: Optional[AnswerCache] = None
+session_store: Optional[SessionStore] = None
+groq_http_client: Optional[UpstreamClient] = None
+upload_cleanup_task: Optional[asyncio.Task] = None
+job_store: Optional[JobStore] = None
+job_runner: Optional[JobRunner] = None
+admission_controller: Optional[AdmissionController] = None
+# Per-worker cache of passage indexes: session_id -> TranscriptIndex
+index_cache = LRUCache(INDEX_CACHE_ITEMS)
 
 @app.on_event("startup")
 async def startup_event():
-    global transcription_service, qa_service, tts_service
-    transcription_service = TranscriptionService(GROQ_API_KEY)
-    qa_service = QAService(GROQ_API_KEY)
-    tts_service = TTSService()
+    global transcription_service, qa_service, tts_service, stage_executor, transcription_cache, session_store
+    global groq_http_client, synthesis_cache, upload_cleanup_task, job_store, job_runner, answer_cache
+    global admission_controller
+    groq_http_client = UpstreamClient(
+        max_connections=UPSTREAM_MAX_CONNECTIONS,
+        timeout=UPSTREAM_TIMEOUT_SECONDS,
+        max_attempts=UPSTREAM_MAX_ATTEMPTS,
+        backoff_base=UPSTREAM_BACKOFF_BASE_SECONDS,
+        backoff_max=UPSTREAM_BACKOFF_MAX_SECONDS,
+        hedge_after=UPSTREAM_HEDGE_AFTER_SECONDS,
+        rate_limit=UPSTREAM_RATE_LIMIT_RPS,
+        breaker_failures=UPSTREAM_BREAKER_FAILURES,
+        breaker_reset_seconds=UPSTREAM_BREAKER_RESET_SECONDS,
+    )
+    transcription_cache = TranscriptionCache(
+        cache_dir=os.path.join(CACHE_DIR, "transcriptions"),
+        memory_items=TRANSCRIPTION_CACHE_MEMORY_ITEMS,
+        max_disk_bytes=TRANSCRIPTION_CACHE_MAX_BYTES,
+    )
+    transcription_service = TranscriptionService(
+        cache=transcription_cache,
+        engine=create_stt_engine(STT_ENGINE, GROQ_API_KEY, groq_http_client),
+        preprocessor=AudioPreprocessor(PREPROCESS_FORMAT) if AUDIO_PREPROCESSING else None,
+        deadline_seconds=STT_DEADLINE_SECONDS,
+    )
+    qa_service = QAService(
+        GROQ_API_KEY, top_k=RETRIEVAL_TOP_K, http_client=groq_http_client, deadline_seconds=LLM_DEADLINE_SECONDS
+    )
+    synthesis_cache = SynthesisCache(
+        cache_dir=os.path.join(OUTPUT_DIR, "phrases"),
+        memory_items=TTS_CACHE_MEMORY_ITEMS,
+        max_disk_bytes=TTS_CACHE_MAX_BYTES,
+    )
+    tts_service = TTSService(
+        output_dir=OUTPUT_DIR,
+        phrase_cache=synthesis_cache,
+        output_store=DiskCache(OUTPUT_DIR, OUTPUTS_MAX_BYTES, suffix=".mp3"),
+        engine=create_tts_engine(TTS_ENGINE),
+    )
+    stage_executor = StageExecutor()
+    session_store = create_session_store(
+        SESSION_STORE_URL,
+        ttl_seconds=SESSION_TTL_SECONDS,
+        max_sessions=SESSION_MAX_COUNT,
+        max_bytes=SESSION_MAX_BYTES,
+    )
+    session_store.add_eviction_listener(index_cache.discard)
+    answer_cache = AnswerCache(
+        max_items=ANSWER_CACHE_ITEMS,
+        embedder=HashingEmbedder(stopwords=frozenset()) if ANSWER_CACHE_SIMILARITY > 0 else None,
+        similarity_threshold=ANSWER_CACHE_SIMILARITY,
+    )
+    # Answers are dropped once no live session has the transcript they were given for
+    session_store.add_eviction_listener(answer_cache.release)
+
+    metrics.register_cache("transcription", transcription_cache.stats)
+    metrics.register_cache("tts", synthesis_cache.stats)
+    metrics.register_cache(
+        "answer", answer_cache.stats, {"exact_hit": "exact_hits", "similar_hit": "similar_hits", "miss": "misses"}
+    )
+    metrics.REGISTRY.register(metrics.CallbackGauge(
+        "voiceqa_sessions", "Sessions in the session store", (),
+        lambda: {(): session_store.stats()["sessions"]},
+    ))
+    metrics.REGISTRY.register(metrics.CallbackGauge(
+        "voiceqa_upstream_circuit_open", "1 while the circuit breaker for an upstream host is open", ("host",),
+        lambda: {
+            (host,): int(state != "closed")
+            for host, state in groq_http_client.resilient_transport.circuit_states().items()
+        },
+    ))
+    upload_cleanup_task = asyncio.ensure_future(sweep_uploads())
+
+    # Jobs left running by a previous process are re-queued once their lease expires
+    job_store = JobStore(JOB_STORE_PATH, max_attempts=JOB_MAX_ATTEMPTS)
+    job_runner = JobRunner(
+        job_store,
+        run_upload_job,
+        stage_executor,
+        workers=JOB_WORKERS,
+        lease_seconds=JOB_LEASE_SECONDS,
+        retention_seconds=JOB_RETENTION_SECONDS,
+    )
+    job_runner.start()
+    metrics.REGISTRY.register(metrics.CallbackGauge(
+        "voiceqa_jobs", "Background jobs by status", ("status",),
+        lambda: {(status,): count for status, count in job_store.counts().items()},
+    ))
+    metrics.REGISTRY.register(metrics.CallbackGauge(
+        "voiceqa_stage_queued", "Pipeline stage calls waiting for a slot", ("stage",),
+        lambda: {(stage,): waiting for stage, waiting in stage_executor.queued().items()},
+    ))
+    if ADMISSION_CONTROL:
+        admission_controller = AdmissionController(
+            {
+                "question": Budget(ADMISSION_QUESTION_CONCURRENCY, ADMISSION_QUESTION_QUEUE,
+                                   ADMISSION_QUESTION_MAX_WAIT_SECONDS, INTERACTIVE),
+                "batch": Budget(ADMISSION_BATCH_CONCURRENCY, ADMISSION_BATCH_QUEUE,
+                                ADMISSION_BATCH_MAX_WAIT_SECONDS, BATCH),
+                "upload": Budget(ADMISSION_UPLOAD_CONCURRENCY, ADMISSION_UPLOAD_QUEUE,
+                                 ADMISSION_UPLOAD_MAX_WAIT_SECONDS, BULK),
+            },
+            capacity=ADMISSION_CAPACITY,
+            session_limit=ADMISSION_SESSION_LIMIT,
+        )
+        metrics.REGISTRY.register(metrics.CallbackGauge(
+            "voiceqa_admission_requests", "Admitted (running) and queued requests per endpoint budget",
+            ("endpoint", "state"),
+            lambda: {
+                (name, state): stats[state]
+                for name, stats in admission_controller.stats()["endpoints"].items()
+                for state in ("running", "queued")
+            },
+        ))
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if upload_cleanup_task is not None:
+        upload_cleanup_task.cancel()
+    if job_runner is not None:
+        # Running jobs go back to the queue so the next process resumes them
+        await job_runner.stop()
+    if stage_executor is not None:
+        stage_executor.shutdown()
+    if groq_http_client is not None:
+        groq_http_client.close()
+
+
+def http_error(e: Exception) -> HTTPException:
+    """
+    Upstream failures keep the status chosen by the upstream layer (502/503/504,
+    with Retry-After when known), an append that can't be placed is a 409;
+    anything else is a 500
+    """
+    if isinstance(e, UpstreamError):
+        headers = {"Retry-After": str(math.ceil(e.retry_after))} if e.retry_after else None
+        return HTTPException(status_code=e.status_code, detail=str(e), headers=headers)
+    if isinstance(e, AppendError):
+        return HTTPException(status_code=409, detail=str(e))
+    return HTTPException(status_code=500, detail=str(e))
+
+
+async def sweep_uploads():
+    """
+    Periodically enforce the retention policy on UPLOAD_DIR: files older than
+    UPLOAD_RETENTION_SECONDS are deleted, then the oldest until the directory
+    fits in UPLOAD_DIR_MAX_BYTES
+    """
+    while True:
+        try:
+            await stage_executor.run(
+                "io", cleanup_uploads, UPLOAD_DIR, UPLOAD_RETENTION_SECONDS, UPLOAD_DIR_MAX_BYTES
+            )
+        except Exception as e:
+            print(f"Upload cleanup failed: {e}")
+        await asyncio.sleep(UPLOAD_CLEANUP_INTERVAL_SECONDS)
+
+
+async def ingest(upload: UploadFile, kind: str):
+    """
+    Hash and size-check an upload in chunks, raising 413 above MAX_UPLOAD_BYTES
+    """
+    try:
+        audio = await ingest_upload(upload, MAX_UPLOAD_BYTES)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    metrics.PAYLOAD_BYTES.observe(audio.size, kind=kind)
+    return audio
+
+
+async def load_session_context(session_id: str):
+    """
+    Fetch the session's transcripts and passage index, or raise 404 if the
+    session has no audio. Transcripts added since the index was built (by this
+    or another worker) are indexed on their own; the index is only rebuilt
+    when earlier transcripts were replaced.
+    """
+    transcript_ids = await stage_executor.run("io", session_store.transcript_ids, session_id)
+    if not transcript_ids:
+        raise HTTPException(
+            status_code=404,
+            detail="No audio context found for this session. Please upload an audio file first."
+        )
+
+    index = index_cache.get(session_id)
+    known = len(index.transcript_ids) if index is not None else 0
+    if index is not None and index.transcript_ids == transcript_ids[:known]:
+        if len(transcript_ids) > known:
+            added = await stage_executor.run("io", session_store.get_transcripts, session_id, known)
+            if added and added[0]["transcript_id"] == transcript_ids[known]:
+                await stage_executor.run("cpu", index.add_transcripts, added)
+            else:
+                index = None
+    else:
+        index = None
+    if index is None:
+        transcripts = await stage_executor.run("io", session_store.get_transcripts, session_id)
+        index = await stage_executor.run(
+            "cpu", TranscriptIndex.from_transcripts, transcripts, use_embeddings=RETRIEVAL_EMBEDDINGS
+        )
+        index_cache.put(session_id, index)
+
+    return index.context, index
+
+
+def answer_scope(session_id: str, index: TranscriptIndex) -> str:
+    """
+    Answer cache scope for the session's current transcripts
+    """
+    scope = AnswerCache.make_scope(index.digest, qa_service.model)
+    answer_cache.bind(session_id, scope)
+    return scope
+
+
+async def response_audio(answer_text: str, audio_file: Optional[str] = None) -> str:
+    """
+    Path of the voice answer, reusing audio_file while the output store still
+    has it. Evicted audio is synthesized again, mostly from the phrase cache.
+    """
+    if audio_file and await stage_executor.run("io", tts_service.output_store.touch, Path(audio_file).stem):
+        return audio_file
+    return await stage_executor.run("tts", tts_service.text_to_speech, answer_text)
 
 
 @app.get("/")
@@ -56,133 +480,755 @@ async def root():
     return {"message": "Voice Audio Q&A API is running"}
 
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    """
+    Prometheus metrics: stage latencies, in-flight gauges, cache hit rates,
+    upstream request/error counters and payload sizes
+    """
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/check-context/")
-async def check_context():
+async def check_context(session_id: str = Query(...)):
     """
     Check if audio context exists for the session
     """
-    session_id = "default_session"
-    has_context = session_id in audio_context_storage
+    transcripts = await stage_executor.run("io", session_store.get_transcripts, session_id)
+    has_context = bool(transcripts)
     context_preview = ""
     
     if has_context:
-        context_preview = audio_context_storage[session_id][:200] + "..."
+        context_preview = "\n\n".join(t["text"] for t in transcripts)[:200] + "..."
     
     return {
         "has_context": has_context,
         "session_id": session_id,
+        "transcript_count": len(transcripts),
         "context_preview": context_preview
     }
 
 
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    """
+    Forget every transcript stored for the session
+    """
+    await stage_executor.run("io", session_store.delete_session, session_id)
+    return {"success": True, "session_id": session_id}
+
+
+@app.get("/cache-stats/")
+async def cache_stats():
+    """
+    Report hit/miss counters for the transcription, TTS and answer caches and session store usage
+    """
+    return {
+        "transcription": transcription_cache.stats(),
+        "tts": synthesis_cache.stats(),
+        "answers": answer_cache.stats(),
+        "sessions": await stage_executor.run("io", session_store.stats),
+    }
+
+
+@app.get("/admission-stats/")
+async def admission_stats():
+    """
+    Report running and queued requests per endpoint budget and waiting calls per pipeline stage
+    """
+    return {
+        "admission": admission_controller.stats() if admission_controller is not None else None,
+        "stages_queued": stage_executor.queued(),
+    }
+
+
+ALLOWED_AUDIO_EXTENSIONS = [".mp3", ".wav", ".m4a", ".ogg", ".flac"]
+
+
+async def transcribe_and_store(
+    audio: IngestedAudio,
+    file_path: Optional[str],
+    long_audio: bool,
+    session_id: str,
+    replace: bool,
+    index: bool = True,
+    on_progress: Optional[Callable[[float], None]] = None,
+    append: bool = False,
+) -> Dict:
+    """
+    Transcribe an ingested upload, add the transcript to the session and
+    (optionally) index it. Long-audio mode needs the upload on disk at file_path.
+    With append=True the upload is the next part of the session's latest
+    recording and its timestamps are offset to follow the previous part.
+    """
+    # Measure the upload before the engine reads it, so appended parts get their real length
+    duration = await stage_executor.run("io", duration_seconds, audio.file)
+    segments = None
+    if long_audio:
+        # Segments take STT slots one by one, so STT_CONCURRENCY covers every upstream call
+        result = await transcription_service.transcribe_long_audio_staged(
+            file_path,
+            stage_executor.run,
+            segment_seconds=LONG_AUDIO_SEGMENT_SECONDS,
+            overlap_seconds=LONG_AUDIO_OVERLAP_SECONDS,
+            parallelism=LONG_AUDIO_PARALLELISM,
+            audio_sha256=audio.sha256,
+            on_progress=on_progress,
+        )
+        transcription = result["text"]
+        segments = result["segments"]
+    elif append:
+        # Appended parts need timestamps to place their passages within the whole recording
+        result = await stage_executor.run(
+            "stt", transcription_service.transcribe_file_segments, audio.file, audio.filename, audio.sha256
+        )
+        transcription = result["text"]
+        segments = result["segments"]
+    else:
+        transcription = await stage_executor.run(
+            "stt", transcription_service.transcribe_file, audio.file, audio.filename, audio.sha256
+        )
+
+    # Store the transcript in the caller's session
+    placement = {}
+    if append:
+        record = await stage_executor.run(
+            "io", session_store.append_transcript, session_id, transcription, segments, duration
+        )
+        transcript_id = record["transcript_id"]
+        segments = record["segments"]
+        placement = {"recording": record["recording"], "offset": record["offset"], "duration": record["duration"]}
+    else:
+        transcript_id = await stage_executor.run(
+            "io", session_store.add_transcript, session_id, transcription, segments, replace, duration
+        )
+
+    # Index the new transcript so questions only send relevant passages; earlier
+    # transcripts of the session are already indexed
+    if index:
+        await load_session_context(session_id)
+
+    return {
+        "file_id": audio.sha256,
+        "session_id": session_id,
+        "transcript_id": transcript_id,
+        "transcription": transcription,
+        "segments": segments,
+        **placement,
+    }
+
+
+async def run_upload_job(job: Dict, progress: Callable[[float], None]) -> Dict:
+    """
+    Job handler for background uploads; the upload was saved to the job's payload file
+    """
+    # Background transcription yields its pipeline slots to interactive requests
+    current_priority.set(BULK)
+    params = job["params"]
+    with open(job["payload_path"], "rb") as audio_file:
+        audio = IngestedAudio(audio_file, params["filename"], params["size"], params["sha256"])
+        return await transcribe_and_store(
+            audio,
+            job["payload_path"],
+            params["long_audio"],
+            params["session_id"],
+            params["replace"],
+            index=params["index"],
+            on_progress=progress,
+            append=params.get("append", False),
+        )
+
+
 @app.post("/upload-audio/")
-async def upload_audio(file: UploadFile = File(...)):
+async def upload_audio(
+    file: UploadFile = File(...),
+    long_audio: Optional[bool] = Query(
+        None,
+        description="Split the recording at silences and transcribe segments in parallel. "
+                    "Defaults to on for files above LONG_AUDIO_THRESHOLD_BYTES."
+    ),
+    session_id: Optional[str] = Query(
+        None,
+        description="Add the transcript to this session. A new session is created when omitted."
+    ),
+    replace: bool = Query(False, description="Drop the session's previous transcripts"),
+    append: bool = Query(
+        False,
+        description="Add the audio as the next part of the session's latest recording (e.g. the next "
+                    "10 minutes of a meeting); its timestamps continue where the previous part ended"
+    ),
+    background: bool = Query(
+        False,
+        description="Return a job ID at once and transcribe in the background; poll GET /jobs/{job_id}"
+    ),
+    priority: int = Query(0, description="Background jobs with higher priority run first"),
+    index: bool = Query(True, description="Index the session's transcripts after transcribing"),
+):
     """
     Upload audio file and transcribe it
     """
     try:
         # Validate file type
-        allowed_extensions = [".mp3", ".wav", ".m4a", ".ogg", ".flac"]
         file_extension = Path(file.filename).suffix.lower()
         
-        if file_extension not in allowed_extensions:
+        if file_extension not in ALLOWED_AUDIO_EXTENSIONS:
             raise HTTPException(
                 status_code=400,
-                detail=f"File type not supported. Allowed types: {', '.join(allowed_extensions)}"
+                detail=f"File type not supported. Allowed types: {', '.join(ALLOWED_AUDIO_EXTENSIONS)}"
             )
+        if append and (replace or not session_id):
+            raise HTTPException(status_code=400, detail="append needs a session_id and can't be combined with replace")
         
-        # Save uploaded file
-        file_id = str(uuid.uuid4())
-        file_path = os.path.join(UPLOAD_DIR, f"{file_id}{file_extension}")
-        
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # Hash the upload in place; the content hash doubles as the file ID
+        audio = await ingest(file, "upload")
+        if long_audio is None:
+            long_audio = audio.size > LONG_AUDIO_THRESHOLD_BYTES
+        session_id = session_id or str(uuid.uuid4())
         
-        # Transcribe audio
-        transcription = transcription_service.transcribe_audio(file_path)
+        if background:
+            # The job outlives this request (and possibly this process), so keep the audio on disk
+            job_id = str(uuid.uuid4())
+            payload_path = os.path.join(JOB_PAYLOAD_DIR, f"{job_id}{file_extension}")
+            await stage_executor.run("io", spill_to_disk, audio, payload_path)
+            params = {
+                "filename": audio.filename,
+                "size": audio.size,
+                "sha256": audio.sha256,
+                "long_audio": long_audio,
+                "session_id": session_id,
+                "replace": replace,
+                "index": index,
+                "append": append,
+            }
+            job = await stage_executor.run(
+                "io", job_store.submit, "upload", params, priority, payload_path, job_id
+            )
+            job_runner.wake()
+            return JSONResponse(status_code=202, content={
+                "success": True,
+                "job_id": job_id,
+                "status": job["status"],
+                "session_id": session_id,
+                "message": "Audio uploaded; transcription queued"
+            })
         
-        # Store in global context with a session key
-        session_id = "default_session"  # You can make this dynamic per user
-        audio_context_storage[session_id] = transcription
+        if long_audio:
+            # ffmpeg needs a path, so only long-audio mode writes the upload to disk
+            file_path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4()}{file_extension}")
+            try:
+                await stage_executor.run("io", spill_to_disk, audio, file_path)
+                result = await transcribe_and_store(
+                    audio, file_path, True, session_id, replace, index, append=append
+                )
+            finally:
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+        else:
+            result = await transcribe_and_store(audio, None, False, session_id, replace, index, append=append)
         
         return {
             "success": True,
-            "file_id": file_id,
-            "session_id": session_id,
-            "transcription": transcription,
+            **result,
             "message": "Audio uploaded and transcribed successfully"
         }
     
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
+
+
+def public_job(job: Dict) -> Dict:
+    return {key: value for key, value in job.items() if key not in ("params", "payload_path")}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Status, progress and (once finished) result or error of a background job
+    """
+    job = await stage_executor.run("io", job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return public_job(job)
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    Server-sent events with the job's state whenever its status or progress changes, until it finishes
+    """
+    job = await stage_executor.run("io", job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        current, last = job, None
+        while True:
+            state = (current["status"], current["progress"], current.get("queue_position"))
+            if state != last:
+                yield f"data: {json.dumps(public_job(current))}\n\n"
+                last = state
+            if current["status"] in TERMINAL_STATUSES:
+                break
+            await asyncio.sleep(JOB_EVENTS_POLL_SECONDS)
+            current = await stage_executor.run("io", job_store.get, job_id)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """
+    Cancel a background job. Queued jobs are cancelled at once; running jobs stop
+    shortly after and their result is discarded.
+    """
+    job = await job_runner.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return public_job(job)
 
 
 @app.post("/ask-question/")
-async def ask_question(file: UploadFile = File(...)):
+async def ask_question(
+    file: UploadFile = File(...),
+    session_id: str = Query(...),
+    audio_delivery: str = Query(
+        "link",
+        pattern="^(link|inline|stream)$",
+        description="'link' returns the audio_file to fetch from /download-response/; 'inline' also "
+                    "embeds the MP3 as base64 in audio_base64; 'stream' returns the MP3 as the response "
+                    "body with the question and answer in URL-encoded X-Question and X-Answer headers "
+                    "(left out, with X-Answer-Omitted: true, when longer than 2 KB encoded)"
+    ),
+):
     """
     Upload voice question and get voice response
     """
     try:
         # Check if audio context exists
-        session_id = "default_session"
-        if session_id not in audio_context_storage:
-            raise HTTPException(
-                status_code=400,
-                detail="No audio context found. Please upload an audio file first."
-            )
+        context, index = await load_session_context(session_id)
         
-        # Save question audio
-        question_id = str(uuid.uuid4())
-        file_extension = Path(file.filename).suffix.lower()
-        question_path = os.path.join(UPLOAD_DIR, f"question_{question_id}{file_extension}")
-        
-        with open(question_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # Transcribe question
-        question_text = transcription_service.transcribe_question(question_path)
-        
-        # Set the context for QA service
-        qa_service.set_audio_context(audio_context_storage[session_id])
-        
-        # Get answer from QA service
-        answer_text = qa_service.answer_question(question_text)
-        
-        # Convert answer to speech
-        response_audio_path = tts_service.text_to_speech(
-            answer_text,
-            f"response_{question_id}.mp3"
+        # Transcribe question straight from the upload buffer
+        question = await ingest(file, "question")
+        question_text = await stage_executor.run(
+            "stt", transcription_service.transcribe_file, question.file, question.filename, question.sha256
         )
         
-        # Clean up question file
-        os.remove(question_path)
+        # Repeated questions about the same transcript skip the LLM and TTS
+        scope = answer_scope(session_id, index)
+        cached = answer_cache.get(scope, question_text)
+        if cached is not None:
+            answer_text = cached["answer"]
+            response_audio_path = await response_audio(answer_text, cached["audio_file"])
+        else:
+            # Get answer from QA service
+            answer_text = await stage_executor.run(
+                "llm", qa_service.answer_question, question_text, context, index
+            )
+            
+            # Convert answer to speech
+            response_audio_path = await response_audio(answer_text)
+        answer_cache.put(scope, question_text, answer_text, response_audio_path)
+        metrics.PAYLOAD_BYTES.observe(os.path.getsize(response_audio_path), kind="response_audio")
         
-        return {
+        # Inline and streamed audio save the client a second round trip to /download-response/
+        if audio_delivery == "stream":
+            headers = {
+                "X-Audio-File": os.path.basename(response_audio_path),
+                "X-Answer-Cached": str(cached is not None).lower(),
+                "ETag": etag_for(response_audio_path),
+            }
+            # Texts too long for a header are left out rather than risk the response being rejected
+            for name, text in (("X-Question", question_text), ("X-Answer", answer_text)):
+                value = text_header(text)
+                if value is None:
+                    headers[f"{name}-Omitted"] = "true"
+                else:
+                    headers[name] = value
+            return FileResponse(response_audio_path, media_type="audio/mpeg", headers=headers)
+        
+        result = {
             "success": True,
             "question": question_text,
             "answer": answer_text,
-            "audio_file": response_audio_path
+            "audio_file": response_audio_path,
+            "cached": cached is not None
         }
+        if audio_delivery == "inline":
+            audio = await stage_executor.run("io", Path(response_audio_path).read_bytes)
+            result["audio_base64"] = base64.b64encode(audio).decode("ascii")
+        return result
     
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 
-@app.get("/download-response/{filename}")
-async def download_response(filename: str):
+@app.post("/ask-batch/")
+async def ask_batch(
+    session_id: str = Query(...),
+    questions: str = Form(
+        ...,
+        description='JSON list of questions, each {"text": "..."} or {"audio": "<name of an uploaded file>"}, '
+                    'with an optional "tts": true to get a voice answer for that item'
+    ),
+    files: List[UploadFile] = File([], description="Audio questions referenced by name from the questions list"),
+):
     """
-    Download the generated response audio
+    Answer many text or audio questions about one session in a single call.
+    Audio questions are transcribed concurrently; questions missing from the
+    answer cache are answered in groups that share one LLM call and one
+    context prompt.
     """
-    file_path = os.path.join("outputs", filename)
+    try:
+        items = json.loads(questions)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="questions must be a JSON list")
+    if not isinstance(items, list) or not items:
+        raise HTTPException(status_code=400, detail="questions must be a non-empty JSON list")
+    if len(items) > MAX_BATCH_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_QUESTIONS} questions per batch")
+
+    uploads = {upload.filename: upload for upload in files}
+    for i, item in enumerate(items):
+        if not isinstance(item, dict) or not (
+            isinstance(item.get("text"), str) or (isinstance(item.get("audio"), str) and item["audio"] in uploads)
+        ):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Question {i} needs a 'text' or an 'audio' naming one of the uploaded files"
+            )
+
+    context, index = await load_session_context(session_id)
+
+    try:
+        async def transcribe(upload: UploadFile):
+            audio = await ingest(upload, "question")
+            return await stage_executor.run(
+                "stt", transcription_service.transcribe_file, audio.file, audio.filename, audio.sha256
+            )
+
+        # Transcribe every referenced upload once, all at the same time
+        names = list(dict.fromkeys(item["audio"] for item in items if not isinstance(item.get("text"), str)))
+        transcripts = dict(zip(names, await asyncio.gather(*(transcribe(uploads[name]) for name in names))))
+        texts = [item["text"] if isinstance(item.get("text"), str) else transcripts[item["audio"]] for item in items]
+
+        scope = answer_scope(session_id, index)
+        cached = [answer_cache.get(scope, text) for text in texts]
+        # Each distinct uncached question is asked once
+        pending = list(dict.fromkeys(
+            AnswerCache.normalize_question(text) for text, hit in zip(texts, cached) if hit is None
+        ))
+        originals = {AnswerCache.normalize_question(text): text for text in texts}
+        groups = [pending[i:i + QA_BATCH_SIZE] for i in range(0, len(pending), QA_BATCH_SIZE)]
+        grouped_answers = await asyncio.gather(*(
+            stage_executor.run("llm", qa_service.answer_questions, [originals[q] for q in group], context, index)
+            for group in groups
+        ))
+        fresh = dict(zip(pending, (answer for group, _ in grouped_answers for answer in group)))
+        answers = [
+            hit["answer"] if hit is not None else fresh[AnswerCache.normalize_question(text)]
+            for text, hit in zip(texts, cached)
+        ]
+
+        async def voice(item, answer, hit):
+            if not item.get("tts"):
+                return None
+            return await response_audio(answer, hit["audio_file"] if hit is not None else None)
+
+        audio_files = await asyncio.gather(*(
+            voice(item, answer, hit) for item, answer, hit in zip(items, answers, cached)
+        ))
+        for text, answer, audio_file in zip(texts, answers, audio_files):
+            answer_cache.put(scope, text, answer, audio_file)
+
+        return {
+            "success": True,
+            "session_id": session_id,
+            # Groups with malformed answers fall back to one call per question
+            "llm_calls": sum(calls for _, calls in grouped_answers),
+            "results": [
+                {"question": text, "answer": answer, "audio_file": audio_file, "cached": hit is not None}
+                for text, answer, audio_file, hit in zip(texts, answers, audio_files, cached)
+            ],
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise http_error(e)
+
+
+async def synthesized_sentences(
+    question_text: str, context: str, index: Optional[TranscriptIndex], scope: Optional[str] = None
+):
+    """
+    Stream the answer sentence by sentence, yielding (sentence, mp3_bytes).
+    Each sentence is sent to TTS as soon as the LLM finishes it, so synthesis
+    of one sentence overlaps generation of the next. With an answer cache
+    scope, a cached answer is replayed instead of calling the LLM and its
+    sentences come from the phrase cache.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    cached = answer_cache.get(scope, question_text) if scope is not None else None
+
+    async def enqueue(sentence: str):
+        audio = asyncio.ensure_future(stage_executor.run("tts", tts_service.synthesize, sentence))
+        await queue.put((sentence, audio))
+
+    async def produce():
+        try:
+            if cached is not None:
+                for sentence in iter_sentences([cached["answer"]]):
+                    await enqueue(sentence)
+                return
+            answer = []
+            sentences = iter_sentences(qa_service.stream_answer(question_text, context, index))
+            async for sentence in stage_executor.iterate("llm", sentences):
+                answer.append(sentence)
+                await enqueue(sentence)
+            if scope is not None:
+                answer_cache.put(scope, question_text, " ".join(answer))
+        finally:
+            await queue.put(None)
+
+    producer = asyncio.ensure_future(produce())
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            sentence, audio = item
+            yield sentence, await audio
+        # Surface any error raised while generating the answer
+        await producer
+    finally:
+        producer.cancel()
+
+
+@app.post("/ask-question-stream/")
+async def ask_question_stream(
+    file: UploadFile = File(...),
+    session_id: str = Query(...),
+    response_format: str = Query(
+        "audio",
+        pattern="^(audio|ndjson)$",
+        description="'audio' streams raw MP3 chunks; 'ndjson' streams one JSON object per sentence "
+                    "with its text and base64 MP3 audio"
+    ),
+):
+    """
+    Upload voice question and stream the voice response sentence by sentence
+    """
+    context, index = await load_session_context(session_id)
+    scope = answer_scope(session_id, index)
+
+    question = await ingest(file, "question")
+    try:
+        question_text = await stage_executor.run(
+            "stt", transcription_service.transcribe_file, question.file, question.filename, question.sha256
+        )
+    except Exception as e:
+        raise http_error(e)
+
+    async def audio_body():
+        async for _, audio in synthesized_sentences(question_text, context, index, scope):
+            yield audio
+
+    async def ndjson_body():
+        yield json.dumps({"question": question_text}) + "\n"
+        async for sentence, audio in synthesized_sentences(question_text, context, index, scope):
+            yield json.dumps({
+                "sentence": sentence,
+                "audio": base64.b64encode(audio).decode("ascii"),
+            }) + "\n"
+
+    if response_format == "ndjson":
+        return StreamingResponse(ndjson_body(), media_type="application/x-ndjson")
+    question_header = text_header(question_text)
+    headers = {"X-Question": question_header} if question_header is not None else {"X-Question-Omitted": "true"}
+    return StreamingResponse(audio_body(), media_type="audio/mpeg", headers=headers)
+
+
+@app.websocket("/ws/voice")
+async def voice_session(
+    websocket: WebSocket,
+    session_id: str = Query(...),
+    sample_rate: int = Query(16000, ge=8000, le=48000),
+):
+    """
+    Full-duplex voice session. The client streams microphone audio as binary
+    messages of 16-bit mono little-endian PCM at sample_rate (8-48 kHz; other
+    rates are refused with close code 1008); the server finds
+    the end of each utterance, transcribes it while the user is still speaking
+    and streams the answer back while continuing to listen.
+
+    Server messages are JSON text frames: {"type": "ready"}, {"type": "speech_start"},
+    {"type": "partial", "text"} as parts of the utterance are transcribed,
+    {"type": "question", "text", "speech_end"} (seconds into the stream),
+    {"type": "sentence", "text"} each followed by one binary frame of MP3 audio,
+    {"type": "answer_end", "answer"}, {"type": "interrupted"} when the user talks
+    over an answer and {"type": "error", "status", "detail"}.
+    The client may send {"type": "end"} to end the utterance at once (push-to-talk)
+    or {"type": "close"}.
+    """
+    await websocket.accept()
+    try:
+        await load_session_context(session_id)
+    except HTTPException as e:
+        await websocket.send_json({"type": "error", "status": e.status_code, "detail": e.detail})
+        await websocket.close(code=1008)
+        return
+
+    endpointer = Endpointer(
+        sample_rate,
+        end_silence_ms=VOICE_END_SILENCE_MS,
+        chunk_seconds=VOICE_CHUNK_SECONDS,
+        max_utterance_seconds=VOICE_MAX_UTTERANCE_SECONDS,
+    )
+    # A sentence and its audio frame must not be split by another message
+    send_lock = asyncio.Lock()
+    # Transcripts of the current utterance's chunks, in order
+    chunks: List[asyncio.Future] = []
+    answering: Optional[asyncio.Task] = None
+
+    async def send_pair(message: Dict, audio: Optional[bytes]):
+        async with send_lock:
+            await websocket.send_json(message)
+            if audio is not None:
+                await websocket.send_bytes(audio)
+
+    async def send(message: Dict, audio: Optional[bytes] = None):
+        # Cancelling an answer must not leave a sentence without its audio
+        await asyncio.shield(send_pair(message, audio))
+
+    async def send_error(e: Exception):
+        error = e if isinstance(e, HTTPException) else http_error(e)
+        await send({"type": "error", "status": error.status_code, "detail": error.detail})
+
+    async def transcribe(samples, utterance: Optional[List[asyncio.Future]]) -> str:
+        """
+        Transcribe part of an utterance; with the utterance's chunk list, also
+        report the text transcribed so far
+        """
+        clip = await stage_executor.run("cpu", encode_clip, samples, sample_rate)
+        text = (await stage_executor.run("stt", transcription_service.transcribe_clip, clip, "utterance.flac")).strip()
+        if utterance is not None:
+            done = []
+            for chunk in list(utterance):
+                if chunk is asyncio.current_task():
+                    done.append(text)
+                elif chunk.done() and not chunk.cancelled() and chunk.exception() is None:
+                    done.append(chunk.result())
+                else:
+                    break
+            await send({"type": "partial", "text": " ".join(t for t in done if t)})
+        return text
+
+    async def answer(utterance: List[asyncio.Future], speech_end: float, detected_at: float):
+        try:
+            question_text = " ".join(t for t in await asyncio.gather(*utterance) if t)
+            if not question_text:
+                return
+            await send({"type": "question", "text": question_text, "speech_end": speech_end})
+            metrics.VOICE_RESPONSE_LATENCY.observe(time.perf_counter() - detected_at, event="question")
+
+            context, index = await load_session_context(session_id)
+            scope = answer_scope(session_id, index)
+            sentences = []
+            async for sentence, audio in synthesized_sentences(question_text, context, index, scope):
+                if not sentences:
+                    metrics.VOICE_RESPONSE_LATENCY.observe(time.perf_counter() - detected_at, event="first_audio")
+                sentences.append(sentence)
+                await send({"type": "sentence", "text": sentence}, audio)
+            await send({"type": "answer_end", "answer": " ".join(sentences)})
+        except asyncio.CancelledError:
+            raise
+        except WebSocketDisconnect:
+            pass
+        except Exception as e:
+            await send_error(e)
+
+    with metrics.VOICE_SESSIONS.track_inprogress():
+        try:
+            await send({"type": "ready"})
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes") is not None:
+                    events = endpointer.feed(message["bytes"])
+                else:
+                    try:
+                        control = json.loads(message.get("text") or "{}")
+                    except ValueError:
+                        control = {}
+                    if control.get("type") == "close":
+                        break
+                    events = endpointer.flush() if control.get("type") == "end" else []
+
+                for kind, samples, seconds in events:
+                    if kind == "speech_start":
+                        if VOICE_BARGE_IN and answering is not None and not answering.done():
+                            answering.cancel()
+                            await send({"type": "interrupted"})
+                        await send({"type": "speech_start"})
+                    elif kind == "chunk":
+                        chunks.append(asyncio.ensure_future(transcribe(samples, chunks)))
+                    else:
+                        if samples is not None:
+                            chunks.append(asyncio.ensure_future(transcribe(samples, None)))
+                        if answering is not None and not answering.done():
+                            answering.cancel()
+                        answering = asyncio.ensure_future(answer(chunks, seconds, time.perf_counter()))
+                        chunks = []
+        except WebSocketDisconnect:
+            pass
+        finally:
+            for task in chunks + ([answering] if answering is not None else []):
+                task.cancel()
+
+
+@app.api_route("/download-response/{filename}", methods=["GET", "HEAD"])
+async def download_response(filename: str, request: Request):
+    """
+    Download the generated response audio. Response files are named after a
+    hash of their content, so they are served with a strong ETag and cached
+    for a year; conditional requests get 304 and single byte ranges get 206.
+    """
+    file_path = os.path.join(OUTPUT_DIR, filename)
     
-    if not os.path.exists(file_path):
+    if os.path.basename(filename) != filename or filename.startswith(".") or not os.path.isfile(file_path):
         raise HTTPException(status_code=404, detail="File not found")
     
-    return FileResponse(
-        file_path,
-        media_type="audio/mpeg",
-        filename=filename
-    )
+    etag = await stage_executor.run("io", etag_for, file_path)
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if is_content_hashed(filename) else REVALIDATE_CACHE_CONTROL,
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    
+    # A stale If-Range validator means the client's partial copy is outdated: send everything
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    if if_range is None or if_range.strip() == etag:
+        size = os.path.getsize(file_path)
+        try:
+            byte_range = parse_range(request.headers.get("range"), size)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+    
+    if byte_range is None:
+        return FileResponse(file_path, media_type="audio/mpeg", filename=filename, headers=headers)
+    
+    start, end = byte_range
+    body = await stage_executor.run("io", read_range, file_path, start, end)
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return Response(body, status_code=206, media_type="audio/mpeg", headers=headers)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,268 @@
+"""
+Minimal Prometheus-format metrics and per-request stage tracing.
+"""
+import contextvars
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+BYTE_BUCKETS = (1024, 16 * 1024, 64 * 1024, 256 * 1024, 1024 ** 2, 4 * 1024 ** 2, 16 * 1024 ** 2, 64 * 1024 ** 2)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    @abstractmethod
+    def _samples(self) -> List[str]:
+        pass
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in items]
+
+
+class CallbackGauge(_Metric):
+    """
+    Gauge whose values are read from a callback at scrape time.
+    The callback returns {label_value_tuple: value}.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), callback: Callable[[], Dict] = None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def _samples(self):
+        try:
+            values = self.callback() or {}
+        except Exception:
+            return []
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in values.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # label key -> [bucket counts..., sum, count]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self):
+        with self._lock:
+            items = [(key, list(state)) for key, state in self._values.items()]
+        lines = []
+        for key, state in items:
+            for bound, count in zip(self.buckets, state):
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {state[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        # Re-registering a name replaces the old metric (e.g. caches rebuilt on restart)
+        self._metrics = [m for m in self._metrics if m.name != metric.name]
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_DURATION = REGISTRY.register(Histogram(
+    "voiceqa_request_duration_seconds", "HTTP request latency", ("endpoint", "method", "status")))
+REQUESTS_IN_FLIGHT = REGISTRY.register(Gauge(
+    "voiceqa_requests_in_flight", "HTTP requests currently being handled", ("endpoint",)))
+STAGE_DURATION = REGISTRY.register(Histogram(
+    "voiceqa_stage_duration_seconds", "Time spent in a pipeline stage call", ("stage", "operation")))
+STAGE_WAIT = REGISTRY.register(Histogram(
+    "voiceqa_stage_wait_seconds", "Time spent waiting for a free slot in a pipeline stage", ("stage",)))
+STAGE_IN_FLIGHT = REGISTRY.register(Gauge(
+    "voiceqa_stage_in_flight", "Pipeline stage calls currently running", ("stage",)))
+PAYLOAD_BYTES = REGISTRY.register(Histogram(
+    "voiceqa_payload_bytes", "Size of uploaded audio and generated response audio", ("kind",), buckets=BYTE_BUCKETS))
+VOICE_RESPONSE_LATENCY = REGISTRY.register(Histogram(
+    "voiceqa_voice_response_latency_seconds",
+    "Time from the detected end of an utterance on a voice session to the given response event", ("event",)))
+VOICE_SESSIONS = REGISTRY.register(Gauge(
+    "voiceqa_voice_sessions", "Open voice session WebSockets"))
+ADMISSION_WAIT = REGISTRY.register(Histogram(
+    "voiceqa_admission_wait_seconds", "Time admitted requests spent queued for capacity", ("endpoint",)))
+ADMISSION_REJECTIONS = REGISTRY.register(Counter(
+    "voiceqa_admission_rejections_total",
+    "Requests turned away by admission control (session_limit, queue_full or timeout)", ("endpoint", "reason")))
+UPSTREAM_REQUESTS = REGISTRY.register(Counter(
+    "voiceqa_upstream_requests_total", "HTTP request attempts made to upstream APIs", ("host", "status")))
+UPSTREAM_RETRIES = REGISTRY.register(Counter(
+    "voiceqa_upstream_retries_total",
+    "Upstream attempts retried after a connection error or a 408, 409, 429 or 5xx response", ("host",)))
+UPSTREAM_HEDGES = REGISTRY.register(Counter(
+    "voiceqa_upstream_hedges_total", "Duplicate requests sent because the first was slow", ("host",)))
+UPSTREAM_ERRORS = REGISTRY.register(Counter(
+    "voiceqa_upstream_errors_total", "Upstream calls that failed after retries", ("service", "error")))
+
+
+CACHE_RESULTS = {"memory_hit": "memory_hits", "disk_hit": "disk_hits", "miss": "misses"}
+
+
+def register_cache(name: str, stats: Callable[[], Dict], results: Dict[str, str] = CACHE_RESULTS):
+    """
+    Expose a cache's stats() dict (hits, misses, hit_rate) as gauges.
+    results maps each lookup result label to its counter in stats().
+    """
+    def lookups():
+        s = stats()
+        return {(result,): s[field] for result, field in results.items()}
+
+    REGISTRY.register(CallbackGauge(
+        f"voiceqa_{name}_cache_lookups", f"Lookups in the {name} cache by result", ("result",), lookups))
+    REGISTRY.register(CallbackGauge(
+        f"voiceqa_{name}_cache_hit_ratio", f"Hit ratio of the {name} cache", (), lambda: {(): stats()["hit_rate"]}))
+
+
+# Per-request trace: list of (stage, operation, seconds) for the current request, if tracing
+_current_trace: contextvars.ContextVar[Optional[List[Tuple[str, str, float]]]] = contextvars.ContextVar(
+    "voiceqa_trace", default=None
+)
+
+
+def start_trace() -> contextvars.Token:
+    return _current_trace.set([])
+
+
+def end_trace(token: contextvars.Token) -> List[Tuple[str, str, float]]:
+    trace = _current_trace.get() or []
+    _current_trace.reset(token)
+    return trace
+
+
+def record_stage(stage: str, operation: str, seconds: float):
+    STAGE_DURATION.observe(seconds, stage=stage, operation=operation)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.append((stage, operation, seconds))
+
+
+def server_timing(trace: List[Tuple[str, str, float]]) -> str:
+    """
+    Format a trace as a Server-Timing header value
+    """
+    return ", ".join(
+        f'{stage}-{i};dur={seconds * 1000:.1f};desc="{operation}"'
+        for i, (stage, operation, seconds) in enumerate(trace)
+    )
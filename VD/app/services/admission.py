@@ -0,0 +1,237 @@
+"""
+Admission control for API requests: per-endpoint concurrency budgets with
+bounded wait queues, a per-session budget, and a shared capacity that is
+handed to queued requests in priority order.
+"""
+import asyncio
+import itertools
+import math
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+from urllib.parse import parse_qs
+
+from starlette.responses import JSONResponse
+
+from app.metrics import ADMISSION_REJECTIONS, ADMISSION_WAIT
+from app.services.concurrency import current_priority
+
+
+@dataclass
+class Budget:
+    """
+    Limits for one class of endpoint. Requests beyond concurrency wait in a
+    queue of at most queue_size for up to max_wait_seconds.
+    """
+    concurrency: int
+    queue_size: int
+    max_wait_seconds: float
+    priority: int
+
+
+class Rejected(Exception):
+    """
+    The request was not admitted: 429 when the session is over its budget,
+    503 when the server is overloaded
+    """
+
+    def __init__(self, status_code: int, reason: str, retry_after: float):
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+        super().__init__(reason)
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Retry-After": str(max(1, math.ceil(self.retry_after)))}
+
+
+class _Class:
+    def __init__(self, budget: Budget):
+        self.budget = budget
+        self.running = 0
+        self.queued = 0
+        # Moving averages used to estimate Retry-After
+        self.service_seconds = 1.0
+        self.wait_seconds = 0.0
+
+    def retry_after(self) -> float:
+        """
+        Rough time until a newly queued request would start
+        """
+        return (self.queued + 1) * self.service_seconds / max(1, self.budget.concurrency)
+
+
+class _Waiter:
+    def __init__(self, name: str, key: tuple):
+        self.name = name
+        self.key = key
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class AdmissionController:
+    """
+    A request is admitted while the total in flight is under capacity, its
+    class is under its concurrency budget and its session is under
+    session_limit (running and queued requests combined). Freed slots go to
+    queued requests by class priority, then to the session with the fewest
+    requests waiting or in flight, so one busy session can't crowd out the
+    others.
+    """
+
+    def __init__(self, budgets: Dict[str, Budget], capacity: int, session_limit: int = 0):
+        self.classes = {name: _Class(budget) for name, budget in budgets.items()}
+        self.capacity = capacity
+        self.session_limit = session_limit
+        self.running = 0
+        self._sessions: Dict[str, int] = {}
+        self._waiters: List[_Waiter] = []
+        self._order = itertools.count()
+
+    def _has_room(self, cls: _Class) -> bool:
+        return self.running < self.capacity and cls.running < cls.budget.concurrency
+
+    def _start(self, name: str):
+        self.running += 1
+        self.classes[name].running += 1
+
+    async def acquire(self, name: str, session: Optional[str] = None):
+        """
+        Wait for a slot in the given class, raising Rejected when the request
+        should be turned away. Returns a token to pass to release().
+        """
+        cls = self.classes[name]
+        if session is not None and self.session_limit and self._sessions.get(session, 0) >= self.session_limit:
+            ADMISSION_REJECTIONS.inc(endpoint=name, reason="session_limit")
+            raise Rejected(429, "Too many concurrent requests for this session", cls.service_seconds)
+
+        load = self._sessions.get(session, 0) if session is not None else 0
+        if session is not None:
+            self._sessions[session] = load + 1
+        queued_at = time.perf_counter()
+        try:
+            await self._admit(name, load)
+        except BaseException:
+            self._leave(session)
+            raise
+        waited = time.perf_counter() - queued_at
+        ADMISSION_WAIT.observe(waited, endpoint=name)
+        cls.wait_seconds = 0.9 * cls.wait_seconds + 0.1 * waited
+        return name, session, time.perf_counter()
+
+    async def _admit(self, name: str, load: int):
+        cls = self.classes[name]
+        if not self._waiters and self._has_room(cls):
+            self._start(name)
+            return
+        if cls.queued >= cls.budget.queue_size:
+            ADMISSION_REJECTIONS.inc(endpoint=name, reason="queue_full")
+            raise Rejected(503, "Server is busy, please retry later", cls.retry_after())
+
+        waiter = _Waiter(name, (cls.budget.priority, load, next(self._order)))
+        self._waiters.append(waiter)
+        cls.queued += 1
+        # Queued requests may only be blocked by other classes' budgets
+        self._dispatch()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), cls.budget.max_wait_seconds)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.future.done():
+                # Admitted just as the wait ended; give the slot back
+                self._finish(name)
+                self._dispatch()
+            else:
+                waiter.future.cancel()
+                self._waiters.remove(waiter)
+                cls.queued -= 1
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            ADMISSION_REJECTIONS.inc(endpoint=name, reason="timeout")
+            raise Rejected(503, "Timed out waiting for capacity, please retry later", cls.retry_after())
+
+    def release(self, token: tuple):
+        name, session, started = token
+        cls = self.classes[name]
+        cls.service_seconds = 0.9 * cls.service_seconds + 0.1 * (time.perf_counter() - started)
+        self._leave(session)
+        self._finish(name)
+        self._dispatch()
+
+    def _leave(self, session: Optional[str]):
+        if session is not None:
+            remaining = self._sessions.pop(session) - 1
+            if remaining:
+                self._sessions[session] = remaining
+
+    def _finish(self, name: str):
+        self.running -= 1
+        self.classes[name].running -= 1
+
+    def _dispatch(self):
+        """
+        Start queued requests, best first, while there is room
+        """
+        for waiter in sorted(self._waiters, key=lambda w: w.key):
+            if self.running >= self.capacity:
+                break
+            cls = self.classes[waiter.name]
+            if cls.running < cls.budget.concurrency:
+                self._waiters.remove(waiter)
+                cls.queued -= 1
+                self._start(waiter.name)
+                waiter.future.set_result(None)
+
+    def stats(self) -> Dict:
+        return {
+            "capacity": self.capacity,
+            "running": self.running,
+            "endpoints": {
+                name: {
+                    "running": cls.running,
+                    "queued": cls.queued,
+                    "concurrency": cls.budget.concurrency,
+                    "queue_size": cls.budget.queue_size,
+                    "priority": cls.budget.priority,
+                    "avg_wait_ms": cls.wait_seconds * 1000,
+                    "avg_service_ms": cls.service_seconds * 1000,
+                }
+                for name, cls in self.classes.items()
+            },
+        }
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware applying an AdmissionController to the listed routes
+    (path -> budget name). The slot is held until the whole response, streamed
+    bodies included, has been sent, and the route's priority is applied to
+    the pipeline stages the request runs. controller() returns None while
+    admission control is off or the app hasn't started.
+    """
+
+    def __init__(self, app, routes: Dict[str, str], controller: Callable[[], Optional[AdmissionController]]):
+        self.app = app
+        self.routes = routes
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        name = self.routes.get(scope["path"]) if scope["type"] == "http" else None
+        controller = self.controller() if name is not None else None
+        if controller is None:
+            await self.app(scope, receive, send)
+            return
+
+        session = parse_qs(scope["query_string"].decode("latin-1")).get("session_id", [None])[0]
+        try:
+            token = await controller.acquire(name, session)
+        except Rejected as e:
+            response = JSONResponse({"detail": e.reason}, status_code=e.status_code, headers=e.headers)
+            await response(scope, receive, send)
+            return
+
+        priority = current_priority.set(controller.classes[name].budget.priority)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_priority.reset(priority)
+            controller.release(token)
@@ -0,0 +1,90 @@
+"""
+HTTP caching and byte-range helpers for serving response audio files.
+"""
+import os
+import re
+from typing import Optional, Tuple
+from urllib.parse import quote
+
+
+# Response files in the output store are named after a hash of their audio
+_CONTENT_HASHED = re.compile(r"^[0-9a-f]{32}\.mp3$")
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Proxies and servers commonly cap all headers together at 8 KB
+MAX_TEXT_HEADER_BYTES = 2048
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def is_content_hashed(filename: str) -> bool:
+    return bool(_CONTENT_HASHED.match(filename))
+
+
+def text_header(text: str, limit: int = MAX_TEXT_HEADER_BYTES) -> Optional[str]:
+    """
+    URL-encoded text for a response header, or None when it is too long to send safely
+    """
+    encoded = quote(text)
+    return encoded if len(encoded) <= limit else None
+
+
+def etag_for(path: str) -> str:
+    """
+    Strong ETag: the content hash for content-hashed files, otherwise derived
+    from the size and modification time
+    """
+    name = os.path.basename(path)
+    if is_content_hashed(name):
+        return f'"{name[:32]}"'
+    stat = os.stat(path)
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    If-None-Match comparison (weak comparison, as RFC 9110 requires for it)
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range Range header into inclusive (start, end) byte offsets.
+    Returns None when the whole file should be sent (no header, a malformed
+    header or several ranges) and raises RangeNotSatisfiable when the range
+    lies outside the file.
+    """
+    if not header:
+        return None
+    match = _RANGE.match(header.strip())
+    if match is None or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.groups()
+    if first == "":
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiable
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise RangeNotSatisfiable
+    return start, end
+
+
+def read_range(path: str, start: int, end: int) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(start)
+        return f.read(end - start + 1)
@@ -0,0 +1,396 @@
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+
+def sha256_file(fileobj, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Hash a binary file object in chunks from the start, leaving it rewound
+    """
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    for chunk in iter(lambda: fileobj.read(chunk_size), b""):
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+class LRUCache:
+    """
+    Thread-safe in-memory LRU cache with a fixed number of entries
+    """
+
+    def __init__(self, max_items: int = 256):
+        self.max_items = max_items
+        self._data: "OrderedDict[str, object]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key: str, value):
+        if self.max_items <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+
+    def discard(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DiskCache:
+    """
+    Directory of files addressed by key, bounded by total size in bytes.
+    Least recently used files (by modification time, refreshed on read) are evicted first.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int, suffix: str = ""):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._total_bytes = sum(size for _, _, size in self._entries())
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}{self.suffix}")
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if self.suffix and not name.endswith(self.suffix):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, path, stat.st_size))
+        return entries
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self.path_for(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        # Refresh the modification time so the entry counts as recently used
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return data
+
+    def contains(self, key: str) -> bool:
+        return os.path.exists(self.path_for(key))
+
+    def touch(self, key: str) -> bool:
+        """
+        Mark an entry as recently used; returns False if it does not exist
+        """
+        try:
+            os.utime(self.path_for(key))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def put(self, key: str, data: bytes) -> str:
+        path = self.path_for(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        with self._lock:
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            self._total_bytes += len(data) - previous
+            if self._total_bytes > self.max_bytes:
+                self._evict(keep=path)
+        return path
+
+    def _evict(self, keep: str = None):
+        entries = sorted(self._entries())
+        total = sum(size for _, _, size in entries)
+        for _, path, size in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+        self._total_bytes = total
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+
+class TranscriptionCache:
+    """
+    Two-tier transcription cache keyed by a hash of the audio bytes and
+    the transcription parameters (model, language).
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = "cache/transcriptions",
+        memory_items: int = 256,
+        max_disk_bytes: int = 100 * 1024 * 1024,
+    ):
+        self.memory = LRUCache(memory_items)
+        self.disk = DiskCache(cache_dir, max_disk_bytes, suffix=".txt")
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(audio_sha256: str, model: str, language: str) -> str:
+        """
+        Cache key from the SHA-256 of the audio bytes (see sha256_file) and the parameters
+        """
+        return hashlib.sha256(f"{model}|{language}|{audio_sha256}".encode("utf-8")).hexdigest()
+
+    @classmethod
+    def make_file_key(cls, audio_file_path: str, model: str, language: str) -> str:
+        with open(audio_file_path, "rb") as f:
+            return cls.make_key(sha256_file(f), model, language)
+
+    def get(self, key: str) -> Optional[str]:
+        text = self.memory.get(key)
+        if text is not None:
+            self.memory_hits += 1
+            return text
+
+        data = self.disk.get(key)
+        if data is not None:
+            self.disk_hits += 1
+            text = data.decode("utf-8")
+            self.memory.put(key, text)
+            return text
+
+        self.misses += 1
+        return None
+
+    def put(self, key: str, text: str):
+        self.memory.put(key, text)
+        self.disk.put(key, text.encode("utf-8"))
+
+    def stats(self) -> dict:
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "memory_entries": len(self.memory),
+            "disk_bytes": self.disk.total_bytes,
+        }
+
+
+class SynthesisCache:
+    """
+    Two-tier cache of synthesized speech keyed by normalized text, language and voice.
+    Used per sentence, so phrases shared between answers are synthesized only once.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = "outputs/phrases",
+        memory_items: int = 512,
+        max_disk_bytes: int = 200 * 1024 * 1024,
+    ):
+        self.memory = LRUCache(memory_items)
+        self.disk = DiskCache(cache_dir, max_disk_bytes, suffix=".mp3")
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text)).strip()
+
+    @classmethod
+    def make_key(cls, text: str, language: str, voice: str) -> str:
+        payload = f"{language}|{voice}|{cls.normalize_text(text)}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[bytes]:
+        audio = self.memory.get(key)
+        if audio is not None:
+            self.memory_hits += 1
+            return audio
+
+        audio = self.disk.get(key)
+        if audio is not None:
+            self.disk_hits += 1
+            self.memory.put(key, audio)
+            return audio
+
+        self.misses += 1
+        return None
+
+    def put(self, key: str, audio: bytes):
+        self.memory.put(key, audio)
+        self.disk.put(key, audio)
+
+    def stats(self) -> dict:
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "memory_entries": len(self.memory),
+            "disk_bytes": self.disk.total_bytes,
+        }
+
+
+class AnswerCache:
+    """
+    In-memory cache of answers (text and the response audio file) keyed by a
+    hash of the transcript context and the normalized question, so repeated
+    questions about the same recording skip the LLM and TTS.
+
+    With an embedder (anything with embed(texts) -> L2-normalised rows), a
+    question whose embedding has cosine similarity >= similarity_threshold
+    with a cached question about the same transcript is also a hit.
+
+    Scopes are reference-counted by session: bind() ties a session to the
+    scope it asked about, and release() (an eviction listener on the session
+    store) drops the scope's answers once no live session uses it.
+    """
+
+    def __init__(self, max_items: int = 1024, embedder=None, similarity_threshold: float = 0.9):
+        self.max_items = max_items
+        self.embedder = embedder
+        self.similarity_threshold = similarity_threshold
+        # (scope, normalized question) -> {"answer", "audio_file", "vector"}
+        self._entries: "OrderedDict[Tuple[str, str], Dict]" = OrderedDict()
+        # scope -> normalized questions cached for it, in insertion order
+        self._scopes: Dict[str, Dict[str, None]] = {}
+        self._session_scopes: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_scope(context: str, model: str) -> str:
+        return hashlib.sha256(f"{model}|{context}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def normalize_question(question: str) -> str:
+        return " ".join(re.findall(r"[\w']+", unicodedata.normalize("NFKC", question).lower()))
+
+    def bind(self, session_id: str, scope: str):
+        """
+        Record that the session's transcripts hash to scope. A session that
+        moved to a new scope (more audio was added) releases the old one.
+        """
+        with self._lock:
+            previous = self._session_scopes.get(session_id)
+            self._session_scopes[session_id] = scope
+            if previous is not None and previous != scope:
+                self._drop_unused_locked(previous)
+
+    def release(self, session_id: str):
+        with self._lock:
+            scope = self._session_scopes.pop(session_id, None)
+            if scope is not None:
+                self._drop_unused_locked(scope)
+
+    def _drop_unused_locked(self, scope: str):
+        if scope in self._session_scopes.values():
+            return
+        for question in self._scopes.pop(scope, {}):
+            self._entries.pop((scope, question), None)
+
+    def _embed(self, question: str):
+        return self.embedder.embed([question])[0] if self.embedder is not None else None
+
+    def get(self, scope: str, question: str) -> Optional[Dict]:
+        """
+        Return {"answer", "audio_file"} for the question, or None
+        """
+        question = self.normalize_question(question)
+        with self._lock:
+            entry = self._entries.get((scope, question))
+            if entry is not None:
+                self._entries.move_to_end((scope, question))
+                self.exact_hits += 1
+                return {"answer": entry["answer"], "audio_file": entry["audio_file"]}
+            candidates = list(self._scopes.get(scope, ())) if self.embedder is not None else []
+
+        if candidates:
+            vector = self._embed(question)
+            with self._lock:
+                best, best_score = None, self.similarity_threshold
+                for candidate in candidates:
+                    entry = self._entries.get((scope, candidate))
+                    if entry is None:
+                        continue
+                    score = float(entry["vector"] @ vector)
+                    if score >= best_score:
+                        best, best_score = entry, score
+                if best is not None:
+                    self.similar_hits += 1
+                    return {"answer": best["answer"], "audio_file": best["audio_file"]}
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, scope: str, question: str, answer: str, audio_file: Optional[str] = None):
+        if self.max_items <= 0:
+            return
+        question = self.normalize_question(question)
+        vector = self._embed(question)
+        with self._lock:
+            previous = self._entries.get((scope, question))
+            if audio_file is None and previous is not None and previous["answer"] == answer:
+                audio_file = previous["audio_file"]
+            self._entries[(scope, question)] = {"answer": answer, "audio_file": audio_file, "vector": vector}
+            self._entries.move_to_end((scope, question))
+            self._scopes.setdefault(scope, {})[question] = None
+            while len(self._entries) > self.max_items:
+                (old_scope, old_question), _ = self._entries.popitem(last=False)
+                questions = self._scopes.get(old_scope)
+                if questions is not None:
+                    questions.pop(old_question, None)
+                    if not questions:
+                        del self._scopes[old_scope]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        hits = self.exact_hits + self.similar_hits
+        lookups = hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "transcripts": len(self._scopes),
+        }
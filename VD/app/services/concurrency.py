@@ -0,0 +1,173 @@
+import asyncio
+import contextlib
+import contextvars
+import heapq
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from app.metrics import STAGE_IN_FLIGHT, STAGE_WAIT, record_stage
+
+
+# Default number of concurrent calls allowed per pipeline stage
+DEFAULT_STAGE_LIMITS = {
+    "io": int(os.getenv("IO_CONCURRENCY", "16")),
+    "stt": int(os.getenv("STT_CONCURRENCY", "32")),
+    "llm": int(os.getenv("LLM_CONCURRENCY", "32")),
+    "tts": int(os.getenv("TTS_CONCURRENCY", "16")),
+    "cpu": int(os.getenv("CPU_CONCURRENCY", str(os.cpu_count() or 1))),
+}
+
+
+# Scheduling priorities (lower runs first): live questions before batches
+# before bulk transcription
+INTERACTIVE = 0
+BATCH = 1
+BULK = 2
+
+# Priority of the work the current request or job is doing
+current_priority: contextvars.ContextVar[int] = contextvars.ContextVar("voiceqa_priority", default=INTERACTIVE)
+
+
+class PrioritySemaphore:
+    """
+    asyncio semaphore that hands free slots to the highest priority waiter,
+    first come first served within a priority
+    """
+
+    def __init__(self, value: int):
+        self._value = value
+        self._waiters: List = []
+        self._order = itertools.count()
+
+    async def acquire(self, priority: int = INTERACTIVE):
+        if self._value > 0 and not self._waiters:
+            self._value -= 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._order), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Granted a slot just as we were cancelled: pass it on
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            # Cancelled waiters are dropped lazily
+            if not future.done():
+                future.set_result(None)
+                return
+        self._value += 1
+
+    @contextlib.asynccontextmanager
+    async def slot(self, priority: int = INTERACTIVE):
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+
+class StageExecutor:
+    """
+    Runs blocking service calls (Groq, gTTS, file I/O) on a bounded thread pool
+    so the event loop stays free while upstream calls are in flight.
+    Each stage has its own concurrency limit so a burst of slow transcriptions
+    cannot starve the LLM or TTS stages of worker threads. Waiting calls get
+    a slot in order of current_priority, so a live question's transcription
+    overtakes queued bulk uploads.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, int]] = None):
+        self.limits = dict(DEFAULT_STAGE_LIMITS if limits is None else limits)
+        self.executor = ThreadPoolExecutor(
+            max_workers=max(1, sum(self.limits.values())),
+            thread_name_prefix="stage",
+        )
+        self._semaphores: Dict[str, PrioritySemaphore] = {}
+
+    def _semaphore(self, stage: str) -> PrioritySemaphore:
+        if stage not in self.limits:
+            raise ValueError(f"Unknown pipeline stage: {stage}")
+        # Created lazily so the semaphore binds to the running event loop
+        if stage not in self._semaphores:
+            self._semaphores[stage] = PrioritySemaphore(self.limits[stage])
+        return self._semaphores[stage]
+
+    async def run(self, stage: str, func: Callable, *args, **kwargs):
+        """
+        Run func(*args, **kwargs) on the pool, waiting for a free slot in the stage
+        """
+        queued = time.perf_counter()
+        async with self._semaphore(stage).slot(current_priority.get()):
+            started = time.perf_counter()
+            STAGE_WAIT.observe(started - queued, stage=stage)
+            loop = asyncio.get_running_loop()
+            with STAGE_IN_FLIGHT.track_inprogress(stage=stage):
+                try:
+                    return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+                finally:
+                    record_stage(stage, getattr(func, "__name__", "call"), time.perf_counter() - started)
+
+    async def iterate(self, stage: str, iterator: Iterator) -> AsyncIterator:
+        """
+        Consume a blocking iterator (e.g. an LLM token stream) on the pool,
+        yielding its items asynchronously. The stage slot is held until the
+        iterator is exhausted or the consumer stops early.
+        """
+        queued = time.perf_counter()
+        async with self._semaphore(stage).slot(current_priority.get()):
+            started = time.perf_counter()
+            STAGE_WAIT.observe(started - queued, stage=stage)
+            STAGE_IN_FLIGHT.inc(stage=stage)
+            loop = asyncio.get_running_loop()
+            queue: asyncio.Queue = asyncio.Queue()
+            stop = threading.Event()
+            done = object()
+
+            def produce():
+                try:
+                    for item in iterator:
+                        if stop.is_set():
+                            break
+                        loop.call_soon_threadsafe(queue.put_nowait, item)
+                except Exception as e:
+                    loop.call_soon_threadsafe(queue.put_nowait, e)
+                finally:
+                    loop.call_soon_threadsafe(queue.put_nowait, done)
+
+            producer = loop.run_in_executor(self.executor, produce)
+            try:
+                while True:
+                    item = await queue.get()
+                    if item is done:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    yield item
+            finally:
+                stop.set()
+                await producer
+                STAGE_IN_FLIGHT.dec(stage=stage)
+                record_stage(stage, "stream", time.perf_counter() - started)
+
+    def queued(self) -> Dict[str, int]:
+        """
+        Calls waiting for a slot, per stage
+        """
+        return {stage: semaphore.waiting for stage, semaphore in self._semaphores.items()}
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
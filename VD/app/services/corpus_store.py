@@ -0,0 +1,130 @@
+"""
+On-disk store for bulk-ingested recordings: transcripts and passages keyed by
+the SHA-256 of the audio (so duplicate recordings are stored once), plus a
+manifest of input files that lets interrupted runs resume.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional
+
+from app.services.session_store import _Transaction
+
+
+def _pack(value) -> bytes:
+    return zlib.compress(json.dumps(value).encode("utf-8"), 6)
+
+
+def _unpack(blob: Optional[bytes]):
+    return json.loads(zlib.decompress(blob)) if blob is not None else None
+
+
+class CorpusStore:
+    """
+    SQLite database with zlib-compressed transcripts. The manifest records one
+    row per input path with its size and modification time, so a file counts
+    as done only while it is unchanged.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._connect().conn.executescript("""
+            CREATE TABLE IF NOT EXISTS recordings (
+                sha256 TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                duration REAL,
+                text BLOB NOT NULL,
+                segments BLOB,
+                passages BLOB NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS manifest (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                sha256 TEXT,
+                status TEXT NOT NULL,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS manifest_status ON manifest (status);
+        """)
+
+    def _connect(self) -> _Transaction:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = _Transaction(conn)
+        return self._local.conn
+
+    def finished(self) -> Dict[str, tuple]:
+        """
+        path -> (size, mtime_ns) of every input that was ingested successfully
+        """
+        rows = self._connect().conn.execute("SELECT path, size, mtime_ns FROM manifest WHERE status = 'done'")
+        return {path: (size, mtime_ns) for path, size, mtime_ns in rows}
+
+    def has_recording(self, sha256: str) -> bool:
+        row = self._connect().conn.execute("SELECT 1 FROM recordings WHERE sha256 = ?", (sha256,)).fetchone()
+        return row is not None
+
+    def put_recording(self, sha256: str, model: str, duration: Optional[float], text: str,
+                      segments: Optional[List[Dict]], passages: List[Dict]):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO recordings VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (sha256, model, duration, zlib.compress(text.encode("utf-8"), 6),
+                 _pack(segments) if segments else None, _pack(passages), time.time()),
+            )
+
+    def get_recording(self, sha256: str) -> Optional[Dict]:
+        row = self._connect().conn.execute(
+            "SELECT model, duration, text, segments, passages, created_at FROM recordings WHERE sha256 = ?",
+            (sha256,),
+        ).fetchone()
+        if row is None:
+            return None
+        model, duration, text, segments, passages, created_at = row
+        return {
+            "sha256": sha256,
+            "model": model,
+            "duration": duration,
+            "text": zlib.decompress(text).decode("utf-8"),
+            "segments": _unpack(segments),
+            "passages": _unpack(passages),
+            "created_at": created_at,
+        }
+
+    def mark(self, path: str, size: int, mtime_ns: int, status: str,
+             sha256: Optional[str] = None, error: Optional[str] = None):
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT INTO manifest (path, size, mtime_ns, sha256, status, error, attempts, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (path) DO UPDATE SET
+                    size = excluded.size, mtime_ns = excluded.mtime_ns,
+                    sha256 = COALESCE(excluded.sha256, manifest.sha256), status = excluded.status,
+                    error = excluded.error, attempts = manifest.attempts + excluded.attempts,
+                    updated_at = excluded.updated_at
+                """,
+                (path, size, mtime_ns, sha256, status, error, int(status == "failed"), time.time()),
+            )
+
+    def stats(self) -> Dict:
+        conn = self._connect().conn
+        statuses = dict(conn.execute("SELECT status, COUNT(*) FROM manifest GROUP BY status").fetchall())
+        recordings, hours = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(duration), 0) / 3600 FROM recordings"
+        ).fetchone()
+        return {"files": statuses, "recordings": recordings, "audio_hours": hours}
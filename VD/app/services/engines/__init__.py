@@ -0,0 +1,39 @@
+import os
+from typing import Optional
+
+import httpx
+
+from app.services.engines.base import STTEngine, TTSEngine
+
+
+def create_stt_engine(name: str, api_key: Optional[str] = None, http_client: Optional[httpx.Client] = None) -> STTEngine:
+    """
+    Build the speech-to-text engine selected for this deployment ("groq" or "faster-whisper")
+    """
+    if name == "groq":
+        from app.services.engines.groq_whisper import GroqWhisperEngine
+        return GroqWhisperEngine(api_key, http_client=http_client)
+    if name == "faster-whisper":
+        from app.services.engines.faster_whisper_engine import FasterWhisperEngine
+        return FasterWhisperEngine(
+            model_size=os.getenv("LOCAL_STT_MODEL", "base.en"),
+            compute_type=os.getenv("LOCAL_STT_COMPUTE_TYPE", "int8"),
+            download_root=os.getenv("LOCAL_MODEL_DIR") or None,
+        )
+    raise ValueError(f"Unknown STT engine: {name}")
+
+
+def create_tts_engine(name: str) -> TTSEngine:
+    """
+    Build the text-to-speech engine selected for this deployment ("gtts" or "piper")
+    """
+    if name == "gtts":
+        from app.services.engines.gtts_engine import GTTSEngine
+        return GTTSEngine()
+    if name == "piper":
+        from app.services.engines.piper_engine import PiperEngine
+        model_path = os.getenv("PIPER_MODEL_PATH")
+        if not model_path:
+            raise ValueError("PIPER_MODEL_PATH must point to a Piper voice model (.onnx)")
+        return PiperEngine(model_path)
+    raise ValueError(f"Unknown TTS engine: {name}")
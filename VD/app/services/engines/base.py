@@ -0,0 +1,71 @@
+import os
+import queue
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import BinaryIO, Callable, Dict, Generic, TypeVar, Union
+
+
+T = TypeVar("T")
+
+AudioInput = Union[bytes, BinaryIO]
+
+
+def default_pool_size() -> int:
+    return int(os.getenv("ENGINE_POOL_SIZE", str(os.cpu_count() or 1)))
+
+
+class ModelPool(Generic[T]):
+    """
+    Fixed set of loaded model instances shared by worker threads.
+    Models are created up front (so the first request does not pay the load
+    time) and each instance is used by one thread at a time.
+    """
+
+    def __init__(self, factory: Callable[[], T], size: int):
+        self.size = max(1, size)
+        self._models: "queue.Queue[T]" = queue.Queue()
+        for _ in range(self.size):
+            self._models.put(factory())
+
+    @contextmanager
+    def acquire(self):
+        model = self._models.get()
+        try:
+            yield model
+        finally:
+            self._models.put(model)
+
+
+class STTEngine(ABC):
+    """
+    Speech-to-text backend used by TranscriptionService
+    """
+
+    name = "base"
+
+    @property
+    def model_id(self) -> str:
+        """
+        Identifies the model in transcription cache keys
+        """
+        return self.name
+
+    @abstractmethod
+    def transcribe(self, audio: AudioInput, filename: str, language: str, timestamps: bool = False) -> Dict:
+        """
+        Transcribe audio given as bytes or an open binary file positioned at the start.
+        Return {"text": ..., "segments": [{"start", "end", "text"}, ...]}.
+        Segments are only required when timestamps=True.
+        """
+
+
+class TTSEngine(ABC):
+    """
+    Text-to-speech backend used by TTSService; synthesize returns MP3 bytes
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def synthesize(self, text: str, lang: str, voice: str) -> bytes:
+        pass
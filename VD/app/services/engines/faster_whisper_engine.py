@@ -0,0 +1,63 @@
+import io
+import os
+from typing import Dict, Optional
+
+from app.services.engines.base import AudioInput, ModelPool, STTEngine, default_pool_size
+
+
+class FasterWhisperEngine(STTEngine):
+    """
+    Local CPU Whisper via faster-whisper (CTranslate2), int8 quantized by default.
+    Requires `pip install faster-whisper`.
+    """
+
+    name = "faster-whisper"
+
+    def __init__(
+        self,
+        model_size: str = "base.en",
+        compute_type: str = "int8",
+        pool_size: Optional[int] = None,
+        download_root: Optional[str] = None,
+    ):
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError:
+            raise ImportError("faster-whisper is not installed. Run: pip install faster-whisper")
+
+        self.model_size = model_size
+        self.compute_type = compute_type
+        pool_size = pool_size or default_pool_size()
+        # Split the cores between the pooled models instead of oversubscribing them
+        cpu_threads = max(1, (os.cpu_count() or 1) // pool_size)
+        self.pool = ModelPool(
+            lambda: WhisperModel(
+                model_size,
+                device="cpu",
+                compute_type=compute_type,
+                cpu_threads=cpu_threads,
+                download_root=download_root,
+            ),
+            pool_size,
+        )
+
+    @property
+    def model_id(self) -> str:
+        return f"faster-whisper:{self.model_size}:{self.compute_type}"
+
+    def transcribe(self, audio: AudioInput, filename: str, language: str, timestamps: bool = False) -> Dict:
+        if isinstance(audio, bytes):
+            audio = io.BytesIO(audio)
+        with self.pool.acquire() as model:
+            segments, _ = model.transcribe(
+                audio,
+                language=language,
+                temperature=0.0,
+                vad_filter=True,
+            )
+            # The segment generator does the decoding work, so consume it while holding the model
+            segments = [
+                {"start": seg.start, "end": seg.end, "text": seg.text.strip()}
+                for seg in segments
+            ]
+        return {"text": " ".join(seg["text"] for seg in segments), "segments": segments}
@@ -0,0 +1,51 @@
+import httpx
+from typing import Dict, Optional
+
+from app.services.engines.base import AudioInput, STTEngine
+from app.services.upstream import create_groq_client
+
+
+class GroqWhisperEngine(STTEngine):
+    """
+    Whisper hosted by Groq
+    """
+
+    name = "groq"
+
+    def __init__(self, api_key: str, http_client: Optional[httpx.Client] = None, model: str = "whisper-large-v3"):
+        self.client = create_groq_client(api_key, http_client)
+        self.model = model
+
+    @property
+    def model_id(self) -> str:
+        # Kept as the bare model name so existing cache entries stay valid
+        return self.model
+
+    def transcribe(self, audio: AudioInput, filename: str, language: str, timestamps: bool = False) -> Dict:
+        # httpx streams file objects into the multipart body without reading them whole
+        if not timestamps:
+            text = self.client.audio.transcriptions.create(
+                file=(filename, audio),
+                model=self.model,
+                response_format="text",
+                language=language,
+                temperature=0.0
+            )
+            return {"text": text, "segments": []}
+
+        result = self.client.audio.transcriptions.create(
+            file=(filename, audio),
+            model=self.model,
+            response_format="verbose_json",
+            language=language,
+            temperature=0.0
+        )
+        if hasattr(result, "model_dump"):
+            result = result.model_dump()
+        return {
+            "text": result.get("text", ""),
+            "segments": [
+                {"start": seg["start"], "end": seg["end"], "text": seg["text"]}
+                for seg in result.get("segments") or []
+            ],
+        }
@@ -0,0 +1,20 @@
+import io
+
+from gtts import gTTS
+
+from app.services.engines.base import TTSEngine
+
+
+class GTTSEngine(TTSEngine):
+    """
+    Google Translate text-to-speech (network call per phrase)
+    """
+
+    name = "gtts"
+
+    def synthesize(self, text: str, lang: str, voice: str) -> bytes:
+        buffer = io.BytesIO()
+        # gTTS picks the accent from the Google Translate top-level domain
+        tts = gTTS(text=text, lang=lang, tld=voice, slow=False)
+        tts.write_to_fp(buffer)
+        return buffer.getvalue()
@@ -0,0 +1,41 @@
+import io
+import wave
+from typing import Optional
+
+from pydub import AudioSegment
+
+from app.services.engines.base import ModelPool, TTSEngine, default_pool_size
+
+
+class PiperEngine(TTSEngine):
+    """
+    Local neural TTS via Piper (ONNX, CPU). Requires `pip install piper-tts`
+    and a downloaded voice model (.onnx with its .onnx.json config).
+    Output is encoded to MP3 so it can be mixed with the rest of the pipeline.
+    """
+
+    name = "piper"
+
+    def __init__(self, model_path: str, pool_size: Optional[int] = None, bitrate: str = "64k"):
+        try:
+            from piper import PiperVoice
+        except ImportError:
+            raise ImportError("piper-tts is not installed. Run: pip install piper-tts")
+
+        self.model_path = model_path
+        self.bitrate = bitrate
+        self.pool = ModelPool(lambda: PiperVoice.load(model_path), pool_size or default_pool_size())
+
+    def synthesize(self, text: str, lang: str, voice: str) -> bytes:
+        # The voice is fixed by the loaded model; lang and voice only matter for cache keys
+        wav_buffer = io.BytesIO()
+        with self.pool.acquire() as piper_voice:
+            # piper-tts >= 1.3 renamed synthesize(text, wav_file) to synthesize_wav
+            write_wav = getattr(piper_voice, "synthesize_wav", None) or piper_voice.synthesize
+            with wave.open(wav_buffer, "wb") as wav_file:
+                write_wav(text, wav_file)
+
+        wav_buffer.seek(0)
+        mp3_buffer = io.BytesIO()
+        AudioSegment.from_wav(wav_buffer).export(mp3_buffer, format="mp3", bitrate=self.bitrate)
+        return mp3_buffer.getvalue()
@@ -0,0 +1,92 @@
+"""
+Streaming ingest of uploaded audio and retention of the uploads directory.
+"""
+import hashlib
+import os
+import shutil
+import time
+from dataclasses import dataclass
+from typing import BinaryIO, Dict
+
+from fastapi import UploadFile
+
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+@dataclass
+class IngestedAudio:
+    file: BinaryIO
+    filename: str
+    size: int
+    sha256: str
+
+
+async def ingest_upload(upload: UploadFile, max_bytes: int, chunk_size: int = CHUNK_SIZE) -> IngestedAudio:
+    """
+    Hash and size-check an upload chunk by chunk without copying it.
+    The body stays in Starlette's spooled buffer (memory for small files, a
+    temporary file above the spool limit), which is rewound and handed to
+    the transcriber as a file object.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    await upload.seek(0)
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_bytes:
+            raise UploadTooLarge(f"Upload exceeds the {max_bytes} byte limit")
+        digest.update(chunk)
+    await upload.seek(0)
+    return IngestedAudio(upload.file, upload.filename or "audio", size, digest.hexdigest())
+
+
+def spill_to_disk(audio: IngestedAudio, destination: str, chunk_size: int = CHUNK_SIZE):
+    """
+    Copy an ingested upload to a file for tools that need a path (ffmpeg).
+    Blocking, run on the stage executor.
+    """
+    audio.file.seek(0)
+    with open(destination, "wb") as buffer:
+        shutil.copyfileobj(audio.file, buffer, chunk_size)
+    audio.file.seek(0)
+
+
+def cleanup_uploads(directory: str, max_age_seconds: float, max_bytes: int) -> Dict:
+    """
+    Delete files older than max_age_seconds, then the oldest files until the
+    directory fits in max_bytes. Returns what was removed.
+    """
+    now = time.time()
+    files = []
+    removed, removed_bytes = 0, 0
+    for entry in os.scandir(directory):
+        if not entry.is_file():
+            continue
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, entry.path))
+
+    files.sort()
+    total = sum(size for _, size, _ in files)
+    for mtime, size, path in files:
+        if now - mtime <= max_age_seconds and total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+        removed_bytes += size
+
+    return {"removed_files": removed, "removed_bytes": removed_bytes, "remaining_bytes": total}
@@ -0,0 +1,359 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from functools import partial
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from app.services.concurrency import StageExecutor
+from app.services.session_store import _Transaction
+
+
+TERMINAL_STATUSES = ("succeeded", "failed", "cancelled")
+
+_COLUMNS = (
+    "job_id, kind, status, priority, params, payload_path, progress, result, error, "
+    "attempts, created_at, started_at, finished_at"
+)
+
+
+class JobStore:
+    """
+    Persistent job table in a SQLite database file, shared by every worker process.
+
+    Jobs are claimed with a lease that the owning worker keeps renewing. A job
+    whose lease runs out (its worker died or was redeployed) goes back to the
+    queue, up to max_attempts times.
+    """
+
+    def __init__(self, path: str, max_attempts: int = 3):
+        self.path = path
+        self.max_attempts = max_attempts
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._connect().conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                status TEXT NOT NULL,
+                priority INTEGER NOT NULL DEFAULT 0,
+                params TEXT NOT NULL,
+                payload_path TEXT,
+                progress REAL NOT NULL DEFAULT 0,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                cancel_requested INTEGER NOT NULL DEFAULT 0,
+                lease_until REAL,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC, created_at);
+            CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished_at);
+        """)
+
+    def _connect(self) -> _Transaction:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = _Transaction(conn)
+        return self._local.conn
+
+    @staticmethod
+    def _row_to_job(row) -> Dict:
+        (job_id, kind, status, priority, params, payload_path, progress, result, error,
+         attempts, created_at, started_at, finished_at) = row
+        return {
+            "job_id": job_id,
+            "kind": kind,
+            "status": status,
+            "priority": priority,
+            "params": json.loads(params),
+            "payload_path": payload_path,
+            "progress": progress,
+            "result": json.loads(result) if result else None,
+            "error": error,
+            "attempts": attempts,
+            "created_at": created_at,
+            "started_at": started_at,
+            "finished_at": finished_at,
+        }
+
+    def _get(self, conn: sqlite3.Connection, job_id: str) -> Optional[Dict]:
+        row = conn.execute(f"SELECT {_COLUMNS} FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def submit(self, kind: str, params: Dict, priority: int = 0, payload_path: Optional[str] = None,
+               job_id: Optional[str] = None) -> Dict:
+        """
+        Queue a job. Higher priority jobs are claimed first, then oldest first.
+        """
+        job_id = job_id or str(uuid.uuid4())
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, kind, status, priority, params, payload_path, created_at) "
+                "VALUES (?, ?, 'queued', ?, ?, ?, ?)",
+                (job_id, kind, priority, json.dumps(params), payload_path, time.time()),
+            )
+            return self._get(conn, job_id)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """
+        Return the job, with its queue_position (0 = next) while it is queued
+        """
+        with self._connect() as conn:
+            job = self._get(conn, job_id)
+            if job is not None and job["status"] == "queued":
+                job["queue_position"] = conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND "
+                    "(priority > ? OR (priority = ? AND created_at < ?))",
+                    (job["priority"], job["priority"], job["created_at"]),
+                ).fetchone()[0]
+        return job
+
+    def claim(self, lease_seconds: float) -> Optional[Dict]:
+        """
+        Take the next queued job, first returning jobs with expired leases to the queue
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'Worker lost while running the job', "
+                "finished_at = ?, lease_until = NULL "
+                "WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+                (now, now, self.max_attempts),
+            )
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', lease_until = NULL "
+                "WHERE status = 'running' AND lease_until < ?",
+                (now,),
+            )
+            row = conn.execute(
+                "SELECT job_id FROM jobs WHERE status = 'queued' ORDER BY priority DESC, created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = ?, lease_until = ? "
+                "WHERE job_id = ?",
+                (now, now + lease_seconds, row[0]),
+            )
+            return self._get(conn, row[0])
+
+    def renew(self, job_ids: List[str], lease_seconds: float) -> List[str]:
+        """
+        Extend the leases of running jobs and return those with a pending cancel request
+        """
+        if not job_ids:
+            return []
+        lease_until = time.time() + lease_seconds
+        placeholders = ",".join("?" * len(job_ids))
+        with self._connect() as conn:
+            conn.execute(
+                f"UPDATE jobs SET lease_until = ? WHERE status = 'running' AND job_id IN ({placeholders})",
+                (lease_until, *job_ids),
+            )
+            return [row[0] for row in conn.execute(
+                f"SELECT job_id FROM jobs WHERE cancel_requested = 1 AND job_id IN ({placeholders})", job_ids
+            )]
+
+    def set_progress(self, job_id: str, progress: float):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET progress = ? WHERE job_id = ? AND status = 'running'",
+                (max(0.0, min(1.0, progress)), job_id),
+            )
+
+    def _finish(self, job_id: str, status: str, result: Optional[Dict] = None, error: Optional[str] = None):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, lease_until = NULL, "
+                "progress = CASE WHEN ? = 'succeeded' THEN 1 ELSE progress END "
+                "WHERE job_id = ? AND status = 'running'",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), status, job_id),
+            )
+
+    def complete(self, job_id: str, result: Dict):
+        self._finish(job_id, "succeeded", result=result)
+
+    def fail(self, job_id: str, error: str):
+        self._finish(job_id, "failed", error=error)
+
+    def mark_cancelled(self, job_id: str):
+        self._finish(job_id, "cancelled")
+
+    def release(self, job_id: str):
+        """
+        Put a running job back in the queue without counting the attempt (graceful shutdown)
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', lease_until = NULL, attempts = MAX(0, attempts - 1) "
+                "WHERE job_id = ? AND status = 'running'",
+                (job_id,),
+            )
+
+    def cancel(self, job_id: str) -> Optional[Dict]:
+        """
+        Cancel a queued job at once, or flag a running job for its worker to stop.
+        Returns the updated job, or None if it doesn't exist.
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE job_id = ? AND status = 'queued'",
+                (time.time(), job_id),
+            )
+            conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE job_id = ? AND status = 'running'", (job_id,))
+            return self._get(conn, job_id)
+
+    def purge(self, retention_seconds: float) -> List[str]:
+        """
+        Delete jobs that finished more than retention_seconds ago and return their payload paths
+        """
+        cutoff = time.time() - retention_seconds
+        with self._connect() as conn:
+            paths = [row[0] for row in conn.execute(
+                "SELECT payload_path FROM jobs WHERE finished_at < ? AND payload_path IS NOT NULL", (cutoff,)
+            )]
+            conn.execute("DELETE FROM jobs WHERE finished_at < ?", (cutoff,))
+        return paths
+
+    def counts(self) -> Dict[str, int]:
+        with self._connect() as conn:
+            return dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+
+JobHandler = Callable[[Dict, Callable[[float], None]], Awaitable[Dict]]
+
+
+class JobRunner:
+    """
+    Runs queued jobs on a fixed number of async workers in this process.
+
+    handler(job, progress) does the work and returns the job's result;
+    progress(fraction) may be called from any thread. A job's payload file is
+    removed once the job succeeds, fails or is cancelled, and kept when the
+    runner stops so the job can resume after a restart.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        handler: JobHandler,
+        executor: StageExecutor,
+        workers: int = 2,
+        lease_seconds: float = 60,
+        poll_seconds: float = 1.0,
+        retention_seconds: float = 24 * 3600,
+    ):
+        self.store = store
+        self.handler = handler
+        self.executor = executor
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.retention_seconds = retention_seconds
+        self._tasks: List[asyncio.Task] = []
+        self._running: Dict[str, asyncio.Task] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.ensure_future(self._work()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.ensure_future(self._maintain()))
+
+    async def stop(self):
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def wake(self):
+        """
+        Tell idle workers a job was just queued instead of waiting for the next poll
+        """
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def cancel(self, job_id: str) -> Optional[Dict]:
+        job = await self.executor.run("io", self.store.cancel, job_id)
+        if job is None:
+            return None
+        if job["status"] == "cancelled":
+            self._remove_payload(job["payload_path"])
+        task = self._running.get(job_id)
+        if task is not None:
+            task.cancel()
+        return job
+
+    @staticmethod
+    def _remove_payload(path: Optional[str]):
+        if path and os.path.exists(path):
+            os.remove(path)
+
+    async def _work(self):
+        while True:
+            try:
+                job = await self.executor.run("io", self.store.claim, self.lease_seconds)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Job queue unavailable: {e}")
+                job = None
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _run(self, job: Dict):
+        job_id = job["job_id"]
+        task = asyncio.ensure_future(self.handler(job, partial(self.store.set_progress, job_id)))
+        self._running[job_id] = task
+        try:
+            result = await task
+        except asyncio.CancelledError:
+            if self._stopping:
+                # Leave the payload in place; another worker picks the job up after the restart
+                self.store.release(job_id)
+                raise
+            await self.executor.run("io", self.store.mark_cancelled, job_id)
+        except Exception as e:
+            await self.executor.run("io", self.store.fail, job_id, str(e))
+        else:
+            await self.executor.run("io", self.store.complete, job_id, result)
+        finally:
+            self._running.pop(job_id, None)
+        self._remove_payload(job["payload_path"])
+
+    async def _maintain(self):
+        """
+        Renew leases of local jobs, stop jobs cancelled through another worker
+        and purge old finished jobs
+        """
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                cancelled = await self.executor.run("io", self.store.renew, list(self._running), self.lease_seconds)
+                for job_id in cancelled:
+                    task = self._running.get(job_id)
+                    if task is not None:
+                        task.cancel()
+                for path in await self.executor.run("io", self.store.purge, self.retention_seconds):
+                    self._remove_payload(path)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Job maintenance failed: {e}")
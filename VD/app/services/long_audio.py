@@ -0,0 +1,230 @@
+import asyncio
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pydub import AudioSegment
+from pydub.silence import detect_silence
+
+
+# Whisper works at 16 kHz mono, so decode straight to that to keep memory low
+SAMPLE_RATE = 16000
+
+
+def load_audio(audio_file_path: str) -> AudioSegment:
+    """
+    Decode an audio file to 16 kHz mono (ffmpeg does the downmix while decoding)
+    """
+    return AudioSegment.from_file(audio_file_path, parameters=["-ac", "1", "-ar", str(SAMPLE_RATE)])
+
+
+def find_cut_points(
+    audio: AudioSegment,
+    segment_ms: int,
+    search_ms: int = 15000,
+    min_silence_ms: int = 400,
+    silence_offset_db: float = 16.0,
+) -> List[int]:
+    """
+    Choose cut points roughly every segment_ms, moved to the middle of the
+    nearest silence found in the search window before each nominal cut.
+    Falls back to a hard cut when the window contains no silence.
+    """
+    silence_thresh = audio.dBFS - silence_offset_db
+    cuts = []
+    position = 0
+    while position + segment_ms < len(audio):
+        nominal = position + segment_ms
+        window_start = max(position + segment_ms // 2, nominal - search_ms)
+        window = audio[window_start:nominal]
+        silences = detect_silence(window, min_silence_len=min_silence_ms, silence_thresh=silence_thresh)
+        if silences:
+            # Prefer the silence that ends closest to the nominal cut
+            start, end = max(silences, key=lambda s: s[1])
+            cut = window_start + (start + end) // 2
+        else:
+            cut = nominal
+        cuts.append(cut)
+        position = cut
+    return cuts
+
+
+def plan_segments(audio_length_ms: int, cuts: List[int], overlap_ms: int) -> List[Tuple[int, int, int]]:
+    """
+    Turn cut points into (start_ms, end_ms, nominal_start_ms) segments where each
+    segment starts overlap_ms before its nominal start so no words are lost at a cut.
+    """
+    bounds = [0] + cuts + [audio_length_ms]
+    segments = []
+    for nominal_start, end in zip(bounds[:-1], bounds[1:]):
+        start = max(0, nominal_start - overlap_ms)
+        segments.append((start, end, nominal_start))
+    return segments
+
+
+def export_segment(audio: AudioSegment, start_ms: int, end_ms: int) -> bytes:
+    buffer = io.BytesIO()
+    audio[start_ms:end_ms].export(buffer, format="wav")
+    return buffer.getvalue()
+
+
+def _normalize_word(word: str) -> str:
+    return word.strip(".,!?;:\"'").lower()
+
+
+def _overlapping_words(previous: str, current: str, max_words: int = 30) -> int:
+    """
+    Count the words at the start of current that repeat the end of previous
+    """
+    prev_words = [_normalize_word(w) for w in previous.split()]
+    curr_words = [_normalize_word(w) for w in current.split()]
+    limit = min(max_words, len(prev_words), len(curr_words))
+    for size in range(limit, 0, -1):
+        if prev_words[-size:] == curr_words[:size]:
+            return size
+    return 0
+
+
+def stitch_segments(results: List[Dict], segments: List[Tuple[int, int, int]]) -> Dict:
+    """
+    Combine per-segment transcriptions into one transcript with absolute timestamps.
+
+    Each result holds the segment "text" and optionally Whisper's timed "segments".
+    Timed segments that end inside the overlap (before the nominal start) were already
+    covered by the previous chunk and are dropped; leftover repeated words at the seam
+    are removed by matching the end of the previous text.
+    """
+    stitched_segments = []
+    texts = []
+    for result, (start_ms, end_ms, nominal_start_ms) in zip(results, segments):
+        offset = start_ms / 1000.0
+        nominal_start = nominal_start_ms / 1000.0
+        timed = result.get("segments") or []
+
+        if timed:
+            kept = []
+            for seg in timed:
+                seg_start = offset + float(seg["start"])
+                seg_end = offset + float(seg["end"])
+                if seg_end <= nominal_start and nominal_start_ms > 0:
+                    continue
+                kept.append({"start": round(seg_start, 2), "end": round(seg_end, 2), "text": seg["text"].strip()})
+            text = " ".join(seg["text"] for seg in kept)
+        else:
+            text = result.get("text", "").strip()
+            kept = [{"start": round(nominal_start, 2), "end": round(end_ms / 1000.0, 2), "text": text}]
+
+        if texts and text:
+            # Strip repeated words from the leading segments so text and segments agree
+            to_remove = _overlapping_words(texts[-1], text)
+            for seg in kept:
+                if to_remove <= 0:
+                    break
+                words = seg["text"].split()
+                seg["text"] = " ".join(words[to_remove:])
+                to_remove -= len(words)
+            kept = [seg for seg in kept if seg["text"]]
+            text = " ".join(seg["text"] for seg in kept)
+
+        if text:
+            texts.append(text)
+        stitched_segments.extend(kept)
+
+    return {"text": " ".join(texts), "segments": stitched_segments}
+
+
+def split_recording(
+    audio_file_path: str, segment_seconds: float = 300, overlap_seconds: float = 2
+) -> Tuple[AudioSegment, List[Tuple[int, int, int]]]:
+    """
+    Decode a long recording and plan overlapping segments cut at silences
+    """
+    audio = load_audio(audio_file_path)
+    cuts = find_cut_points(audio, int(segment_seconds * 1000))
+    return audio, plan_segments(len(audio), cuts, int(overlap_seconds * 1000))
+
+
+def transcribe_planned_segment(
+    audio: AudioSegment,
+    segments: List[Tuple[int, int, int]],
+    index: int,
+    transcribe_segment: Callable[[bytes, str], Dict],
+) -> Dict:
+    start_ms, end_ms, _ = segments[index]
+    return transcribe_segment(export_segment(audio, start_ms, end_ms), f"segment_{index}.wav")
+
+
+def finish_recording(audio: AudioSegment, segments: List[Tuple[int, int, int]], results: List[Dict]) -> Dict:
+    stitched = stitch_segments(results, segments)
+    stitched["duration"] = round(len(audio) / 1000.0, 2)
+    stitched["chunks"] = len(segments)
+    return stitched
+
+
+def transcribe_in_segments(
+    audio_file_path: str,
+    transcribe_segment: Callable[[bytes, str], Dict],
+    segment_seconds: float = 300,
+    overlap_seconds: float = 2,
+    parallelism: int = 4,
+    on_progress: Optional[Callable[[float], None]] = None,
+) -> Dict:
+    """
+    Split a long recording at silence boundaries and transcribe the pieces concurrently.
+
+    transcribe_segment(wav_bytes, name) must return {"text": ..., "segments": [...]}
+    with timestamps relative to the segment. on_progress, if given, is called
+    with the fraction of segments done after each one finishes.
+    """
+    audio, segments = split_recording(audio_file_path, segment_seconds, overlap_seconds)
+
+    done = [0]
+    lock = threading.Lock()
+
+    def run(index: int) -> Dict:
+        result = transcribe_planned_segment(audio, segments, index, transcribe_segment)
+        if on_progress is not None:
+            with lock:
+                done[0] += 1
+                fraction = done[0] / len(segments)
+            on_progress(fraction)
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, parallelism)) as pool:
+        results = list(pool.map(run, range(len(segments))))
+    return finish_recording(audio, segments, results)
+
+
+async def transcribe_in_segments_staged(
+    audio_file_path: str,
+    transcribe_segment: Callable[[bytes, str], Dict],
+    run: Callable[..., Awaitable],
+    segment_seconds: float = 300,
+    overlap_seconds: float = 2,
+    parallelism: int = 4,
+    on_progress: Optional[Callable[[float], None]] = None,
+) -> Dict:
+    """
+    transcribe_in_segments() for the event loop. run(stage, func, *args) is a
+    StageExecutor's run: decoding takes a "cpu" slot and every segment its own
+    "stt" slot, so the STT stage limit bounds upstream calls across all
+    uploads. parallelism still caps the segments of one upload in flight.
+    on_progress runs in an "io" slot.
+    """
+    audio, segments = await run("cpu", split_recording, audio_file_path, segment_seconds, overlap_seconds)
+
+    limit = asyncio.Semaphore(max(1, parallelism))
+    done = [0]
+
+    async def transcribe(index: int) -> Dict:
+        async with limit:
+            result = await run("stt", transcribe_planned_segment, audio, segments, index, transcribe_segment)
+        done[0] += 1
+        if on_progress is not None:
+            # Progress callbacks may block (e.g. a job store write), so keep them off the loop
+            await run("io", on_progress, done[0] / len(segments))
+        return result
+
+    results = await asyncio.gather(*(transcribe(index) for index in range(len(segments))))
+    return finish_recording(audio, segments, list(results))
@@ -0,0 +1,264 @@
+"""
+Local audio preprocessing before speech-to-text: trim leading and trailing
+silence, downmix to mono, resample to 16 kHz and re-encode compactly.
+"""
+import io
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+import numpy as np
+import soundfile as sf
+from pydub import AudioSegment
+
+
+SAMPLE_RATE = 16000
+
+# libsndfile (format, subtype) per output format
+OUTPUT_FORMATS = {
+    "flac": ("FLAC", "PCM_16"),
+    "opus": ("OGG", "OPUS"),
+    "wav": ("WAV", "PCM_16"),
+}
+OUTPUT_SUFFIXES = {"flac": ".flac", "opus": ".ogg", "wav": ".wav"}
+# Rough bits per output sample, to tell whether re-encoding can pay off
+OUTPUT_BITS_PER_SAMPLE = {"flac": 10, "opus": 2, "wav": 16}
+
+# Lossy formats are already compact; decoding and re-encoding them only costs time
+COMPRESSED_SUFFIXES = {".aac", ".m4a", ".mp3", ".oga", ".ogg", ".opus", ".webm"}
+
+# Audio is decoded, resampled and encoded this many seconds at a time
+BLOCK_SECONDS = 10
+
+
+def decode(audio_file: BinaryIO, filename: str) -> Tuple[np.ndarray, int]:
+    """
+    Decode to float32 samples in [-1, 1], shaped (frames, channels).
+    libsndfile reads WAV, FLAC, OGG and MP3 without ffmpeg; anything else
+    (e.g. M4A) goes through pydub.
+    """
+    try:
+        return sf.read(audio_file, dtype="float32", always_2d=True)
+    except sf.LibsndfileError:
+        audio_file.seek(0)
+
+    audio_format = Path(filename).suffix.lstrip(".").lower() or None
+    segment = AudioSegment.from_file(audio_file, format=audio_format)
+    raw = segment.get_array_of_samples()
+    samples = np.frombuffer(raw, dtype=np.dtype(raw.typecode)).astype(np.float32)
+    samples /= float(1 << (8 * segment.sample_width - 1))
+    return samples.reshape(-1, segment.channels), segment.frame_rate
+
+
+def decode_blocks(audio_file: BinaryIO, filename: str, target_rate: int = SAMPLE_RATE) -> Iterator[np.ndarray]:
+    """
+    Decode BLOCK_SECONDS at a time, yielding mono float32 blocks resampled to
+    target_rate, so memory doesn't grow with the length of the recording
+    (except for formats only pydub can read, which it decodes whole).
+    """
+    try:
+        rate = sf.info(audio_file).samplerate
+    except sf.LibsndfileError:
+        rate = None
+    audio_file.seek(0)
+
+    if rate is not None:
+        blocks = sf.blocks(audio_file, blocksize=rate * BLOCK_SECONDS, dtype="float32", always_2d=True)
+    else:
+        samples, rate = decode(audio_file, filename)
+        step = rate * BLOCK_SECONDS
+        blocks = (samples[i:i + step] for i in range(0, len(samples), step))
+    # Whole blocks resample to exactly BLOCK_SECONDS * target_rate samples, so they line up
+    for block in blocks:
+        yield resample(to_mono(block), rate, target_rate)
+
+
+def duration_seconds(audio_file: BinaryIO) -> Optional[float]:
+    """
+    Length of the audio from its header, or None when libsndfile can't read it.
+    Reads from the start of the file wherever its position was left.
+    """
+    try:
+        audio_file.seek(0)
+        return sf.info(audio_file).duration
+    except Exception:
+        return None
+    finally:
+        audio_file.seek(0)
+
+
+def to_mono(samples: np.ndarray) -> np.ndarray:
+    return samples.mean(axis=1) if samples.ndim == 2 else samples
+
+
+def resample(samples: np.ndarray, rate: int, target_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Resample mono audio. Integer downsampling ratios (48k, 32k -> 16k) average
+    each block of samples; other ratios smooth with a moving average before
+    linear interpolation so downsampling doesn't alias.
+    """
+    if rate == target_rate or len(samples) == 0:
+        return samples
+    if rate > target_rate and rate % target_rate == 0:
+        factor = rate // target_rate
+        n = len(samples) // factor
+        return samples[:n * factor].reshape(n, factor).mean(axis=1)
+
+    if rate > target_rate:
+        width = int(round(rate / target_rate))
+        samples = np.convolve(samples, np.full(width, 1.0 / width, dtype=np.float32), mode="same")
+    positions = np.arange(int(len(samples) * target_rate / rate)) * (rate / target_rate)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def speech_bounds(
+    samples: np.ndarray,
+    rate: int,
+    frame_ms: int = 30,
+    margin_db: float = 10.0,
+    padding_ms: int = 250,
+) -> Optional[Tuple[int, int]]:
+    """
+    Energy-based voice activity detection. Frames louder than the noise floor
+    (10th percentile frame energy) by margin_db count as speech; returns the
+    sample range from the first to the last speech frame plus padding, or None
+    when nothing rises above the floor.
+    """
+    frame = max(1, rate * frame_ms // 1000)
+    n_frames = len(samples) // frame
+    frames = samples[:n_frames * frame].reshape(n_frames, frame)
+    return bounds_from_energy(frame_energy_db(frames), frame, len(samples), rate, margin_db, padding_ms)
+
+
+def frame_energy_db(frames: np.ndarray) -> np.ndarray:
+    return 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+
+
+def bounds_from_energy(
+    energy_db: np.ndarray,
+    frame: int,
+    n_samples: int,
+    rate: int,
+    margin_db: float = 10.0,
+    padding_ms: int = 250,
+) -> Optional[Tuple[int, int]]:
+    """
+    speech_bounds() from per-frame energies, for audio that is read in blocks
+    """
+    n_frames = len(energy_db)
+    if n_frames == 0:
+        return None
+
+    noise_floor = np.percentile(energy_db, 10)
+    # Speech-only recordings have a high floor; never demand more than 20 dB below the peak
+    threshold = max(min(noise_floor + margin_db, energy_db.max() - 20), -60.0)
+    voiced = np.flatnonzero(energy_db > threshold)
+    if len(voiced) == 0:
+        return None
+
+    pad = padding_ms * rate // 1000
+    start = max(0, voiced[0] * frame - pad)
+    end = n_samples if voiced[-1] == n_frames - 1 else min(n_samples, (voiced[-1] + 1) * frame + pad)
+    return int(start), int(end)
+
+
+def encode(samples: np.ndarray, rate: int, output_format: str) -> bytes:
+    audio_format, subtype = OUTPUT_FORMATS[output_format]
+    buffer = io.BytesIO()
+    sf.write(buffer, np.clip(samples, -1.0, 1.0), rate, format=audio_format, subtype=subtype)
+    return buffer.getvalue()
+
+
+class AudioPreprocessor:
+    """
+    Shrinks audio before it is sent to STT. process() returns the processed
+    audio, or None when it would not be smaller than the original. Lossy
+    formats and inputs whose bitrate is already below what the output would
+    need are sent as they are without being decoded.
+    """
+
+    def __init__(self, output_format: str = "flac", target_rate: int = SAMPLE_RATE, trim_silence: bool = True):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format {output_format!r}. Use one of: {', '.join(OUTPUT_FORMATS)}")
+        self.output_format = output_format
+        self.target_rate = target_rate
+        self.trim_silence = trim_silence
+
+    @property
+    def signature(self) -> str:
+        """
+        Identifies the settings, so cached transcripts of processed audio are kept apart
+        """
+        return f"{self.output_format}-{self.target_rate}{'-vad' if self.trim_silence else ''}"
+
+    def worth_processing(self, audio_file: BinaryIO, filename: str, size: int) -> bool:
+        """
+        Whether re-encoding could make the file smaller, judged from its name and header
+        """
+        if Path(filename).suffix.lower() in COMPRESSED_SUFFIXES:
+            return False
+        try:
+            info = sf.info(audio_file)
+        except sf.LibsndfileError:
+            # Only pydub can read it; let process() try
+            return True
+        finally:
+            audio_file.seek(0)
+        if info.format in ("MP3", "OGG", "MPEG") or info.duration <= 0:
+            return False
+        output_bits = info.duration * self.target_rate * OUTPUT_BITS_PER_SAMPLE[self.output_format]
+        return size * 8 > output_bits
+
+    def process(self, audio_file: BinaryIO, filename: str) -> Optional[Tuple[bytes, str]]:
+        """
+        Return (audio_bytes, filename) for the processed audio, or None to send the original.
+        Audio is decoded in blocks: one pass measures frame energies for the
+        silence trimmer, a second encodes the speech range.
+        """
+        audio_file.seek(0, io.SEEK_END)
+        original_size = audio_file.tell()
+        audio_file.seek(0)
+        if not self.worth_processing(audio_file, filename, original_size):
+            return None
+
+        start, end = 0, None
+        if self.trim_silence:
+            bounds = self._speech_bounds(audio_file, filename)
+            audio_file.seek(0)
+            if bounds is None:
+                return None
+            start, end = bounds
+
+        audio_format, subtype = OUTPUT_FORMATS[self.output_format]
+        buffer = io.BytesIO()
+        position = 0
+        with sf.SoundFile(buffer, "w", self.target_rate, 1, subtype, format=audio_format) as out:
+            for block in decode_blocks(audio_file, filename, self.target_rate):
+                lo, hi = max(start - position, 0), len(block) if end is None else min(end - position, len(block))
+                position += len(block)
+                if lo < hi:
+                    out.write(np.clip(block[lo:hi], -1.0, 1.0))
+                # Give up as soon as the output can't be smaller
+                if buffer.tell() >= original_size:
+                    audio_file.seek(0)
+                    return None
+        audio_file.seek(0)
+
+        processed = buffer.getvalue()
+        if len(processed) >= original_size:
+            return None
+        return processed, Path(filename).stem + OUTPUT_SUFFIXES[self.output_format]
+
+    def _speech_bounds(self, audio_file: BinaryIO, filename: str, frame_ms: int = 30) -> Optional[Tuple[int, int]]:
+        """
+        speech_bounds() over the whole recording, keeping only per-frame energies in memory
+        """
+        frame = max(1, self.target_rate * frame_ms // 1000)
+        energies, carry, n_samples = [], np.zeros(0, dtype=np.float32), 0
+        for block in decode_blocks(audio_file, filename, self.target_rate):
+            n_samples += len(block)
+            block = np.concatenate([carry, block])
+            n_frames = len(block) // frame
+            energies.append(frame_energy_db(block[:n_frames * frame].reshape(n_frames, frame)))
+            carry = block[n_frames * frame:]
+        energy_db = np.concatenate(energies) if energies else np.zeros(0)
+        return bounds_from_energy(energy_db, frame, n_samples, self.target_rate)
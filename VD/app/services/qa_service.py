@@ -1,51 +1,180 @@
-from groq import Groq
+import httpx
+import json
+from typing import Iterator, List, Optional, Tuple
+
+from app.metrics import UPSTREAM_ERRORS
+from app.services.retrieval import TranscriptIndex, format_passages
+from app.services.upstream import create_groq_client, deadline, upstream_error
 
 
 class QAService:
-    def __init__(self, api_key: str):
-        self.client = Groq(api_key=api_key)
-        self.audio_context = None
-    
-    def set_audio_context(self, transcription: str):
+    """
+    Stateless question answering: the audio context is passed with every call,
+    so one instance can serve concurrent requests from different sessions.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        top_k: int = 4,
+        http_client: Optional[httpx.Client] = None,
+        deadline_seconds: Optional[float] = None,
+    ):
+        self.client = create_groq_client(api_key, http_client)
+        self.top_k = top_k
+        self.deadline_seconds = deadline_seconds
+        self.model = "llama-3.3-70b-versatile"
+
+    def _context_for(self, question: str, audio_context: str, index: Optional[TranscriptIndex]) -> str:
+        if index is None or len(index) <= self.top_k:
+            return audio_context
+        return format_passages(index.search(question, self.top_k))
+
+    def _build_messages(self, question: str, audio_context: str, index: Optional[TranscriptIndex] = None) -> List[dict]:
+        prompt = f"""You are a helpful assistant that answers questions about audio content.
+
+Audio Content:
+{self._context_for(question, audio_context, index)}
+
+User Question: {question}
+
+Please provide a clear, concise answer based on the audio content above. If the question cannot be answered from the audio content, politely say so."""
+
+        return [
+            {
+                "role": "system",
+                "content": "You are a helpful assistant that answers questions about audio transcriptions accurately and concisely."
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+
+    def _build_batch_messages(
+        self, questions: List[str], audio_context: str, index: Optional[TranscriptIndex] = None
+    ) -> List[dict]:
+        if index is None or len(index) <= self.top_k:
+            context = audio_context
+        else:
+            context = format_passages(index.search_many(questions, self.top_k))
+        numbered = "\n".join(f"{i}. {question}" for i, question in enumerate(questions, 1))
+
+        prompt = f"""You are a helpful assistant that answers questions about audio content.
+
+Audio Content:
+{context}
+
+User Questions:
+{numbered}
+
+Please provide a clear, concise answer to each question based on the audio content above. If a question cannot be answered from the audio content, politely say so in its answer.
+Respond with a JSON object of the form {{"answers": ["answer to question 1", "answer to question 2", ...]}} containing exactly {len(questions)} answers in the order of the questions."""
+
+        return [
+            {
+                "role": "system",
+                "content": "You are a helpful assistant that answers questions about audio transcriptions accurately and concisely."
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+
+    def answer_questions(
+        self, questions: List[str], audio_context: str, index: Optional[TranscriptIndex] = None
+    ) -> Tuple[List[str], int]:
         """
-        Store the transcription of uploaded audio as context
+        Answer several questions about the same audio in one LLM call that shares
+        the context. Questions the model leaves unanswered are retried one by one.
+        Returns the answers and the number of LLM calls made.
         """
-        self.audio_context = transcription
-    
-    def answer_question(self, question: str) -> str:
+        if not audio_context:
+            return ["Please upload an audio file first."] * len(questions), 0
+        if len(questions) == 1:
+            return [self.answer_question(questions[0], audio_context, index)], 1
+
+        try:
+            with deadline(self.deadline_seconds):
+                chat_completion = self.client.chat.completions.create(
+                    messages=self._build_batch_messages(questions, audio_context, index),
+                    model=self.model,
+                    temperature=0.7,
+                    max_tokens=min(8192, 512 * len(questions)),
+                    response_format={"type": "json_object"},
+                )
+            content = chat_completion.choices[0].message.content
+
+        except Exception as e:
+            UPSTREAM_ERRORS.inc(service="llm", error=type(e).__name__)
+            raise upstream_error("Question answering failed", e)
+
+        try:
+            answers = json.loads(content)["answers"]
+        except (ValueError, KeyError, TypeError):
+            answers = []
+        if not isinstance(answers, list):
+            answers = []
+
+        results, calls = [], 1
+        for i, question in enumerate(questions):
+            if i < len(answers) and answers[i]:
+                results.append(str(answers[i]))
+            else:
+                results.append(self.answer_question(question, audio_context, index))
+                calls += 1
+        return results, calls
+
+    def answer_question(self, question: str, audio_context: str, index: Optional[TranscriptIndex] = None) -> str:
         """
-        Answer user's question based on audio context using Groq
+        Answer user's question based on audio context using Groq.
+        When a passage index is given, only the most relevant passages are sent.
         """
-        if not self.audio_context:
+        if not audio_context:
             return "Please upload an audio file first."
-        
+
         try:
-            prompt = f"""You are a helpful assistant that answers questions about audio content.
+            with deadline(self.deadline_seconds):
+                chat_completion = self.client.chat.completions.create(
+                    messages=self._build_messages(question, audio_context, index),
+                    model=self.model,
+                    temperature=0.7,
+                    max_tokens=1024,
+                )
 
-Audio Content:
-{self.audio_context}
+            return chat_completion.choices[0].message.content
 
-User Question: {question}
+        except Exception as e:
+            UPSTREAM_ERRORS.inc(service="llm", error=type(e).__name__)
+            raise upstream_error("Question answering failed", e)
 
-Please provide a clear, concise answer based on the audio content above. If the question cannot be answered from the audio content, politely say so."""
+    def stream_answer(
+        self, question: str, audio_context: str, index: Optional[TranscriptIndex] = None
+    ) -> Iterator[str]:
+        """
+        Answer user's question, yielding text deltas as the model generates them
+        """
+        if not audio_context:
+            yield "Please upload an audio file first."
+            return
+
+        try:
+            # The deadline covers getting the stream started, not reading it
+            with deadline(self.deadline_seconds):
+                stream = self.client.chat.completions.create(
+                    messages=self._build_messages(question, audio_context, index),
+                    model=self.model,
+                    temperature=0.7,
+                    max_tokens=1024,
+                    stream=True,
+                )
+
+            for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    yield delta
 
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a helpful assistant that answers questions about audio transcriptions accurately and concisely."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                model="llama-3.3-70b-versatile",
-                temperature=0.7,
-                max_tokens=1024,
-            )
-            
-            return chat_completion.choices[0].message.content
-        
         except Exception as e:
-            raise Exception(f"Question answering failed: {str(e)}")
\ No newline at end of file
+            UPSTREAM_ERRORS.inc(service="llm", error=type(e).__name__)
+            raise upstream_error("Question answering failed", e)
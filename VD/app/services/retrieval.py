@@ -0,0 +1,305 @@
+import hashlib
+import math
+import re
+import threading
+import zlib
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+STOPWORDS = frozenset("""
+a an and are as at be but by did do does for from had has have how i if in is it its
+me my of on or so that the their them then there these they this to was we were what
+when where which who why will with you your
+""".split())
+
+
+def tokenize(text: str, stopwords: frozenset = STOPWORDS) -> List[str]:
+    return [t for t in _TOKEN.findall(text.lower()) if t not in stopwords]
+
+
+def chunk_transcript(
+    text: str,
+    segments: Optional[List[Dict]] = None,
+    chunk_words: int = 120,
+    overlap_words: int = 30,
+) -> List[Dict]:
+    """
+    Split a transcript into overlapping passages of roughly chunk_words words.
+    When timestamped segments are available, passages follow segment boundaries
+    and carry start/end times.
+    """
+    if segments:
+        units = [(seg["text"].split(), seg.get("start"), seg.get("end")) for seg in segments]
+    else:
+        # Without timestamps, sentences are the smallest unit we avoid splitting
+        sentences = re.split(r"(?<=[.!?])\s+", text.strip())
+        units = [(sentence.split(), None, None) for sentence in sentences if sentence]
+
+    passages = []
+    current: List = []
+    current_words = 0
+    for unit in units:
+        current.append(unit)
+        current_words += len(unit[0])
+        if current_words >= chunk_words:
+            passages.append(current)
+            # Carry trailing units over so neighbouring passages overlap
+            carried = []
+            carried_words = 0
+            for prev in reversed(current):
+                if carried_words + len(prev[0]) > overlap_words:
+                    break
+                carried.insert(0, prev)
+                carried_words += len(prev[0])
+            current, current_words = carried, carried_words
+    if current and (not passages or current != passages[-1][-len(current):]):
+        passages.append(current)
+
+    return [
+        {
+            "text": " ".join(" ".join(words) for words, _, _ in passage),
+            "start": passage[0][1],
+            "end": passage[-1][2],
+        }
+        for passage in passages
+    ]
+
+
+class HashingEmbedder:
+    """
+    Dependency-free CPU text embedding: unigrams and bigrams hashed into a fixed
+    number of dimensions, TF-weighted and L2-normalised. Pass stopwords=frozenset()
+    to keep question words, e.g. when comparing questions rather than passages.
+    """
+
+    def __init__(self, dimensions: int = 1024, stopwords: frozenset = STOPWORDS):
+        self.dimensions = dimensions
+        self.stopwords = stopwords
+
+    def _features(self, text: str) -> List[int]:
+        tokens = tokenize(text, self.stopwords)
+        grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        return [zlib.crc32(g.encode("utf-8")) % self.dimensions for g in grams]
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            features = self._features(text)
+            if features:
+                np.add.at(matrix[row], features, 1.0)
+        np.log1p(matrix, out=matrix)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+
+class TranscriptIndex:
+    """
+    Chunk-level search index over a session's transcripts: BM25 over an
+    inverted index, optionally fused with cosine similarity from a hashed
+    embedding index. Transcripts can be added later (add_transcripts) at a
+    cost that depends only on the new text, so a recording that grows part by
+    part is never re-indexed from the start.
+    """
+
+    def __init__(
+        self,
+        passages: List[Dict],
+        use_embeddings: bool = False,
+        k1: float = 1.5,
+        b: float = 0.75,
+    ):
+        self.passages: List[Dict] = []
+        self.k1 = k1
+        self.b = b
+
+        self.postings: Dict[str, List] = defaultdict(list)
+        self._doc_lengths = np.zeros(max(16, len(passages)), dtype=np.float32)
+        self._total_length = 0.0
+
+        self.embedder = HashingEmbedder() if use_embeddings else None
+        self._embeddings = (
+            np.zeros((len(self._doc_lengths), self.embedder.dimensions), dtype=np.float32) if self.embedder else None
+        )
+
+        # Transcripts indexed so far: their IDs, recording numbers and a rolling digest of their text
+        self.transcript_ids: List[str] = []
+        self.recordings = set()
+        self.digest = ""
+        self._texts: List[str] = []
+        self._context: Optional[str] = None
+        # Searches run on worker threads while another request may be adding transcripts
+        self._lock = threading.Lock()
+
+        self._add_passages(passages)
+
+    @classmethod
+    def from_transcript(cls, text: str, segments: Optional[List[Dict]] = None, **kwargs) -> "TranscriptIndex":
+        return cls(chunk_transcript(text, segments), **kwargs)
+
+    @classmethod
+    def from_transcripts(cls, transcripts: List[Dict], **kwargs) -> "TranscriptIndex":
+        """
+        Index several transcripts of one session; passages are labelled with
+        their recording number when there is more than one recording
+        """
+        index = cls([], **kwargs)
+        index.add_transcripts(transcripts)
+        return index
+
+    @property
+    def doc_lengths(self) -> np.ndarray:
+        return self._doc_lengths[:len(self.passages)]
+
+    @property
+    def avg_doc_length(self) -> float:
+        return self._total_length / len(self.passages) if self.passages else 0.0
+
+    @property
+    def embeddings(self) -> Optional[np.ndarray]:
+        return self._embeddings[:len(self.passages)] if self._embeddings is not None else None
+
+    @property
+    def context(self) -> str:
+        """
+        Full text of the indexed transcripts, joined on first use after a change
+        """
+        with self._lock:
+            if self._context is None:
+                self._context = "\n\n".join(self._texts)
+            return self._context
+
+    def _idf(self, term: str) -> float:
+        n_docs = len(self.passages)
+        df = len(self.postings[term])
+        return math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+
+    def _add_passages(self, passages: List[Dict]):
+        n = len(self.passages)
+        needed = n + len(passages)
+        if needed > len(self._doc_lengths):
+            # Grow geometrically so appends stay amortised O(new passages)
+            capacity = max(needed, 2 * len(self._doc_lengths))
+            self._doc_lengths = np.resize(self._doc_lengths, capacity)
+            if self._embeddings is not None:
+                grown = np.zeros((capacity, self._embeddings.shape[1]), dtype=np.float32)
+                grown[:n] = self._embeddings[:n]
+                self._embeddings = grown
+
+        for doc_id, passage in enumerate(passages, start=n):
+            counts = Counter(tokenize(passage["text"]))
+            length = sum(counts.values())
+            self._doc_lengths[doc_id] = length
+            self._total_length += length
+            for term, tf in counts.items():
+                self.postings[term].append((doc_id, tf))
+        if self._embeddings is not None and passages:
+            self._embeddings[n:needed] = self.embedder.embed([p["text"] for p in passages])
+        self.passages.extend(passages)
+
+    def add_transcripts(self, transcripts: List[Dict]):
+        """
+        Index transcripts not seen before (in session order). Passages of an
+        appended part carry timestamps within the whole recording.
+        """
+        with self._lock:
+            known = set(self.transcript_ids)
+            passages = []
+            for transcript in transcripts:
+                if transcript["transcript_id"] in known:
+                    continue
+                number = transcript.get("recording") or len(self.transcript_ids) + 1
+                was_single = len(self.recordings) == 1
+                self.recordings.add(number)
+                if was_single and len(self.recordings) > 1:
+                    # The session just gained a second recording; label what was indexed before
+                    first = next(iter(self.recordings - {number}))
+                    for passage in self.passages + passages:
+                        passage.setdefault("recording", first)
+
+                for passage in chunk_transcript(transcript["text"], transcript.get("segments")):
+                    if len(self.recordings) > 1:
+                        passage["recording"] = number
+                    passages.append(passage)
+
+                self.transcript_ids.append(transcript["transcript_id"])
+                text_digest = hashlib.sha256(transcript["text"].encode("utf-8")).hexdigest()
+                self.digest = hashlib.sha256(f"{self.digest}|{text_digest}".encode("utf-8")).hexdigest()
+                self._texts.append(transcript["text"])
+                self._context = None
+            self._add_passages(passages)
+
+    def __len__(self):
+        return len(self.passages)
+
+    def bm25_scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(len(self.passages), dtype=np.float32)
+        if not self.passages:
+            return scores
+        length_norm = self.k1 * (1 - self.b + self.b * self.doc_lengths / max(self.avg_doc_length, 1e-9))
+        for term in set(tokenize(query)):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            doc_ids = np.fromiter((d for d, _ in docs), dtype=np.int64, count=len(docs))
+            tfs = np.fromiter((tf for _, tf in docs), dtype=np.float32, count=len(docs))
+            scores[doc_ids] += self._idf(term) * tfs * (self.k1 + 1) / (tfs + length_norm[doc_ids])
+        return scores
+
+    def embedding_scores(self, query: str) -> np.ndarray:
+        return self.embeddings @ self.embedder.embed([query])[0]
+
+    def _top_indices(self, query: str, k: int) -> List[int]:
+        if len(self.passages) <= k:
+            return list(range(len(self.passages)))
+
+        scores = self.bm25_scores(query)
+        if self.embeddings is not None:
+            # Reciprocal rank fusion keeps the two score scales from fighting
+            fused = np.zeros(len(self.passages), dtype=np.float32)
+            for ranking in (scores, self.embedding_scores(query)):
+                ranks = np.empty(len(ranking), dtype=np.int64)
+                ranks[np.argsort(-ranking, kind="stable")] = np.arange(len(ranking))
+                fused += 1.0 / (60 + ranks)
+            scores = fused
+
+        return np.argpartition(-scores, k - 1)[:k].tolist()
+
+    def search(self, query: str, k: int = 4) -> List[Dict]:
+        """
+        Return the k most relevant passages, in transcript order
+        """
+        with self._lock:
+            return [self.passages[i] for i in sorted(self._top_indices(query, k))]
+
+    def search_many(self, queries: List[str], k: int = 4) -> List[Dict]:
+        """
+        Union of the k most relevant passages for each query, de-duplicated and
+        in transcript order, so several questions can share one context
+        """
+        top = set()
+        with self._lock:
+            for query in queries:
+                top.update(self._top_indices(query, k))
+            return [self.passages[i] for i in sorted(top)]
+
+
+def format_passages(passages: List[Dict]) -> str:
+    """
+    Render retrieved passages for the prompt, with timestamps when known
+    """
+    blocks = []
+    for passage in passages:
+        labels = []
+        if passage.get("recording") is not None:
+            labels.append(f"Recording {passage['recording']}")
+        if passage.get("start") is not None:
+            labels.append(f"{passage['start']:.0f}s - {passage['end']:.0f}s")
+        prefix = f"[{', '.join(labels)}] " if labels else ""
+        blocks.append(f"{prefix}{passage['text']}")
+    return "\n\n".join(blocks)
@@ -0,0 +1,409 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+
+class AppendError(ValueError):
+    """
+    An appended part can't be placed in the session's latest recording
+    """
+
+
+class SessionStore(ABC):
+    """
+    Stores the transcripts uploaded in each session.
+
+    Sessions expire after ttl_seconds without access, and the least recently
+    used sessions are evicted once there are more than max_sessions or the
+    stored transcripts exceed max_bytes. Listeners registered with
+    add_eviction_listener are called with the session ID of each evicted session.
+    """
+
+    def __init__(self, ttl_seconds: float = 3600, max_sessions: int = 1000, max_bytes: int = 256 * 1024 * 1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._listeners: List[Callable[[str], None]] = []
+
+    def add_eviction_listener(self, callback: Callable[[str], None]):
+        self._listeners.append(callback)
+
+    def _notify_evicted(self, session_ids: List[str]):
+        for session_id in session_ids:
+            for callback in self._listeners:
+                callback(session_id)
+
+    @staticmethod
+    def _transcript_record(text: str, segments: Optional[List[Dict]], duration: Optional[float] = None) -> Dict:
+        if duration is None and segments:
+            duration = segments[-1]["end"]
+        return {
+            "transcript_id": str(uuid.uuid4()),
+            "text": text,
+            "segments": segments,
+            "created_at": time.time(),
+            "recording": 1,
+            "offset": 0.0,
+            "duration": duration,
+        }
+
+    @staticmethod
+    def _place(record: Dict, last: Optional[Dict], append: bool):
+        """
+        Number the record's recording and, for an appended part, start it where
+        the previous part ended, shifting its segment timestamps to match
+        """
+        if last is None:
+            return
+        if not append:
+            record["recording"] = (last["recording"] or 0) + 1
+            return
+        previous_length = last["duration"]
+        if previous_length is None and last.get("segments"):
+            # Stored segments are already offset within the recording
+            previous_length = last["segments"][-1]["end"] - (last["offset"] or 0.0)
+        if previous_length is None:
+            raise AppendError("The previous part's length is unknown, so the new part can't be placed after it")
+        record["recording"] = last["recording"] or 1
+        record["offset"] = (last["offset"] or 0.0) + previous_length
+        if record["segments"]:
+            record["segments"] = [
+                {**seg, "start": seg["start"] + record["offset"], "end": seg["end"] + record["offset"]}
+                for seg in record["segments"]
+            ]
+
+    @staticmethod
+    def _record_bytes(record: Dict) -> int:
+        size = len(record["text"].encode("utf-8"))
+        if record.get("segments"):
+            size += len(json.dumps(record["segments"]))
+        return size
+
+    def add_transcript(self, session_id: str, text: str, segments: Optional[List[Dict]] = None,
+                       replace: bool = False, duration: Optional[float] = None) -> str:
+        """
+        Add a transcript of a new recording to the session (creating it if
+        needed) and return its ID. With replace=True the session's previous
+        transcripts are dropped.
+        """
+        return self._add(session_id, text, segments, replace, duration, append=False)["transcript_id"]
+
+    def append_transcript(self, session_id: str, text: str, segments: Optional[List[Dict]] = None,
+                          duration: Optional[float] = None) -> Dict:
+        """
+        Add a transcript as the next part of the session's latest recording:
+        it starts where the previous part ended (offset, in seconds) and its
+        segment timestamps are shifted accordingly. Returns the stored record;
+        raises AppendError when the previous part's length is unknown.
+        """
+        return self._add(session_id, text, segments, False, duration, append=True)
+
+    @abstractmethod
+    def _add(self, session_id: str, text: str, segments: Optional[List[Dict]], replace: bool,
+             duration: Optional[float], append: bool) -> Dict:
+        pass
+
+    @abstractmethod
+    def get_transcripts(self, session_id: str, start: int = 0) -> List[Dict]:
+        """
+        Return the session's transcripts in upload order (empty if unknown or
+        expired), skipping the first start of them
+        """
+
+    def transcript_ids(self, session_id: str) -> List[str]:
+        """
+        Return the IDs of the session's transcripts in upload order
+        """
+        return [t["transcript_id"] for t in self.get_transcripts(session_id)]
+
+    @abstractmethod
+    def delete_session(self, session_id: str):
+        pass
+
+    @abstractmethod
+    def stats(self) -> Dict:
+        pass
+
+    def has_session(self, session_id: str) -> bool:
+        return bool(self.transcript_ids(session_id))
+
+    def get_context(self, session_id: str) -> Optional[str]:
+        """
+        Return the session's transcripts joined into one context string
+        """
+        transcripts = self.get_transcripts(session_id)
+        if not transcripts:
+            return None
+        return "\n\n".join(t["text"] for t in transcripts)
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    Session store local to one process
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # session_id -> {"transcripts": [...], "last_access": float, "bytes": int}
+        self._sessions: "OrderedDict[str, Dict]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def _evict_locked(self, now: float) -> List[str]:
+        evicted = []
+        expired = [sid for sid, s in self._sessions.items() if now - s["last_access"] > self.ttl_seconds]
+        for session_id in expired:
+            self._total_bytes -= self._sessions.pop(session_id)["bytes"]
+            evicted.append(session_id)
+        while self._sessions and (len(self._sessions) > self.max_sessions or self._total_bytes > self.max_bytes):
+            session_id, session = self._sessions.popitem(last=False)
+            self._total_bytes -= session["bytes"]
+            evicted.append(session_id)
+        return evicted
+
+    def _add(self, session_id: str, text: str, segments: Optional[List[Dict]], replace: bool,
+             duration: Optional[float], append: bool) -> Dict:
+        record = self._transcript_record(text, segments, duration)
+        size = self._record_bytes(record)
+        if size > self.max_bytes:
+            raise ValueError("Transcript is larger than the session store memory cap")
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or replace:
+                if session is not None:
+                    self._total_bytes -= session["bytes"]
+                session = {"transcripts": [], "bytes": 0}
+                self._sessions[session_id] = session
+            self._place(record, session["transcripts"][-1] if session["transcripts"] else None, append)
+            session["transcripts"].append(record)
+            session["bytes"] += size
+            session["last_access"] = now
+            self._total_bytes += size
+            self._sessions.move_to_end(session_id)
+            evicted = self._evict_locked(now)
+        self._notify_evicted(evicted)
+        return record
+
+    def get_transcripts(self, session_id: str, start: int = 0) -> List[Dict]:
+        now = time.time()
+        with self._lock:
+            evicted = self._evict_locked(now)
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session["last_access"] = now
+                self._sessions.move_to_end(session_id)
+                transcripts = session["transcripts"][start:]
+            else:
+                transcripts = []
+        self._notify_evicted(evicted)
+        return transcripts
+
+    def delete_session(self, session_id: str):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is not None:
+                self._total_bytes -= session["bytes"]
+        if session is not None:
+            self._notify_evicted([session_id])
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "sessions": len(self._sessions),
+                "bytes": self._total_bytes,
+            }
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Session store in a SQLite database file, shared by every worker process on the host
+    """
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._connect().conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                last_access REAL NOT NULL,
+                bytes INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access);
+            CREATE TABLE IF NOT EXISTS transcripts (
+                transcript_id TEXT PRIMARY KEY,
+                session_id TEXT NOT NULL REFERENCES sessions (session_id) ON DELETE CASCADE,
+                text TEXT NOT NULL,
+                segments TEXT,
+                bytes INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                recording INTEGER,
+                offset REAL,
+                duration REAL
+            );
+            CREATE INDEX IF NOT EXISTS transcripts_session ON transcripts (session_id, created_at);
+        """)
+        # Databases created before append mode lack the recording columns
+        columns = {row[1] for row in self._connect().conn.execute("PRAGMA table_info(transcripts)")}
+        for column, kind in (("recording", "INTEGER"), ("offset", "REAL"), ("duration", "REAL")):
+            if column not in columns:
+                self._connect().conn.execute(f"ALTER TABLE transcripts ADD COLUMN {column} {kind}")
+
+    def _connect(self) -> "_Transaction":
+        # One connection per thread; WAL lets readers in other workers proceed during writes
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = _Transaction(conn)
+        return self._local.conn
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> List[str]:
+        cutoff = now - self.ttl_seconds
+        evicted = [row[0] for row in conn.execute(
+            "SELECT session_id FROM sessions WHERE last_access < ?", (cutoff,)
+        )]
+        count, total = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM sessions WHERE last_access >= ?", (cutoff,)
+        ).fetchone()
+        if count > self.max_sessions or total > self.max_bytes:
+            for session_id, size in conn.execute(
+                "SELECT session_id, bytes FROM sessions WHERE last_access >= ? ORDER BY last_access", (cutoff,)
+            ).fetchall():
+                if count <= self.max_sessions and total <= self.max_bytes:
+                    break
+                evicted.append(session_id)
+                count -= 1
+                total -= size
+        conn.executemany("DELETE FROM sessions WHERE session_id = ?", [(sid,) for sid in evicted])
+        return evicted
+
+    def _add(self, session_id: str, text: str, segments: Optional[List[Dict]], replace: bool,
+             duration: Optional[float], append: bool) -> Dict:
+        record = self._transcript_record(text, segments, duration)
+        size = self._record_bytes(record)
+        if size > self.max_bytes:
+            raise ValueError("Transcript is larger than the session store memory cap")
+        now = time.time()
+        with self._connect() as conn:
+            if replace:
+                conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            last = conn.execute(
+                "SELECT recording, offset, duration, segments FROM transcripts WHERE session_id = ? "
+                "ORDER BY created_at DESC, rowid DESC LIMIT 1",
+                (session_id,),
+            ).fetchone()
+            if last is not None:
+                recording, offset, last_duration, last_segments = last
+                last = {
+                    "recording": recording,
+                    "offset": offset,
+                    "duration": last_duration,
+                    "segments": json.loads(last_segments) if last_segments else None,
+                }
+            self._place(record, last, append)
+            conn.execute(
+                "INSERT INTO sessions (session_id, last_access, bytes) VALUES (?, ?, ?) "
+                "ON CONFLICT (session_id) DO UPDATE SET last_access = excluded.last_access, "
+                "bytes = bytes + excluded.bytes",
+                (session_id, now, size),
+            )
+            conn.execute(
+                "INSERT INTO transcripts (transcript_id, session_id, text, segments, bytes, created_at, "
+                "recording, offset, duration) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (record["transcript_id"], session_id, text,
+                 json.dumps(record["segments"]) if record["segments"] else None, size, record["created_at"],
+                 record["recording"], record["offset"], record["duration"]),
+            )
+            evicted = self._evict(conn, now)
+        self._notify_evicted(evicted)
+        return record
+
+    def get_transcripts(self, session_id: str, start: int = 0) -> List[Dict]:
+        now = time.time()
+        with self._connect() as conn:
+            evicted = self._evict(conn, now)
+            conn.execute("UPDATE sessions SET last_access = ? WHERE session_id = ?", (now, session_id))
+            rows = conn.execute(
+                "SELECT transcript_id, text, segments, created_at, recording, offset, duration FROM transcripts "
+                "WHERE session_id = ? ORDER BY created_at, rowid LIMIT -1 OFFSET ?",
+                (session_id, start),
+            ).fetchall()
+        self._notify_evicted(evicted)
+        return [
+            {
+                "transcript_id": transcript_id,
+                "text": text,
+                "segments": json.loads(segments) if segments else None,
+                "created_at": created_at,
+                "recording": recording,
+                "offset": offset,
+                "duration": duration,
+            }
+            for transcript_id, text, segments, created_at, recording, offset, duration in rows
+        ]
+
+    def transcript_ids(self, session_id: str) -> List[str]:
+        now = time.time()
+        with self._connect() as conn:
+            evicted = self._evict(conn, now)
+            conn.execute("UPDATE sessions SET last_access = ? WHERE session_id = ?", (now, session_id))
+            rows = conn.execute(
+                "SELECT transcript_id FROM transcripts WHERE session_id = ? ORDER BY created_at, rowid",
+                (session_id,),
+            ).fetchall()
+        self._notify_evicted(evicted)
+        return [row[0] for row in rows]
+
+    def delete_session(self, session_id: str):
+        with self._connect() as conn:
+            deleted = conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,)).rowcount
+        if deleted:
+            self._notify_evicted([session_id])
+
+    def stats(self) -> Dict:
+        with self._connect() as conn:
+            count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM sessions").fetchone()
+        return {"backend": "sqlite", "sessions": count, "bytes": total}
+
+
+class _Transaction:
+    """
+    Wraps a connection so `with store._connect() as conn:` runs one
+    BEGIN IMMEDIATE ... COMMIT transaction (serialising writers across processes)
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+def create_session_store(url: str, **kwargs) -> SessionStore:
+    """
+    Build a session store from a URL: "memory://" or "sqlite:///path/to/sessions.db"
+    """
+    if url in ("memory", "memory://"):
+        return InMemorySessionStore(**kwargs)
+    if url.startswith("sqlite:///"):
+        return SQLiteSessionStore(url[len("sqlite:///"):], **kwargs)
+    raise ValueError(f"Unsupported session store URL: {url}")
@@ -0,0 +1,39 @@
+import re
+from typing import Iterable, Iterator, List, Tuple
+
+
+# A sentence ends at . ! or ? (optionally followed by closing quotes/brackets) and whitespace
+_SENTENCE_END = re.compile(r"(?<=[.!?])[\"')\]]*\s+")
+
+# Very short fragments ("Dr.", "1.") are merged with the following text
+MIN_SENTENCE_CHARS = 20
+
+
+def split_sentences(buffer: str) -> Tuple[List[str], str]:
+    """
+    Split complete sentences off the front of buffer.
+    Returns (sentences, remainder) where the remainder is still being generated.
+    """
+    sentences = []
+    start = 0
+    for match in _SENTENCE_END.finditer(buffer):
+        candidate = buffer[start:match.end()].strip()
+        if len(candidate) < MIN_SENTENCE_CHARS:
+            continue
+        sentences.append(candidate)
+        start = match.end()
+    return sentences, buffer[start:]
+
+
+def iter_sentences(deltas: Iterable[str]) -> Iterator[str]:
+    """
+    Re-chunk a stream of text deltas into whole sentences
+    """
+    buffer = ""
+    for delta in deltas:
+        buffer += delta
+        sentences, buffer = split_sentences(buffer)
+        yield from sentences
+    if buffer.strip():
+        yield buffer.strip()
+
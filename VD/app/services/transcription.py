@@ -1,31 +1,249 @@
+import httpx
+import json
 import os
-from groq import Groq
 from pathlib import Path
+from typing import Awaitable, BinaryIO, Callable, Dict, Optional, Tuple
+
+from app.metrics import PAYLOAD_BYTES, UPSTREAM_ERRORS
+from app.services.cache import TranscriptionCache, sha256_file
+from app.services.engines import STTEngine, create_stt_engine
+from app.services.long_audio import transcribe_in_segments, transcribe_in_segments_staged
+from app.services.preprocess import AudioPreprocessor
+from app.services.upstream import deadline, upstream_error
 
 
 class TranscriptionService:
-    def __init__(self, api_key: str):
-        self.client = Groq(api_key=api_key)
-    
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        cache: Optional[TranscriptionCache] = None,
+        http_client: Optional[httpx.Client] = None,
+        engine: Optional[STTEngine] = None,
+        preprocessor: Optional[AudioPreprocessor] = None,
+        deadline_seconds: Optional[float] = None,
+    ):
+        # Groq Whisper unless a different engine is configured for the deployment
+        self.engine = engine or create_stt_engine("groq", api_key, http_client)
+        self.cache = cache
+        self.model = self.engine.model_id
+        self.language = "en"
+        self.preprocessor = preprocessor
+        # Upper bound on each engine call, retries included
+        self.deadline_seconds = deadline_seconds
+
+    def _prepare(self, audio_file: BinaryIO, filename: str, preprocessor: Optional[AudioPreprocessor] = None):
+        """
+        Run the preprocessor (this service's unless another is given) if there
+        is one, falling back to the original audio when it can't be decoded or
+        wouldn't get smaller
+        """
+        preprocessor = preprocessor or self.preprocessor
+        if preprocessor is None:
+            return audio_file, filename
+        try:
+            processed = preprocessor.process(audio_file, filename)
+        except Exception:
+            processed = None
+        audio_file.seek(0)
+        if processed is None:
+            return audio_file, filename
+        PAYLOAD_BYTES.observe(len(processed[0]), kind="preprocessed")
+        return processed
+
     def transcribe_audio(self, audio_file_path: str) -> str:
         """
-        Transcribe audio file using Groq's Whisper API
+        Transcribe audio file with the configured engine (Groq's Whisper API by default)
+        """
+        with open(audio_file_path, "rb") as file:
+            return self.transcribe_file(file, Path(audio_file_path).name)
+
+    def transcribe_file(
+        self,
+        audio_file: BinaryIO,
+        filename: str,
+        audio_sha256: Optional[str] = None,
+        prepared: Optional[Tuple[bytes, str]] = None,
+    ) -> str:
+        """
+        Transcribe an open binary file (e.g. a spooled upload). The file is streamed
+        to the engine rather than read into memory; pass audio_sha256 when the
+        content hash is already known to skip re-hashing it for the cache lookup.
+        prepared is the (audio, filename) output of this service's preprocessor
+        when it already ran elsewhere (e.g. in a worker process).
         """
         try:
-            with open(audio_file_path, "rb") as file:
-                transcription = self.client.audio.transcriptions.create(
-                    file=(Path(audio_file_path).name, file.read()),
-                    model="whisper-large-v3",
-                    response_format="text",
-                    language="en",
-                    temperature=0.0
-                )
+            # Identical audio with identical parameters always yields the same text
+            cache_key = None
+            if self.cache is not None:
+                audio_sha256 = audio_sha256 or sha256_file(audio_file)
+                model = self.model
+                if self.preprocessor is not None:
+                    model = f"{model}:{self.preprocessor.signature}"
+                cache_key = TranscriptionCache.make_key(audio_sha256, model, self.language)
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    return cached
+
+            audio_file.seek(0)
+            audio, filename = prepared or self._prepare(audio_file, filename)
+            with deadline(self.deadline_seconds):
+                transcription = self.engine.transcribe(audio, filename, self.language)["text"]
+
+            if cache_key is not None:
+                self.cache.put(cache_key, transcription)
             return transcription
         except Exception as e:
-            raise Exception(f"Transcription failed: {str(e)}")
-    
+            UPSTREAM_ERRORS.inc(service="stt", error=type(e).__name__)
+            raise upstream_error("Transcription failed", e)
+
+    def transcribe_file_segments(self, audio_file: BinaryIO, filename: str, audio_sha256: Optional[str] = None) -> Dict:
+        """
+        Transcribe an open binary file keeping Whisper's segment timestamps.
+        Timestamps must match the original audio, so silence is not trimmed.
+        """
+        try:
+            cache_key = None
+            preprocessor = None
+            if self.preprocessor is not None:
+                preprocessor = AudioPreprocessor(
+                    self.preprocessor.output_format, self.preprocessor.target_rate, trim_silence=False
+                )
+            if self.cache is not None:
+                audio_sha256 = audio_sha256 or sha256_file(audio_file)
+                model = f"{self.model}:timestamps"
+                if preprocessor is not None:
+                    model = f"{model}:{preprocessor.signature}"
+                cache_key = TranscriptionCache.make_key(audio_sha256, model, self.language)
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    return json.loads(cached)
+
+            audio_file.seek(0)
+            audio, filename = self._prepare(audio_file, filename, preprocessor)
+            with deadline(self.deadline_seconds):
+                result = self.engine.transcribe(audio, filename, self.language, timestamps=True)
+            result = {"text": result["text"], "segments": result.get("segments") or []}
+
+            if cache_key is not None:
+                self.cache.put(cache_key, json.dumps(result))
+            return result
+        except Exception as e:
+            UPSTREAM_ERRORS.inc(service="stt", error=type(e).__name__)
+            raise upstream_error("Transcription failed", e)
+
+    def transcribe_clip(self, audio_bytes: bytes, filename: str) -> str:
+        """
+        Transcribe a short in-memory clip of live speech. Clips are never repeated
+        and are already compact, so the cache and preprocessor are skipped.
+        """
+        try:
+            with deadline(self.deadline_seconds):
+                return self.engine.transcribe(audio_bytes, filename, self.language)["text"]
+        except Exception as e:
+            UPSTREAM_ERRORS.inc(service="stt", error=type(e).__name__)
+            raise upstream_error("Transcription failed", e)
+
+    def transcribe_segment(self, audio_bytes: bytes, name: str) -> Dict:
+        """
+        Transcribe one segment of a long recording, keeping Whisper's segment timestamps
+        """
+        with deadline(self.deadline_seconds):
+            return self.engine.transcribe(audio_bytes, name, self.language, timestamps=True)
+
+    def _long_audio_cache_key(
+        self, audio_file_path: str, segment_seconds: float, overlap_seconds: float, audio_sha256: Optional[str]
+    ) -> Optional[str]:
+        if self.cache is None:
+            return None
+        model = f"{self.model}:segmented:{segment_seconds}:{overlap_seconds}"
+        if audio_sha256:
+            return TranscriptionCache.make_key(audio_sha256, model, self.language)
+        return TranscriptionCache.make_file_key(audio_file_path, model, self.language)
+
+    def _cached_long_audio(self, cache_key: Optional[str]) -> Optional[Dict]:
+        cached = self.cache.get(cache_key) if cache_key is not None else None
+        return json.loads(cached) if cached is not None else None
+
+    def _store_long_audio(self, cache_key: Optional[str], result: Dict):
+        if cache_key is not None:
+            self.cache.put(cache_key, json.dumps(result))
+
+    def transcribe_long_audio(
+        self,
+        audio_file_path: str,
+        segment_seconds: float = 300,
+        overlap_seconds: float = 2,
+        parallelism: int = 4,
+        audio_sha256: Optional[str] = None,
+        on_progress: Optional[Callable[[float], None]] = None,
+    ) -> Dict:
+        """
+        Transcribe a long recording by splitting it at silences and transcribing
+        the overlapping segments concurrently. Returns the stitched text and
+        timestamped segments.
+        """
+        try:
+            cache_key = self._long_audio_cache_key(audio_file_path, segment_seconds, overlap_seconds, audio_sha256)
+            cached = self._cached_long_audio(cache_key)
+            if cached is not None:
+                return cached
+
+            result = transcribe_in_segments(
+                audio_file_path,
+                self.transcribe_segment,
+                segment_seconds=segment_seconds,
+                overlap_seconds=overlap_seconds,
+                parallelism=parallelism,
+                on_progress=on_progress,
+            )
+
+            self._store_long_audio(cache_key, result)
+            return result
+        except Exception as e:
+            UPSTREAM_ERRORS.inc(service="stt", error=type(e).__name__)
+            raise upstream_error("Transcription failed", e)
+
+    async def transcribe_long_audio_staged(
+        self,
+        audio_file_path: str,
+        run: Callable[..., Awaitable],
+        segment_seconds: float = 300,
+        overlap_seconds: float = 2,
+        parallelism: int = 4,
+        audio_sha256: Optional[str] = None,
+        on_progress: Optional[Callable[[float], None]] = None,
+    ) -> Dict:
+        """
+        transcribe_long_audio() for the event loop, with each step run through
+        run(stage, func, *args) (a StageExecutor's run) so every segment's
+        upstream call takes its own "stt" slot
+        """
+        try:
+            cache_key = await run(
+                "io", self._long_audio_cache_key, audio_file_path, segment_seconds, overlap_seconds, audio_sha256
+            )
+            cached = await run("io", self._cached_long_audio, cache_key)
+            if cached is not None:
+                return cached
+
+            result = await transcribe_in_segments_staged(
+                audio_file_path,
+                self.transcribe_segment,
+                run,
+                segment_seconds=segment_seconds,
+                overlap_seconds=overlap_seconds,
+                parallelism=parallelism,
+                on_progress=on_progress,
+            )
+
+            await run("io", self._store_long_audio, cache_key, result)
+            return result
+        except Exception as e:
+            UPSTREAM_ERRORS.inc(service="stt", error=type(e).__name__)
+            raise upstream_error("Transcription failed", e)
+
     def transcribe_question(self, question_audio_path: str) -> str:
         """
         Transcribe user's question audio
         """
-        return self.transcribe_audio(question_audio_path)
\ No newline at end of file
+        return self.transcribe_audio(question_audio_path)
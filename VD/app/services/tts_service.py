@@ -1,25 +1,86 @@
-from gtts import gTTS
+import hashlib
 import os
 from pathlib import Path
+from typing import Optional
+
+from app.metrics import UPSTREAM_ERRORS
+from app.services.cache import DiskCache, SynthesisCache
+from app.services.engines import TTSEngine, create_tts_engine
+from app.services.streaming import iter_sentences
+from app.services.upstream import upstream_error
 
 
 class TTSService:
-    def __init__(self, output_dir: str = "outputs"):
+    def __init__(
+        self,
+        output_dir: str = "outputs",
+        lang: str = "en",
+        voice: str = "com",
+        phrase_cache: Optional[SynthesisCache] = None,
+        output_store: Optional[DiskCache] = None,
+        engine: Optional[TTSEngine] = None,
+    ):
         self.output_dir = output_dir
+        self.engine = engine or create_tts_engine("gtts")
+        self.lang = lang
+        # For gTTS the voice is the Google Translate top-level domain (accent)
+        self.voice = voice
+        self.phrase_cache = phrase_cache
+        self.output_store = output_store
         os.makedirs(output_dir, exist_ok=True)
-    
-    def text_to_speech(self, text: str, output_filename: str = "response.mp3") -> str:
+
+    def _synthesize_phrase(self, text: str) -> bytes:
+        text = SynthesisCache.normalize_text(text)
+        cache_key = None
+        if self.phrase_cache is not None:
+            cache_key = SynthesisCache.make_key(text, self.lang, f"{self.engine.name}:{self.voice}")
+            cached = self.phrase_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        audio = self.engine.synthesize(text, self.lang, self.voice)
+
+        if cache_key is not None:
+            self.phrase_cache.put(cache_key, audio)
+        return audio
+
+    def _synthesize(self, text: str) -> bytes:
+        return b"".join(self._synthesize_phrase(sentence) for sentence in iter_sentences([text]))
+
+    def synthesize(self, text: str) -> bytes:
+        """
+        Convert text to speech and return the MP3 bytes without touching disk.
+        Each sentence is synthesized (or fetched from the phrase cache) separately
+        and the MP3 frames are concatenated.
+        """
+        try:
+            return self._synthesize(text)
+
+        except Exception as e:
+            UPSTREAM_ERRORS.inc(service="tts", error=type(e).__name__)
+            raise upstream_error("Text-to-speech conversion failed", e)
+
+    def text_to_speech(self, text: str, output_filename: Optional[str] = None) -> str:
         """
-        Convert text to speech and save as audio file
+        Convert text to speech and save as audio file.
+        With an output store the file is named after a hash of its content,
+        so identical answers share one file.
         """
         try:
-            output_path = os.path.join(self.output_dir, output_filename)
-            
-            # Create speech
-            tts = gTTS(text=text, lang='en', slow=False)
-            tts.save(output_path)
-            
+            audio = self._synthesize(text)
+
+            if self.output_store is not None:
+                key = hashlib.sha256(audio).hexdigest()[:32]
+                if not self.output_store.touch(key):
+                    self.output_store.put(key, audio)
+                return self.output_store.path_for(key)
+
+            output_path = os.path.join(self.output_dir, output_filename or "response.mp3")
+            with open(output_path, "wb") as f:
+                f.write(audio)
+
             return output_path
-        
+
         except Exception as e:
-            raise Exception(f"Text-to-speech conversion failed: {str(e)}")
\ No newline at end of file
+            UPSTREAM_ERRORS.inc(service="tts", error=type(e).__name__)
+            raise upstream_error("Text-to-speech conversion failed", e)
@@ -0,0 +1,403 @@
+"""
+Resilient HTTP layer shared by every upstream API client: keep-alive pooling,
+per-call deadlines, retries with jittered exponential backoff, optional hedged
+requests, a token bucket that honours rate-limit headers and a circuit breaker
+per host.
+"""
+import contextvars
+import random
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional
+
+import groq
+import httpx
+
+from app.metrics import UPSTREAM_HEDGES, UPSTREAM_REQUESTS, UPSTREAM_RETRIES
+
+
+RETRY_STATUSES = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+
+class DeadlineExceeded(httpx.TimeoutException):
+    pass
+
+
+class CircuitOpen(httpx.TransportError):
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class UpstreamError(Exception):
+    """
+    An upstream call failed; status_code is what the API should answer with
+    """
+
+    def __init__(self, message: str, status_code: int = 502, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+# Absolute time.monotonic() by which the current call must finish, if any
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("upstream_deadline", default=None)
+
+
+@contextmanager
+def deadline(seconds: Optional[float]):
+    """
+    Bound every upstream request made in this block, retries and rate-limit
+    waits included, to finish within `seconds` (None leaves it unbounded).
+    Nested deadlines can only shorten the outer one.
+    """
+    if seconds is None:
+        yield
+        return
+    at = time.monotonic() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(at if outer is None else min(at, outer))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """
+    Parse rate-limit reset values such as "7.66s", "2m59.56s" or "120ms" (or plain seconds)
+    """
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * _UNITS[unit] for number, unit in parts)
+
+
+def retry_after_seconds(headers) -> Optional[float]:
+    return parse_duration(headers.get("retry-after"))
+
+
+class TokenBucket:
+    """
+    Client-side rate limiter. rate is requests per second (0 = no local limit);
+    the bucket also stops handing out tokens while the provider says the quota
+    is exhausted (remaining = 0 until reset, or a Retry-After on 429).
+    """
+
+    def __init__(self, rate: float = 0, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline_at: Optional[float] = None):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if self.rate:
+                    self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                wait_for = self._blocked_until - now
+                if self.rate and self._tokens < 1:
+                    wait_for = max(wait_for, (1 - self._tokens) / self.rate)
+                if wait_for <= 0:
+                    if self.rate:
+                        self._tokens -= 1
+                    return
+            if deadline_at is not None and now + wait_for > deadline_at:
+                raise DeadlineExceeded("Deadline would pass while waiting for the upstream rate limit")
+            time.sleep(wait_for)
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def observe(self, headers):
+        """
+        Honour x-ratelimit-remaining-* / x-ratelimit-reset-* response headers
+        """
+        for kind in ("requests", "tokens"):
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+            if remaining is None or reset is None:
+                continue
+            try:
+                if float(remaining) <= 0:
+                    self.pause(reset)
+            except ValueError:
+                continue
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failures and fails calls fast
+    for reset_seconds, then lets a single trial call through (half-open).
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_request(self):
+        with self._lock:
+            if self.state == "closed":
+                return
+            remaining = self._opened_at + self.reset_seconds - time.monotonic()
+            if self.state == "open" and remaining <= 0:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            raise CircuitOpen("Upstream circuit breaker is open", max(remaining, 1.0))
+
+    def cancel_trial(self):
+        """
+        Give back the half-open trial when the call never reached the upstream
+        """
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+
+def _close_quietly(future):
+    try:
+        future.result().close()
+    except Exception:
+        pass
+
+
+class ResilientTransport(httpx.BaseTransport):
+    """
+    httpx transport adding retries, deadlines, hedging, rate limiting and a
+    circuit breaker on top of a pooled HTTPTransport. Retries and hedges only
+    happen before response headers arrive, so streamed responses are safe.
+    """
+
+    def __init__(
+        self,
+        transport: Optional[httpx.BaseTransport] = None,
+        max_attempts: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        retry_statuses: Iterable[int] = RETRY_STATUSES,
+        hedge_after: Optional[float] = None,
+        rate_limit: float = 0,
+        breaker_failures: int = 5,
+        breaker_reset_seconds: float = 30,
+    ):
+        self.transport = transport or httpx.HTTPTransport()
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_statuses = frozenset(retry_statuses)
+        self.hedge_after = hedge_after
+        self.rate_limit = rate_limit
+        self.breaker_failures = breaker_failures
+        self.breaker_reset_seconds = breaker_reset_seconds
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+        self._hedge_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="hedge") if hedge_after else None
+
+    def _for_host(self, host: str):
+        with self._lock:
+            if host not in self.breakers:
+                self.breakers[host] = CircuitBreaker(self.breaker_failures, self.breaker_reset_seconds)
+                self.buckets[host] = TokenBucket(self.rate_limit)
+            return self.breakers[host], self.buckets[host]
+
+    def backoff(self, attempt: int) -> float:
+        # Full jitter: uniform between 0 and the capped exponential delay
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+
+    @staticmethod
+    def _apply_deadline(request: httpx.Request, deadline_at: Optional[float]):
+        if deadline_at is None:
+            return
+        remaining = deadline_at - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded("Upstream deadline exceeded", request=request)
+        timeout = dict(request.extensions.get("timeout") or {})
+        for key in ("connect", "read", "write", "pool"):
+            timeout[key] = remaining if timeout.get(key) is None else min(timeout[key], remaining)
+        request.extensions["timeout"] = timeout
+
+    def _send(self, request: httpx.Request) -> httpx.Response:
+        try:
+            request.content
+        except httpx.RequestNotRead:
+            # Streamed bodies (file uploads) can't be sent twice at once
+            return self.transport.handle_request(request)
+        if self._hedge_pool is None:
+            return self.transport.handle_request(request)
+
+        futures = [self._hedge_pool.submit(self.transport.handle_request, request)]
+        done, _ = wait(futures, timeout=self.hedge_after)
+        if not done:
+            UPSTREAM_HEDGES.inc(host=request.url.host)
+            hedge = httpx.Request(
+                request.method, request.url, headers=request.headers,
+                content=request.content, extensions=dict(request.extensions),
+            )
+            futures.append(self._hedge_pool.submit(self.transport.handle_request, hedge))
+
+        pending, error = set(futures), None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    response = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                # First response wins; close the loser whenever it finishes
+                for other in pending:
+                    other.add_done_callback(_close_quietly)
+                for other in done - {future}:
+                    _close_quietly(other)
+                return response
+        raise error
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        breaker, bucket = self._for_host(host)
+        deadline_at = _deadline.get()
+
+        attempt = 0
+        while True:
+            attempt += 1
+            breaker.before_request()
+            try:
+                bucket.acquire(deadline_at)
+                self._apply_deadline(request, deadline_at)
+            except BaseException:
+                # Out of time before the call was sent; the upstream wasn't tried
+                breaker.cancel_trial()
+                raise
+
+            response, error = None, None
+            try:
+                response = self._send(request)
+            except httpx.TransportError as e:
+                error = e
+                breaker.record_failure()
+                UPSTREAM_REQUESTS.inc(host=host, status="error")
+            except BaseException:
+                breaker.cancel_trial()
+                raise
+            else:
+                status = response.status_code
+                UPSTREAM_REQUESTS.inc(host=host, status=status)
+                bucket.observe(response.headers)
+                if status >= 500:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                if status not in self.retry_statuses:
+                    return response
+
+            delay = self.backoff(attempt)
+            if response is not None:
+                retry_after = retry_after_seconds(response.headers)
+                if retry_after is not None:
+                    delay = retry_after
+                    if response.status_code == 429:
+                        bucket.pause(retry_after)
+
+            out_of_time = deadline_at is not None and time.monotonic() + delay >= deadline_at
+            if attempt >= self.max_attempts or out_of_time:
+                if error is not None:
+                    raise error
+                return response
+
+            if response is not None:
+                response.close()
+            UPSTREAM_RETRIES.inc(host=host)
+            time.sleep(delay)
+
+    def circuit_states(self) -> Dict[str, str]:
+        with self._lock:
+            return {host: breaker.state for host, breaker in self.breakers.items()}
+
+    def close(self):
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=False)
+        self.transport.close()
+
+
+class UpstreamClient(httpx.Client):
+    """
+    Pooled keep-alive client over a ResilientTransport; SDK clients built on
+    it should not retry on their own (see create_groq_client)
+    """
+
+    def __init__(self, max_connections: int = 100, timeout: float = 120, **transport_options):
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.resilient_transport = ResilientTransport(httpx.HTTPTransport(limits=limits), **transport_options)
+        super().__init__(transport=self.resilient_transport, timeout=timeout)
+
+
+def create_groq_client(api_key: Optional[str], http_client: Optional[httpx.Client] = None) -> groq.Groq:
+    # The shared client already retries with backoff; stacking the SDK's retries would multiply attempts
+    max_retries = 0 if isinstance(http_client, UpstreamClient) else groq.DEFAULT_MAX_RETRIES
+    return groq.Groq(api_key=api_key, http_client=http_client, max_retries=max_retries)
+
+
+def upstream_error(message: str, error: Exception) -> UpstreamError:
+    """
+    Wrap a failed upstream call, choosing the HTTP status the API should return:
+    503 when the upstream is unavailable or rate limiting us, 504 on timeouts,
+    502 for other upstream errors and 500 for anything else
+    """
+    text = f"{message}: {str(error)}"
+    chain, cause = [], error
+    while cause is not None and cause not in chain:
+        chain.append(cause)
+        cause = cause.__cause__ or cause.__context__
+
+    # Innermost cause first: SDK errors wrap the transport error that explains them
+    for cause in reversed(chain):
+        if isinstance(cause, CircuitOpen):
+            return UpstreamError(text, 503, cause.retry_after)
+        if isinstance(cause, (DeadlineExceeded, httpx.TimeoutException, groq.APITimeoutError)):
+            return UpstreamError(text, 504)
+        if isinstance(cause, groq.APIStatusError):
+            if cause.status_code == 429:
+                return UpstreamError(text, 503, retry_after_seconds(cause.response.headers))
+            return UpstreamError(text, 502)
+        if isinstance(cause, (groq.APIConnectionError, httpx.TransportError)):
+            return UpstreamError(text, 503)
+    return UpstreamError(text, 500)
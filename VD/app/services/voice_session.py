@@ -0,0 +1,155 @@
+"""
+Server-side endpointing for live voice sessions: detect where each utterance
+starts and ends in a stream of microphone PCM, and cut long utterances at
+short pauses so the first parts can be transcribed while the user is still
+speaking.
+"""
+from collections import deque
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.services.preprocess import encode
+
+
+# (kind, samples, seconds): "speech_start" with the start offset, "chunk" with
+# a finished stretch of the utterance, "end" with the rest of the utterance
+# (None if nothing is left) and the offset where speech ended
+SpeechEvent = Tuple[str, Optional[np.ndarray], Optional[float]]
+
+
+class Endpointer:
+    """
+    Streaming energy-based endpointer over 16-bit mono little-endian PCM.
+
+    A frame is voiced when it is margin_db above the tracked noise floor (and
+    above min_level_db). Speech starts after start_ms of voiced frames and ends
+    after end_silence_ms of silence. Once an utterance has chunk_seconds of
+    audio pending, it is cut at the next pause of chunk_pause_ms, or hard at
+    max_chunk_seconds; chunk_seconds=0 only cuts at the end.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = 16000,
+        frame_ms: int = 30,
+        margin_db: float = 12.0,
+        min_level_db: float = -50.0,
+        start_ms: int = 90,
+        end_silence_ms: int = 700,
+        pre_roll_ms: int = 300,
+        chunk_seconds: float = 2.0,
+        chunk_pause_ms: int = 250,
+        max_chunk_seconds: float = 8.0,
+        max_utterance_seconds: float = 60.0,
+    ):
+        self.sample_rate = sample_rate
+        self.frame_ms = frame_ms
+        self.frame = sample_rate * frame_ms // 1000
+        self.margin_db = margin_db
+        self.min_level_db = min_level_db
+        self.start_frames = max(1, start_ms // frame_ms)
+        self.end_frames = max(1, end_silence_ms // frame_ms)
+        self.chunk_frames = int(chunk_seconds * 1000 / frame_ms)
+        self.chunk_pause_frames = max(1, chunk_pause_ms // frame_ms)
+        self.max_chunk_frames = int(max_chunk_seconds * 1000 / frame_ms)
+        self.max_utterance_frames = int(max_utterance_seconds * 1000 / frame_ms)
+        # Trailing silence kept at the end of an utterance
+        self.tail_frames = max(1, 200 // frame_ms)
+
+        self.noise_db = min_level_db
+        self.in_speech = False
+        self.position = 0
+        self._remainder = b""
+        self._pre_roll: deque = deque(maxlen=max(1, pre_roll_ms // frame_ms) + self.start_frames)
+        self._voiced_run = 0
+        self._reset_utterance()
+
+    def _reset_utterance(self):
+        self._pending: List[np.ndarray] = []
+        self._pending_voiced = False
+        self._silence_run = 0
+        self._utterance_frames = 0
+        self._speech_end = 0
+
+    def _is_voiced(self, frame: np.ndarray) -> bool:
+        energy_db = 10 * np.log10(np.mean(frame * frame) + 1e-10)
+        voiced = energy_db > max(self.noise_db + self.margin_db, self.min_level_db)
+        # The floor follows quiet frames down at once and louder background up slowly
+        if energy_db < self.noise_db:
+            self.noise_db = energy_db
+        elif not voiced or not self.in_speech:
+            self.noise_db += (energy_db - self.noise_db) * (0.05 if not voiced else 0.02)
+        return voiced
+
+    def _emit(self, frames: List[np.ndarray]) -> Optional[np.ndarray]:
+        return np.concatenate(frames) if frames else None
+
+    def feed(self, pcm: bytes) -> List[SpeechEvent]:
+        data = self._remainder + pcm
+        usable = len(data) - len(data) % (2 * self.frame)
+        self._remainder = data[usable:]
+        samples = np.frombuffer(data[:usable], dtype="<i2").astype(np.float32) / 32768.0
+
+        events: List[SpeechEvent] = []
+        for frame in samples.reshape(-1, self.frame):
+            self.position += self.frame
+            voiced = self._is_voiced(frame)
+            if not self.in_speech:
+                self._pre_roll.append(frame)
+                self._voiced_run = self._voiced_run + 1 if voiced else 0
+                if self._voiced_run >= self.start_frames:
+                    self.in_speech = True
+                    self._reset_utterance()
+                    self._pending = list(self._pre_roll)
+                    self._pending_voiced = True
+                    self._utterance_frames = len(self._pending)
+                    self._speech_end = self.position
+                    self._pre_roll.clear()
+                    start = (self.position - self.start_frames * self.frame) / self.sample_rate
+                    events.append(("speech_start", None, start))
+                continue
+
+            self._pending.append(frame)
+            self._utterance_frames += 1
+            if voiced:
+                self._silence_run = 0
+                self._pending_voiced = True
+                self._speech_end = self.position
+            else:
+                self._silence_run += 1
+
+            if self._silence_run >= self.end_frames or self._utterance_frames >= self.max_utterance_frames:
+                events.append(self._end())
+            elif self.chunk_frames and self._pending_voiced and (
+                (len(self._pending) >= self.chunk_frames and self._silence_run >= self.chunk_pause_frames)
+                or len(self._pending) >= self.max_chunk_frames
+            ):
+                events.append(("chunk", self._emit(self._pending), None))
+                self._pending = []
+                self._pending_voiced = False
+        return events
+
+    def _end(self) -> SpeechEvent:
+        frames = self._pending
+        if self._silence_run > self.tail_frames:
+            frames = frames[:len(frames) - (self._silence_run - self.tail_frames)]
+        tail = self._emit(frames) if self._pending_voiced else None
+        speech_end = self._speech_end / self.sample_rate
+        self.in_speech = False
+        self._voiced_run = 0
+        self._reset_utterance()
+        return "end", tail, speech_end
+
+    def flush(self) -> List[SpeechEvent]:
+        """
+        End the current utterance now (e.g. the client released push-to-talk)
+        """
+        return [self._end()] if self.in_speech else []
+
+
+def encode_clip(samples: np.ndarray, sample_rate: int) -> bytes:
+    """
+    Encode a stretch of an utterance as FLAC for the STT engine
+    """
+    return encode(samples, sample_rate, "flac")
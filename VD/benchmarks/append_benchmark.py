@@ -0,0 +1,105 @@
+"""
+Append benchmark: a long recording uploaded part by part with
+/upload-audio/?append=true, against fake STT.
+
+Reports how long each append takes to store and index, and the time to the
+first answer after it, as the recording grows. With incremental indexing
+both stay flat. Exits non-zero if a part isn't placed right after the
+previous one. --compare repeats the run dropping the session's index before
+every part, which is what re-indexing the whole recording costs.
+
+Usage (from the VD directory):
+    python -m benchmarks.append_benchmark --parts 30 --words-per-part 1500 --compare
+"""
+import argparse
+import asyncio
+import io
+import os
+import tempfile
+import time
+from typing import Dict, List
+
+os.environ.setdefault("GROQ_API_KEY", "benchmark-key")
+for _name in ("UPLOAD_DIR", "OUTPUT_DIR", "CACHE_DIR"):
+    os.environ.setdefault(_name, tempfile.mkdtemp(prefix=f"bench_{_name.lower()}_"))
+
+import httpx
+import soundfile as sf
+
+from app import main
+from benchmarks.e2e_suite import fake_transcript
+from benchmarks.fakes import FakeQAService, FakeTranscriptionService, FakeTTSService, LatencyModel
+
+SESSION_ID = "append-benchmark"
+
+
+async def run_pass(args, audio: bytes, incremental: bool) -> List[Dict]:
+    main.ANSWER_CACHE_ITEMS = 0
+    await main.startup_event()
+    main.transcription_service = FakeTranscriptionService(LatencyModel(0.0))
+    main.qa_service = FakeQAService(LatencyModel(0.0))
+    main.tts_service = FakeTTSService(LatencyModel(0.0), output_dir=tempfile.mkdtemp(prefix="bench_outputs_"))
+
+    part_seconds = sf.info(io.BytesIO(audio)).duration
+    rows = []
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for part in range(args.parts):
+                # A different transcript per part, like consecutive stretches of a meeting
+                main.transcription_service.transcript = fake_transcript(args.words_per_part, seed=part)
+                if not incremental:
+                    main.index_cache.discard(SESSION_ID)
+
+                files = {"file": (f"part_{part}.mp3", audio, "audio/mpeg")}
+                start = time.perf_counter()
+                response = await client.post(
+                    "/upload-audio/", params={"session_id": SESSION_ID, "append": "true"}, files=files
+                )
+                response.raise_for_status()
+                append_ms = (time.perf_counter() - start) * 1000
+                placed = response.json()
+                # Every part is the same file, so each starts one file length after the previous
+                if abs(placed["offset"] - part * part_seconds) > 0.01:
+                    raise SystemExit(f"part {part + 1} starts at {placed['offset']:.2f}s, "
+                                     f"expected {part * part_seconds:.2f}s")
+
+                start = time.perf_counter()
+                files = {"file": ("question.wav", b"RIFF0000WAVE", "audio/wav")}
+                question = await client.post("/ask-question/", params={"session_id": SESSION_ID}, files=files)
+                question.raise_for_status()
+                rows.append({
+                    "part": part + 1,
+                    "offset_s": placed["offset"],
+                    "append_ms": append_ms,
+                    "question_ms": (time.perf_counter() - start) * 1000,
+                })
+    finally:
+        await main.shutdown_event()
+    return rows
+
+
+def report(label: str, rows: List[Dict], every: int):
+    print(f"\n{label}")
+    print(f"{'part':>5} {'offset_s':>9} {'append_ms':>10} {'question_ms':>12}")
+    for row in rows:
+        if row["part"] == 1 or row["part"] % every == 0 or row["part"] == len(rows):
+            print(f"{row['part']:>5} {row['offset_s']:>9.0f} {row['append_ms']:>10.1f} {row['question_ms']:>12.1f}")
+
+
+async def main_async(args):
+    with open(args.upload, "rb") as f:
+        audio = f.read()
+    report("incremental", await run_pass(args, audio, True), args.every)
+    if args.compare:
+        report("full re-index per part", await run_pass(args, audio, False), args.every)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--parts", type=int, default=30)
+    parser.add_argument("--words-per-part", type=int, default=1500, help="transcript words per part")
+    parser.add_argument("--upload", default=os.path.join("test_audio", "test_1_simple.mp3"), help="audio for each part")
+    parser.add_argument("--every", type=int, default=5, help="print every Nth part")
+    parser.add_argument("--compare", action="store_true", help="also run re-indexing the whole session per part")
+    asyncio.run(main_async(parser.parse_args()))
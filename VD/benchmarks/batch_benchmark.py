@@ -0,0 +1,114 @@
+"""
+Compare N sequential /ask-question/ calls with one /ask-batch/ call.
+
+Runs the FastAPI app in-process with the real QAService building every prompt.
+The LLM is a stand-in that sleeps for a fixed overhead plus a per-prompt-token
+prefill cost and a per-answer decode cost, and reports how many prompt tokens
+it was sent. STT and TTS are the usual fakes.
+
+Usage (from the VD directory):
+    python -m benchmarks.batch_benchmark --questions 20 --hours 1
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import tempfile
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault("GROQ_API_KEY", "benchmark-key")
+os.environ.setdefault("UPLOAD_DIR", tempfile.mkdtemp(prefix="bench_uploads_"))
+
+import httpx
+
+from app import main
+from benchmarks.fakes import FakeTranscriptionService, FakeTTSService, LatencyModel
+from benchmarks.retrieval_benchmark import FACTS, estimate_tokens, synthetic_transcript
+
+SESSION_ID = "benchmark"
+QUESTION_LINE = re.compile(r"^\d+\. ", re.MULTILINE)
+
+
+class ModelledCompletions:
+    """
+    Stand-in for client.chat.completions with a token-based latency model
+    """
+
+    def __init__(self, overhead_s: float, per_token_s: float, per_answer_s: float):
+        self.overhead_s = overhead_s
+        self.per_token_s = per_token_s
+        self.per_answer_s = per_answer_s
+        self.calls = 0
+        self.prompt_tokens = 0
+
+    def create(self, messages, **kwargs):
+        prompt = "\n".join(m["content"] for m in messages)
+        tokens = estimate_tokens(prompt)
+        self.calls += 1
+        self.prompt_tokens += tokens
+
+        batched = kwargs.get("response_format") is not None
+        n_answers = len(QUESTION_LINE.findall(messages[-1]["content"])) if batched else 1
+        time.sleep(self.overhead_s + tokens * self.per_token_s + n_answers * self.per_answer_s)
+
+        content = "A short answer."
+        if batched:
+            content = json.dumps({"answers": [f"Answer {i + 1}." for i in range(n_answers)]})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+async def sequential(client, questions):
+    for question in questions:
+        # The fake STT "hears" each question in turn
+        main.transcription_service.transcript = question
+        files = {"file": ("question.wav", b"RIFF0000WAVE", "audio/wav")}
+        response = await client.post("/ask-question/", params={"session_id": SESSION_ID}, files=files)
+        response.raise_for_status()
+
+
+async def batched(client, questions):
+    items = [{"text": question, "tts": True} for question in questions]
+    response = await client.post(
+        "/ask-batch/", params={"session_id": SESSION_ID}, data={"questions": json.dumps(items)}
+    )
+    response.raise_for_status()
+
+
+async def main_async(args):
+    # Both modes ask the same questions; cached answers would hide the LLM calls
+    main.ANSWER_CACHE_ITEMS = 0
+    await main.startup_event()
+    completions = ModelledCompletions(args.overhead, args.per_token, args.per_answer)
+    main.qa_service.client.chat.completions = completions
+    main.transcription_service = FakeTranscriptionService(LatencyModel(args.stt_latency))
+    main.tts_service = FakeTTSService(LatencyModel(args.tts_latency), output_dir=tempfile.mkdtemp(prefix="bench_outputs_"))
+    main.session_store.add_transcript(SESSION_ID, synthetic_transcript(args.hours))
+
+    questions = [FACTS[i % len(FACTS)][1] for i in range(args.questions)]
+    transport = httpx.ASGITransport(app=main.app)
+    try:
+        print(f"{args.questions} questions, {args.hours:g}h transcript, batch size {main.QA_BATCH_SIZE}")
+        print(f"{'mode':<12} {'LLM calls':>10} {'prompt tokens':>14} {'wall s':>8}")
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for name, run in (("sequential", sequential), ("batch", batched)):
+                completions.calls, completions.prompt_tokens = 0, 0
+                start = time.perf_counter()
+                await run(client, questions)
+                elapsed = time.perf_counter() - start
+                print(f"{name:<12} {completions.calls:>10} {completions.prompt_tokens:>14} {elapsed:>8.2f}")
+    finally:
+        await main.shutdown_event()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--hours", type=float, default=1.0, help="length of the synthetic transcript")
+    parser.add_argument("--overhead", type=float, default=0.2, help="fixed LLM latency in seconds")
+    parser.add_argument("--per-token", type=float, default=0.0002, help="prefill seconds per prompt token")
+    parser.add_argument("--per-answer", type=float, default=0.3, help="decode seconds per answer")
+    parser.add_argument("--stt-latency", type=float, default=0.05)
+    parser.add_argument("--tts-latency", type=float, default=0.05)
+    asyncio.run(main_async(parser.parse_args()))
@@ -0,0 +1,363 @@
+"""
+End-to-end benchmark suite: the FastAPI app in-process with fake STT, LLM and
+TTS backends whose latencies follow configurable distributions.
+
+Each scenario is a mix of /upload-audio/, /ask-question/ and
+/download-response/ calls made by concurrent clients. Every client first
+uploads a recording to get a session, then picks operations from the mix
+(seeded, so runs are repeatable). For each scenario and concurrency level the
+suite reports throughput, p50/p95/p99 latency per endpoint, a per-stage
+breakdown taken from the app's Server-Timing traces and the peak RSS of the
+process, and writes everything to a JSON file. --baseline compares the run
+with an earlier results file and flags regressions.
+
+Backend latency specs are "distribution:mean[:stddev]" in seconds, with
+distribution constant, normal or lognormal.
+
+Usage (from the VD directory):
+    python -m benchmarks.e2e_suite --clients 1 10 50 --requests 20
+    python -m benchmarks.e2e_suite --baseline benchmarks/results/<earlier run>.json --fail-on-regression
+"""
+import argparse
+import asyncio
+import glob
+import json
+import math
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+os.environ.setdefault("GROQ_API_KEY", "benchmark-key")
+for _name in ("UPLOAD_DIR", "OUTPUT_DIR", "CACHE_DIR"):
+    os.environ.setdefault(_name, tempfile.mkdtemp(prefix=f"bench_{_name.lower()}_"))
+
+import httpx
+
+from app import main
+from benchmarks.fakes import FakeQAService, FakeTranscriptionService, FakeTTSService, LatencyModel
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# Operation weights per scenario
+SCENARIOS = {
+    "ask_only": {"ask": 1.0},
+    "interactive": {"upload": 0.1, "ask": 0.6, "download": 0.3},
+    "ingest_heavy": {"upload": 0.5, "ask": 0.3, "download": 0.2},
+}
+
+_SERVER_TIMING = re.compile(r'(\w+)-\d+;dur=([\d.]+)')
+
+QUESTION_AUDIO = b"RIFF0000WAVEfmt question"
+
+
+class SuiteTranscriptionService(FakeTranscriptionService):
+    """
+    Returns the long fake transcript for uploads and a short question for question clips
+    """
+
+    def __init__(self, latency: LatencyModel, transcript: str, question: str):
+        super().__init__(latency, transcript)
+        self.question = question
+
+    def transcribe_file(self, audio_file, filename: str, audio_sha256: str = None) -> str:
+        text = super().transcribe_file(audio_file, filename, audio_sha256)
+        return self.question if filename.startswith("question") else text
+
+
+def fake_transcript(words: int, seed: int) -> str:
+    vocabulary = (
+        "meeting budget agenda project schedule recipe flour oven story village river facts planet "
+        "ocean speaker team review launch customer report quarter design risk decision action item"
+    ).split()
+    rng = random.Random(seed)
+    sentences, sentence = [], []
+    for _ in range(words):
+        sentence.append(rng.choice(vocabulary))
+        if len(sentence) >= rng.randint(8, 16):
+            sentences.append(" ".join(sentence).capitalize() + ".")
+            sentence = []
+    return " ".join(sentences)
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """
+    Nearest-rank percentile of an already sorted list
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def latency_summary(seconds: List[float]) -> Dict:
+    values = sorted(seconds)
+    return {
+        "count": len(values),
+        "mean_ms": 1000 * sum(values) / len(values) if values else 0.0,
+        "p50_ms": 1000 * percentile(values, 50),
+        "p95_ms": 1000 * percentile(values, 95),
+        "p99_ms": 1000 * percentile(values, 99),
+        "max_ms": 1000 * values[-1] if values else 0.0,
+    }
+
+
+def rss_bytes() -> int:
+    """
+    Current resident set size; falls back to the peak where /proc is unavailable
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+class MemorySampler:
+    """
+    Samples RSS on a background thread to find the peak during a scenario
+    """
+
+    def __init__(self, interval: float = 0.02):
+        self.interval = interval
+        self.start_rss = rss_bytes()
+        self.peak_rss = self.start_rss
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak_rss = max(self.peak_rss, rss_bytes())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_rss = max(self.peak_rss, rss_bytes())
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.stages: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def record(self, operation: str, seconds: float, response: httpx.Response):
+        self.latencies[operation].append(seconds)
+        if response.status_code >= 400:
+            self.errors[f"{operation}:{response.status_code}"] += 1
+        for stage, duration in _SERVER_TIMING.findall(response.headers.get("server-timing", "")):
+            self.stages[stage].append(float(duration) / 1000)
+
+
+async def client_loop(
+    client: httpx.AsyncClient, client_id: int, mix: Dict[str, float], n_requests: int,
+    uploads: List[str], seed: int, recorder: Recorder,
+):
+    rng = random.Random(f"{seed}-{client_id}")
+    operations, weights = list(mix), list(mix.values())
+    session_id: Optional[str] = None
+    audio_file: Optional[str] = None
+
+    for i in range(n_requests):
+        operation = rng.choices(operations, weights)[0]
+        if session_id is None:
+            operation = "upload"
+        elif operation == "download" and audio_file is None:
+            operation = "ask"
+        headers = {"X-Trace-ID": f"{client_id}-{i}"}
+        if operation == "upload":
+            path = rng.choice(uploads)
+            with open(path, "rb") as f:
+                upload = (os.path.basename(path), f.read(), "audio/mpeg")
+
+        start = time.perf_counter()
+        if operation == "upload":
+            files = {"file": upload}
+            params = {"session_id": session_id, "replace": "true"} if session_id else {}
+            response = await client.post("/upload-audio/", params=params, files=files, headers=headers)
+            if response.status_code == 200:
+                session_id = response.json()["session_id"]
+        elif operation == "ask":
+            files = {"file": ("question.wav", QUESTION_AUDIO, "audio/wav")}
+            response = await client.post(
+                "/ask-question/", params={"session_id": session_id}, files=files, headers=headers
+            )
+            if response.status_code == 200:
+                audio_file = os.path.basename(response.json()["audio_file"])
+        else:
+            response = await client.get(f"/download-response/{audio_file}", headers=headers)
+        recorder.record(operation, time.perf_counter() - start, response)
+
+
+async def run_scenario(name: str, mix: Dict[str, float], n_clients: int, args, uploads: List[str]) -> Dict:
+    recorder = Recorder()
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        with MemorySampler() as memory:
+            start = time.perf_counter()
+            await asyncio.gather(*(
+                client_loop(client, i, mix, args.requests, uploads, args.seed, recorder) for i in range(n_clients)
+            ))
+            elapsed = time.perf_counter() - start
+
+    total = sum(len(v) for v in recorder.latencies.values())
+    stage_total = sum(sum(v) for v in recorder.stages.values()) or 1.0
+    return {
+        "scenario": name,
+        "clients": n_clients,
+        "requests": total,
+        "elapsed_s": elapsed,
+        "throughput_rps": total / elapsed,
+        "errors": dict(recorder.errors),
+        "endpoints": {op: latency_summary(v) for op, v in sorted(recorder.latencies.items())},
+        "stages": {
+            stage: dict(latency_summary(v), total_s=sum(v), share=sum(v) / stage_total)
+            for stage, v in sorted(recorder.stages.items())
+        },
+        "peak_rss_bytes": memory.peak_rss,
+        "rss_growth_bytes": memory.peak_rss - memory.start_rss,
+    }
+
+
+def print_result(result: Dict):
+    print(f"\n{result['scenario']} with {result['clients']} clients: {result['requests']} requests in "
+          f"{result['elapsed_s']:.2f}s, {result['throughput_rps']:.1f} req/s, "
+          f"peak RSS {result['peak_rss_bytes'] / 2 ** 20:.0f} MiB (+{result['rss_growth_bytes'] / 2 ** 20:.1f})")
+    if result["errors"]:
+        print(f"  errors: {result['errors']}")
+    print(f"  {'endpoint':<10} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for op, s in result["endpoints"].items():
+        print(f"  {op:<10} {s['count']:>6} {s['p50_ms']:>8.1f} {s['p95_ms']:>8.1f} {s['p99_ms']:>8.1f} {s['max_ms']:>8.1f}")
+    print(f"  {'stage':<10} {'calls':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'share':>8}")
+    for stage, s in result["stages"].items():
+        print(f"  {stage:<10} {s['count']:>6} {s['p50_ms']:>8.1f} {s['p95_ms']:>8.1f} {s['p99_ms']:>8.1f} "
+              f"{s['share']:>8.1%}")
+
+
+def compare(results: List[Dict], baseline: Dict, tolerance: float, min_delta_ms: float) -> List[str]:
+    """
+    Regressions against a baseline run: throughput down or an endpoint's p95 up by
+    more than tolerance (and, for p95, by at least min_delta_ms)
+    """
+    previous = {(r["scenario"], r["clients"]): r for r in baseline["results"]}
+    regressions = []
+    print(f"\nCompared with {baseline.get('git_commit') or 'baseline'} ({baseline.get('created_at')}):")
+    for result in results:
+        before = previous.get((result["scenario"], result["clients"]))
+        if before is None:
+            continue
+        label = f"{result['scenario']}/{result['clients']}"
+        change = result["throughput_rps"] / before["throughput_rps"] - 1
+        print(f"  {label:<20} throughput {change:+.1%}")
+        if change < -tolerance:
+            regressions.append(f"{label} throughput {change:+.1%}")
+        for op, summary in result["endpoints"].items():
+            old = before["endpoints"].get(op)
+            if not old or not old["p95_ms"]:
+                continue
+            change = summary["p95_ms"] / old["p95_ms"] - 1
+            print(f"  {label:<20} {op} p95 {old['p95_ms']:.1f} -> {summary['p95_ms']:.1f} ms ({change:+.1%})")
+            if change > tolerance and summary["p95_ms"] - old["p95_ms"] >= min_delta_ms:
+                regressions.append(f"{label} {op} p95 {change:+.1%}")
+    return regressions
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args) -> int:
+    uploads = args.uploads or sorted(glob.glob(os.path.join("test_audio", "*.mp3")))
+    if not uploads:
+        print("No upload files found; pass --uploads")
+        return 2
+    if not args.answer_cache:
+        # Every client asks the same fake question; measure the pipeline, not the answer cache
+        main.ANSWER_CACHE_ITEMS = 0
+
+    await main.startup_event()
+    main.transcription_service = SuiteTranscriptionService(
+        LatencyModel.from_spec(args.stt, args.seed, args.tail_prob, args.tail_seconds),
+        transcript=fake_transcript(args.transcript_words, args.seed),
+        question="What was decided about the budget?",
+    )
+    main.qa_service = FakeQAService(LatencyModel.from_spec(args.llm, args.seed + 1, args.tail_prob, args.tail_seconds))
+    main.tts_service = FakeTTSService(
+        LatencyModel.from_spec(args.tts, args.seed + 2, args.tail_prob, args.tail_seconds), output_dir=main.OUTPUT_DIR
+    )
+
+    results = []
+    try:
+        for name in args.scenarios:
+            for n_clients in args.clients:
+                result = await run_scenario(name, SCENARIOS[name], n_clients, args, uploads)
+                print_result(result)
+                results.append(result)
+    finally:
+        await main.shutdown_event()
+
+    report = {
+        "suite": "e2e",
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        "results": results,
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"e2e_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{report['git_commit'] or 'nogit'}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.min_delta_ms)
+        if regressions:
+            print("Regressions: " + "; ".join(regressions))
+            return 1 if args.fail_on_regression else 0
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--requests", type=int, default=20, help="requests per client")
+    parser.add_argument("--stt", default="lognormal:0.30:0.10", help="fake STT latency spec")
+    parser.add_argument("--llm", default="lognormal:0.50:0.20", help="fake LLM latency spec")
+    parser.add_argument("--tts", default="normal:0.15:0.05", help="fake TTS latency spec (per call)")
+    parser.add_argument("--tail-prob", type=float, default=0.01, help="fraction of backend calls that hit the slow tail")
+    parser.add_argument("--tail-seconds", type=float, default=1.0, help="extra latency of a slow-tail call")
+    parser.add_argument("--transcript-words", type=int, default=3000, help="length of the fake upload transcript")
+    parser.add_argument("--uploads", nargs="+", help="audio files to upload (default: test_audio/*.mp3)")
+    parser.add_argument("--answer-cache", action="store_true", help="keep the answer cache on")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help=f"results file (default: a timestamped file in {RESULTS_DIR})")
+    parser.add_argument("--baseline", help="earlier results file to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="relative change that counts as a regression")
+    parser.add_argument("--min-delta-ms", type=float, default=20.0, help="ignore p95 changes smaller than this")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit with status 1 on a regression")
+    sys.exit(asyncio.run(run(parser.parse_args())))
@@ -0,0 +1,161 @@
+"""
+Deterministic local stand-ins for the Groq and gTTS backends used by the benchmarks.
+Each fake blocks the calling thread for a configurable latency, like the real clients do.
+"""
+import io
+import math
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from typing import Dict
+
+import soundfile as sf
+
+from app.services.cache import DiskCache
+
+
+class LatencyModel:
+    """
+    Latency distribution of a fake backend: "constant", "normal" or "lognormal"
+    with the given mean and standard deviation (jitter), plus a slow tail where
+    a tail_prob fraction of calls take tail_seconds longer.
+    """
+
+    def __init__(
+        self,
+        mean: float = 0.05,
+        jitter: float = 0.0,
+        seed: int = 0,
+        distribution: str = "normal",
+        tail_prob: float = 0.0,
+        tail_seconds: float = 0.0,
+    ):
+        if distribution not in ("constant", "normal", "lognormal"):
+            raise ValueError(f"Unknown latency distribution {distribution!r}")
+        self.mean = mean
+        self.jitter = jitter
+        self.distribution = distribution
+        self.tail_prob = tail_prob
+        self.tail_seconds = tail_seconds
+        self.random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_spec(cls, spec: str, seed: int = 0, tail_prob: float = 0.0, tail_seconds: float = 0.0) -> "LatencyModel":
+        """
+        Parse "distribution:mean[:jitter]" (e.g. "lognormal:0.3:0.1") or just "mean"
+        """
+        parts = spec.split(":")
+        distribution = "constant" if len(parts) == 1 else parts.pop(0)
+        mean = float(parts[0])
+        jitter = float(parts[1]) if len(parts) > 1 else 0.0
+        return cls(mean, jitter, seed, distribution, tail_prob, tail_seconds)
+
+    def sample(self) -> float:
+        with self._lock:
+            if self.distribution == "constant" or not self.jitter:
+                delay = self.mean
+            elif self.distribution == "normal":
+                delay = max(0.0, self.random.gauss(self.mean, self.jitter))
+            else:
+                sigma2 = math.log(1 + (self.jitter / self.mean) ** 2)
+                delay = self.random.lognormvariate(math.log(self.mean) - sigma2 / 2, math.sqrt(sigma2))
+            if self.tail_prob and self.random.random() < self.tail_prob:
+                delay += self.tail_seconds
+        return delay
+
+    def sleep(self):
+        time.sleep(self.sample())
+
+
+class FakeTranscriptionService:
+    def __init__(
+        self, latency: LatencyModel, transcript: str = "This is a fake transcript.", seconds_per_audio_second: float = 0.0
+    ):
+        self.latency = latency
+        self.transcript = transcript
+        # Extra latency per second of audio in transcribe_clip, like upload and decode time
+        self.seconds_per_audio_second = seconds_per_audio_second
+        self.calls = 0
+
+    def transcribe_audio(self, audio_file_path: str) -> str:
+        self.calls += 1
+        self.latency.sleep()
+        return self.transcript
+
+    def transcribe_question(self, question_audio_path: str) -> str:
+        return self.transcribe_audio(question_audio_path)
+
+    def transcribe_file(self, audio_file, filename: str, audio_sha256: str = None) -> str:
+        audio_file.read()
+        return self.transcribe_audio(filename)
+
+    def transcribe_file_segments(self, audio_file, filename: str, audio_sha256: str = None) -> Dict:
+        # One segment per sentence, spread evenly over the speech
+        text = self.transcribe_file(audio_file, filename, audio_sha256)
+        audio_file.seek(0)
+        try:
+            duration = sf.info(audio_file).duration
+        except Exception:
+            duration = 60.0
+        # Leave the file at EOF, as a real engine does after uploading it
+        audio_file.read()
+        sentences = [s for s in re.split(r"(?<=[.!?])\s+", text.strip()) if s]
+        # Speech ends a little before the file does, as with real recordings
+        step = 0.9 * duration / max(1, len(sentences))
+        return {
+            "text": text,
+            "segments": [
+                {"start": i * step, "end": (i + 1) * step, "text": sentence} for i, sentence in enumerate(sentences)
+            ],
+        }
+
+    def transcribe_clip(self, audio_bytes: bytes, filename: str) -> str:
+        time.sleep(self.seconds_per_audio_second * sf.info(io.BytesIO(audio_bytes)).duration)
+        return self.transcribe_audio(filename)
+
+
+class FakeQAService:
+    def __init__(self, latency: LatencyModel, answer: str = "This is a fake answer."):
+        self.latency = latency
+        self.answer = answer
+        self.model = "fake-llm"
+        self.calls = 0
+
+    def answer_question(self, question: str, audio_context: str, index=None) -> str:
+        self.calls += 1
+        self.latency.sleep()
+        return self.answer
+
+    def stream_answer(self, question: str, audio_context: str, index=None):
+        # Spread the latency over the words to mimic token streaming
+        self.calls += 1
+        words = self.answer.split(" ")
+        delay = self.latency.sample()
+        for i, word in enumerate(words):
+            time.sleep(delay / len(words))
+            yield word if i == 0 else " " + word
+
+
+class FakeTTSService:
+    def __init__(self, latency: LatencyModel, output_dir: str = "outputs"):
+        self.latency = latency
+        self.output_dir = output_dir
+        self.output_store = DiskCache(output_dir, max_bytes=1 << 40, suffix=".mp3")
+        self.calls = 0
+
+    def text_to_speech(self, text: str, output_filename: str = None) -> str:
+        self.calls += 1
+        self.latency.sleep()
+        output_path = os.path.join(self.output_dir, output_filename or f"response_{uuid.uuid4()}.mp3")
+        with open(output_path, "wb") as f:
+            f.write(b"ID3" + text.encode("utf-8"))
+        return output_path
+
+    def synthesize(self, text: str) -> bytes:
+        self.calls += 1
+        self.latency.sleep()
+        return b"ID3" + text.encode("utf-8")
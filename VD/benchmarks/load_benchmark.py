@@ -0,0 +1,93 @@
+"""
+Load benchmark for /ask-question/ against stubbed STT, LLM and TTS backends.
+
+Runs the FastAPI app in-process and measures throughput at several client
+concurrency levels. Each stubbed backend blocks its thread for a fixed latency,
+just like the real Groq and gTTS clients.
+
+Usage (from the VD directory):
+    python -m benchmarks.load_benchmark --clients 1 10 100 --requests 5
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+os.environ.setdefault("GROQ_API_KEY", "benchmark-key")
+os.environ.setdefault("UPLOAD_DIR", tempfile.mkdtemp(prefix="bench_uploads_"))
+
+import httpx
+
+from app import main
+from benchmarks.fakes import FakeQAService, FakeTranscriptionService, FakeTTSService, LatencyModel
+
+SESSION_ID = "benchmark"
+
+
+async def setup_app(stt_latency: float, llm_latency: float, tts_latency: float, answer_cache: bool):
+    # Every request repeats one question, so with the answer cache on only the first reaches the LLM and TTS
+    if not answer_cache:
+        main.ANSWER_CACHE_ITEMS = 0
+    # All clients share one session, which the per-session budget would otherwise throttle
+    main.ADMISSION_SESSION_LIMIT = 0
+    await main.startup_event()
+    main.transcription_service = FakeTranscriptionService(LatencyModel(stt_latency))
+    main.qa_service = FakeQAService(LatencyModel(llm_latency))
+    main.tts_service = FakeTTSService(
+        LatencyModel(tts_latency), output_dir=tempfile.mkdtemp(prefix="bench_outputs_")
+    )
+    main.session_store.add_transcript(SESSION_ID, "Benchmark transcript.")
+
+
+async def client_loop(client: httpx.AsyncClient, n_requests: int, latencies: list):
+    for _ in range(n_requests):
+        files = {"file": ("question.wav", b"RIFF0000WAVE", "audio/wav")}
+        start = time.perf_counter()
+        response = await client.post("/ask-question/", params={"session_id": SESSION_ID}, files=files)
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+
+
+async def run_level(n_clients: int, n_requests: int) -> dict:
+    latencies = []
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(client, n_requests, latencies) for _ in range(n_clients)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "clients": n_clients,
+        "requests": len(latencies),
+        "elapsed_s": elapsed,
+        "throughput_rps": len(latencies) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "max_ms": latencies[-1] * 1000,
+    }
+
+
+async def main_async(args):
+    await setup_app(args.stt_latency, args.llm_latency, args.tts_latency, args.answer_cache)
+    try:
+        print(f"{'clients':>8} {'requests':>9} {'req/s':>9} {'p50 ms':>9} {'max ms':>9}")
+        for n_clients in args.clients:
+            result = await run_level(n_clients, args.requests)
+            print(
+                f"{result['clients']:>8} {result['requests']:>9} "
+                f"{result['throughput_rps']:>9.1f} {result['p50_ms']:>9.1f} {result['max_ms']:>9.1f}"
+            )
+    finally:
+        await main.shutdown_event()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--requests", type=int, default=5, help="requests per client")
+    parser.add_argument("--stt-latency", type=float, default=0.05)
+    parser.add_argument("--llm-latency", type=float, default=0.10)
+    parser.add_argument("--tts-latency", type=float, default=0.05)
+    parser.add_argument("--answer-cache", action="store_true", help="keep the answer cache on")
+    asyncio.run(main_async(parser.parse_args()))
@@ -0,0 +1,157 @@
+"""
+Overload benchmark for admission control: a flood of /upload-audio/ clients
+next to a few interactive /ask-question/ clients, with fake backends.
+
+Uploads take much longer to transcribe than questions and outnumber the STT
+stage's slots, so without admission control questions queue behind them.
+Reports question latency percentiles, status codes per endpoint and upload
+throughput. Rejected clients wait for Retry-After before trying again, as a
+well-behaved client would. --compare repeats the run with admission control
+off.
+
+Usage (from the VD directory):
+    python -m benchmarks.overload_benchmark --upload-clients 80 --question-clients 10 --compare
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from collections import Counter
+from typing import Dict, List
+
+os.environ.setdefault("GROQ_API_KEY", "benchmark-key")
+for _name in ("UPLOAD_DIR", "OUTPUT_DIR", "CACHE_DIR"):
+    os.environ.setdefault(_name, tempfile.mkdtemp(prefix=f"bench_{_name.lower()}_"))
+
+import httpx
+
+from app import main
+from app.services.concurrency import DEFAULT_STAGE_LIMITS, StageExecutor
+from benchmarks.fakes import FakeQAService, FakeTranscriptionService, FakeTTSService, LatencyModel
+
+
+class OverloadTranscriptionService(FakeTranscriptionService):
+    """
+    Slow transcription for uploads, fast for question clips
+    """
+
+    def __init__(self, upload_latency: LatencyModel, question_latency: LatencyModel):
+        super().__init__(upload_latency, transcript="A long recording about the quarterly budget review.")
+        self.question_latency = question_latency
+
+    def transcribe_file(self, audio_file, filename: str, audio_sha256: str = None) -> str:
+        if filename.startswith("question"):
+            audio_file.read()
+            self.question_latency.sleep()
+            return "What was the budget?"
+        return super().transcribe_file(audio_file, filename, audio_sha256)
+
+
+async def setup_app(args, admission: bool):
+    main.ANSWER_CACHE_ITEMS = 0
+    await main.startup_event()
+    if not admission:
+        main.admission_controller = None
+    main.stage_executor = StageExecutor({**DEFAULT_STAGE_LIMITS, "stt": args.stt_concurrency})
+    main.transcription_service = OverloadTranscriptionService(
+        LatencyModel(args.upload_stt, jitter=args.upload_stt / 4), LatencyModel(args.question_stt)
+    )
+    main.qa_service = FakeQAService(LatencyModel(args.llm_latency))
+    main.tts_service = FakeTTSService(LatencyModel(args.tts_latency), output_dir=tempfile.mkdtemp(prefix="bench_outputs_"))
+
+
+async def send(client: httpx.AsyncClient, request, statuses: Counter, deadline: float) -> httpx.Response:
+    response = await request()
+    statuses[response.status_code] += 1
+    if response.status_code in (429, 503):
+        retry_after = float(response.headers.get("retry-after", "1"))
+        await asyncio.sleep(max(0.0, min(retry_after, deadline - time.perf_counter())))
+    return response
+
+
+async def upload_loop(client, audio: bytes, statuses: Counter, deadline: float, done: List[int]):
+    async def request():
+        files = {"file": ("upload.mp3", audio, "audio/mpeg")}
+        return await client.post("/upload-audio/", files=files, params={"index": "false"})
+
+    while time.perf_counter() < deadline:
+        if (await send(client, request, statuses, deadline)).status_code == 200:
+            done.append(1)
+
+
+async def question_loop(client, session_id: str, statuses: Counter, deadline: float, latencies: List[float]):
+    async def request():
+        files = {"file": ("question.wav", b"RIFF0000WAVE", "audio/wav")}
+        return await client.post("/ask-question/", params={"session_id": session_id}, files=files)
+
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        if (await send(client, request, statuses, deadline)).status_code == 200:
+            latencies.append(time.perf_counter() - start)
+
+
+def percentile(values: List[float], q: float) -> float:
+    return values[min(len(values) - 1, int(q * len(values)))] if values else float("nan")
+
+
+async def run_pass(args, admission: bool, audio: bytes) -> Dict:
+    await setup_app(args, admission)
+    try:
+        sessions = [f"overload-{i}" for i in range(args.question_clients)]
+        for session_id in sessions:
+            main.session_store.add_transcript(session_id, "The quarterly budget was two million dollars.")
+
+        upload_statuses, question_statuses = Counter(), Counter()
+        latencies: List[float] = []
+        uploads_done: List[int] = []
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            deadline = time.perf_counter() + args.duration
+            await asyncio.gather(
+                *(upload_loop(client, audio, upload_statuses, deadline, uploads_done)
+                  for _ in range(args.upload_clients)),
+                *(question_loop(client, session_id, question_statuses, deadline, latencies)
+                  for session_id in sessions),
+            )
+    finally:
+        await main.shutdown_event()
+
+    latencies.sort()
+    return {
+        "admission": admission,
+        "questions": len(latencies),
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "uploads_per_s": len(uploads_done) / args.duration,
+        "upload_statuses": dict(upload_statuses),
+        "question_statuses": dict(question_statuses),
+    }
+
+
+async def main_async(args):
+    with open(args.upload, "rb") as f:
+        audio = f.read()
+    passes = [True, False] if args.compare else [True]
+    print(f"{'admission':>9} {'questions':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'uploads/s':>9}  statuses")
+    for admission in passes:
+        r = await run_pass(args, admission, audio)
+        print(f"{'on' if admission else 'off':>9} {r['questions']:>9} {r['p50_ms']:>8.0f} {r['p95_ms']:>8.0f} "
+              f"{r['p99_ms']:>8.0f} {r['uploads_per_s']:>9.1f}  "
+              f"upload {r['upload_statuses']} question {r['question_statuses']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--upload-clients", type=int, default=80)
+    parser.add_argument("--question-clients", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=20, help="seconds per pass")
+    parser.add_argument("--upload", default=os.path.join("test_audio", "test_1_simple.mp3"), help="file to upload")
+    parser.add_argument("--stt-concurrency", type=int, default=16, help="STT stage slots")
+    parser.add_argument("--upload-stt", type=float, default=2.0, help="fake STT latency per upload")
+    parser.add_argument("--question-stt", type=float, default=0.3, help="fake STT latency per question")
+    parser.add_argument("--llm-latency", type=float, default=0.4)
+    parser.add_argument("--tts-latency", type=float, default=0.2)
+    parser.add_argument("--compare", action="store_true", help="also run with admission control off")
+    asyncio.run(main_async(parser.parse_args()))
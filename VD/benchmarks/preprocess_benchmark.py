@@ -0,0 +1,108 @@
+"""
+Bytes sent to STT and end-to-end upload latency with and without local preprocessing.
+
+Runs AudioPreprocessor over the test_audio files and synthetic 48 kHz stereo
+WAVs (speech-like bursts with silence at both ends). Upload time is modelled
+from the uplink bandwidth. With --transcribe, the original and processed audio
+are both sent to the configured STT engine (needs GROQ_API_KEY for Groq) and
+the word error rate between the two transcripts is reported.
+
+Usage (from the VD directory):
+    python -m benchmarks.preprocess_benchmark --minutes 1 10 --format flac
+"""
+import argparse
+import glob
+import io
+import os
+import time
+import wave
+
+import numpy as np
+
+from app.services.preprocess import OUTPUT_FORMATS, AudioPreprocessor
+
+
+def synthetic_wav(minutes: float, rate: int = 48000, seed: int = 0) -> bytes:
+    """
+    Stereo 16-bit WAV of harmonic bursts separated by short pauses, with
+    three seconds of low noise before and after
+    """
+    rng = np.random.default_rng(seed)
+    total = int(minutes * 60 * rate)
+    silence = 3 * rate
+    signal = rng.normal(0, 0.002, total + 2 * silence).astype(np.float32)
+
+    t = np.arange(total, dtype=np.float32) / rate
+    pitch = 120 + 40 * np.sin(2 * np.pi * 0.3 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / rate
+    voice = sum(np.sin(k * phase) / k for k in range(1, 6))
+    # Syllable-rate envelope with a pause of ~0.4 s every couple of seconds
+    envelope = np.clip(np.sin(2 * np.pi * 4 * t), 0, None) * (np.sin(2 * np.pi * 0.45 * t) > -0.6)
+    signal[silence:silence + total] += 0.2 * voice * envelope
+
+    pcm = (np.clip(signal, -1, 1) * 32767).astype(np.int16)
+    stereo = np.repeat(pcm[:, None], 2, axis=1)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as out:
+        out.setnchannels(2)
+        out.setsampwidth(2)
+        out.setframerate(rate)
+        out.writeframes(stereo.tobytes())
+    return buffer.getvalue()
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    ref, hyp = reference.lower().split(), hypothesis.lower().split()
+    distances = np.arange(len(hyp) + 1)
+    for i, word in enumerate(ref, 1):
+        previous, distances = distances, np.empty_like(distances)
+        distances[0] = i
+        for j, other in enumerate(hyp, 1):
+            distances[j] = min(previous[j] + 1, distances[j - 1] + 1, previous[j - 1] + (word != other))
+    return distances[-1] / max(1, len(ref))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, nargs="+", default=[1, 10], help="synthetic WAV lengths")
+    parser.add_argument("--format", choices=list(OUTPUT_FORMATS), default="flac")
+    parser.add_argument("--uplink-mbps", type=float, default=10.0, help="modelled upload bandwidth")
+    parser.add_argument("--transcribe", action="store_true", help="compare transcripts from the real STT engine")
+    args = parser.parse_args()
+
+    preprocessor = AudioPreprocessor(args.format)
+    cases = [(os.path.basename(path), open(path, "rb").read()) for path in sorted(glob.glob("test_audio/*"))]
+    cases += [(f"synthetic_{m:g}min.wav", synthetic_wav(m)) for m in args.minutes]
+
+    engine = None
+    if args.transcribe:
+        from app.services.engines import create_stt_engine
+        engine = create_stt_engine(os.getenv("STT_ENGINE", "groq"), os.getenv("GROQ_API_KEY"))
+
+    bytes_per_s = args.uplink_mbps * 1e6 / 8
+    print(f"{'file':<24} {'original':>11} {'processed':>11} {'saved':>7} "
+          f"{'prep ms':>8} {'upload ms':>10} {'new total ms':>13} {'WER':>6}")
+    for name, data in cases:
+        start = time.perf_counter()
+        try:
+            processed = preprocessor.process(io.BytesIO(data), name)
+        except Exception as e:
+            print(f"{name:<24} skipped: {e}")
+            continue
+        prep_ms = (time.perf_counter() - start) * 1000
+        audio, processed_name = processed or (data, name)
+
+        wer = ""
+        if engine is not None:
+            before = engine.transcribe(data, name, "en")["text"]
+            after = engine.transcribe(audio, processed_name, "en")["text"]
+            wer = f"{word_error_rate(before, after):.3f}"
+
+        print(
+            f"{name:<24} {len(data):>11,} {len(audio):>11,} {1 - len(audio) / len(data):>7.1%} {prep_ms:>8.1f} "
+            f"{len(data) / bytes_per_s * 1000:>10.0f} {prep_ms + len(audio) / bytes_per_s * 1000:>13.0f} {wer:>6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
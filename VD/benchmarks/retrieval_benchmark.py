@@ -0,0 +1,119 @@
+"""
+Compare prompt size and LLM latency for full-transcript prompts versus top-k
+retrieval over an indexed transcript.
+
+Uses the generate_test_audio.py scripts as short transcripts plus a synthetic
+multi-hour meeting transcript with known facts planted at random positions.
+LLM latency is modelled as a fixed overhead plus a per-prompt-token prefill cost.
+
+Usage (from the VD directory):
+    python -m benchmarks.retrieval_benchmark --hours 3 --embeddings
+"""
+import argparse
+import random
+import time
+
+from app.services.qa_service import QAService
+from app.services.retrieval import TranscriptIndex
+from generate_test_audio import test_scripts
+
+
+FILLER_SUBJECTS = ["the roadmap", "the budget", "hiring", "the vendor contract", "customer feedback",
+                   "the migration", "onboarding", "the design review", "support tickets", "the offsite"]
+FILLER_VERBS = ["needs more discussion", "is on track", "slipped by a week", "was approved",
+                "depends on legal", "will be revisited", "came up again", "looks promising"]
+
+FACTS = [
+    ("The warehouse in Denver will close on March fourth.", "When will the Denver warehouse close?", "march"),
+    ("Priya was promoted to head of design.", "Who was promoted to head of design?", "priya"),
+    ("The new pricing tier costs forty nine dollars a month.", "How much does the new pricing tier cost?", "forty"),
+    ("Our biggest customer renewed for three more years.", "How long did the biggest customer renew for?", "three"),
+    ("The server outage was caused by an expired certificate.", "What caused the server outage?", "certificate"),
+]
+
+
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for English text
+    return max(1, len(text) // 4)
+
+
+def synthetic_transcript(hours: float, seed: int = 0):
+    rng = random.Random(seed)
+    n_sentences = int(hours * 60 * 150 / 8)  # ~150 spoken words per minute, ~8 words per sentence
+    sentences = [
+        f"{rng.choice(['Next', 'Also', 'Then', 'Okay'])}, {rng.choice(FILLER_SUBJECTS)} "
+        f"{rng.choice(FILLER_VERBS)}."
+        for _ in range(n_sentences)
+    ]
+    for fact, _, _ in FACTS:
+        sentences.insert(rng.randrange(len(sentences)), fact)
+    return " ".join(sentences)
+
+
+class PromptRecorder(QAService):
+    """
+    QAService that builds real prompts but simulates the LLM call
+    """
+
+    def __init__(self, top_k: int, overhead_s: float, per_token_s: float):
+        self.top_k = top_k
+        self.overhead_s = overhead_s
+        self.per_token_s = per_token_s
+
+    def simulate(self, question: str, audio_context: str, index):
+        prompt = "\n".join(m["content"] for m in self._build_messages(question, audio_context, index))
+        tokens = estimate_tokens(prompt)
+        return prompt, tokens, self.overhead_s + tokens * self.per_token_s
+
+
+def run_case(name, transcript, questions, args):
+    qa = PromptRecorder(args.top_k, args.overhead, args.per_token)
+
+    start = time.perf_counter()
+    index = TranscriptIndex.from_transcript(transcript, use_embeddings=args.embeddings)
+    index_ms = (time.perf_counter() - start) * 1000
+
+    rows = []
+    for mode, idx in (("full", None), ("retrieval", index)):
+        tokens, latency, search_ms, found = 0, 0.0, 0.0, 0
+        for question, expected in questions:
+            start = time.perf_counter()
+            prompt, n_tokens, simulated = qa.simulate(question, transcript, idx)
+            search_ms += (time.perf_counter() - start) * 1000
+            tokens += n_tokens
+            latency += simulated
+            found += expected in prompt.lower()
+        n = len(questions)
+        rows.append((name, mode, tokens / n, latency / n * 1000, search_ms / n, f"{found}/{n}"))
+
+    print(f"{name}: {len(transcript.split())} words, {len(index)} passages, index built in {index_ms:.1f} ms")
+    for row in rows:
+        print(f"  {row[1]:<10} prompt tokens {row[2]:>9.0f}  est. LLM latency {row[3]:>8.0f} ms  "
+              f"prompt build {row[4]:>7.2f} ms  answer in context {row[5]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=float, default=3.0, help="length of the synthetic transcript")
+    parser.add_argument("--top-k", type=int, default=4)
+    parser.add_argument("--embeddings", action="store_true", help="fuse hashed-embedding scores with BM25")
+    parser.add_argument("--overhead", type=float, default=0.2, help="fixed LLM latency in seconds")
+    parser.add_argument("--per-token", type=float, default=0.0002, help="prefill seconds per prompt token")
+    args = parser.parse_args()
+
+    short_questions = {
+        "test_1_simple.mp3": [("What is the person's name?", "alex")],
+        "test_2_story.mp3": [("What was the girl's name?", "emma")],
+        "test_3_facts.mp3": [("How far is the sun from Earth?", "93 million")],
+        "test_4_recipe.mp3": [("What temperature should I preheat the oven?", "350")],
+        "test_5_meeting.mp3": [("How much did sales exceed targets?", "15 percent")],
+    }
+    for name, text in test_scripts.items():
+        run_case(name, " ".join(text.split()), short_questions[name], args)
+
+    transcript = synthetic_transcript(args.hours)
+    run_case(f"synthetic_{args.hours:g}h", transcript, [(q, a) for _, q, a in FACTS], args)
+
+
+if __name__ == "__main__":
+    main()
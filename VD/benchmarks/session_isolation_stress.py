@@ -0,0 +1,110 @@
+"""
+Concurrency stress check: answers must never cross sessions.
+
+Creates many sessions, each with a transcript carrying a unique marker, then
+fires interleaved questions from all sessions at /ask-question/ and
+/ask-question-stream/ at once. The real QAService builds each prompt; a fake
+LLM with random latency answers with whatever marker it finds in the prompt.
+Any answer carrying another session's marker is a leak. Exits non-zero on failure.
+
+Usage (from the VD directory):
+    python -m benchmarks.session_isolation_stress --sessions 50 --questions 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault("GROQ_API_KEY", "benchmark-key")
+os.environ.setdefault("UPLOAD_DIR", tempfile.mkdtemp(prefix="bench_uploads_"))
+
+import httpx
+
+from app import main
+from benchmarks.fakes import FakeTranscriptionService, FakeTTSService, LatencyModel
+
+
+MARKER = re.compile(r"SESSION-MARKER-(\w+)")
+
+
+class EchoCompletions:
+    """
+    Stand-in for client.chat.completions: sleeps a random time, then answers
+    with the session marker found in the prompt
+    """
+
+    def __init__(self, max_latency: float, seed: int = 0):
+        self.max_latency = max_latency
+        self.random = random.Random(seed)
+
+    def create(self, messages, stream=False, **kwargs):
+        marker = MARKER.search(messages[-1]["content"]).group(0)
+        time.sleep(self.random.uniform(0, self.max_latency))
+        answer = f"The answer comes from {marker}."
+        if not stream:
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=answer))])
+        return (
+            SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=word + " "))])
+            for word in answer.split()
+        )
+
+
+async def ask(client, session_id, streaming):
+    files = {"file": ("question.wav", b"RIFF0000WAVE", "audio/wav")}
+    params = {"session_id": session_id}
+    if streaming:
+        params["response_format"] = "ndjson"
+        response = await client.post("/ask-question-stream/", params=params, files=files)
+        response.raise_for_status()
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        return " ".join(line["sentence"] for line in lines if "sentence" in line)
+    response = await client.post("/ask-question/", params=params, files=files)
+    response.raise_for_status()
+    return response.json()["answer"]
+
+
+async def run(args) -> int:
+    # Every question is fired at once; admission control would turn most of them away
+    main.ADMISSION_CONTROL = False
+    await main.startup_event()
+    main.transcription_service = FakeTranscriptionService(LatencyModel(0.0), transcript="What happened?")
+    main.qa_service.client.chat.completions = EchoCompletions(args.max_latency)
+    main.tts_service = FakeTTSService(LatencyModel(0.0), output_dir=tempfile.mkdtemp(prefix="bench_outputs_"))
+
+    sessions = [f"s{i}" for i in range(args.sessions)]
+    for session_id in sessions:
+        main.session_store.add_transcript(session_id, f"This recording belongs to SESSION-MARKER-{session_id}.")
+
+    jobs = [(session_id, q % 2 == 1) for session_id in sessions for q in range(args.questions)]
+    random.Random(1).shuffle(jobs)
+
+    leaks = 0
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        start = time.perf_counter()
+        answers = await asyncio.gather(*(ask(client, sid, streaming) for sid, streaming in jobs))
+        elapsed = time.perf_counter() - start
+
+    for (session_id, streaming), answer in zip(jobs, answers):
+        found = MARKER.search(answer)
+        if found is None or found.group(1) != session_id:
+            leaks += 1
+            print(f"LEAK: session {session_id} ({'stream' if streaming else 'ask'}) got: {answer!r}")
+
+    await main.shutdown_event()
+    print(f"{len(jobs)} concurrent questions across {len(sessions)} sessions in {elapsed:.2f}s, {leaks} leaks")
+    return 1 if leaks else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--questions", type=int, default=10, help="questions per session")
+    parser.add_argument("--max-latency", type=float, default=0.05, help="max fake LLM latency in seconds")
+    sys.exit(asyncio.run(run(parser.parse_args())))
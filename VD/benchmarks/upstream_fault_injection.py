@@ -0,0 +1,219 @@
+"""
+Fault-injection harness for the resilient upstream layer.
+
+Starts a local fake Groq server that injects latency, 5xx errors, dropped
+connections and 429 rate limiting, then drives the real QAService (Groq SDK
+included) against it through the resilient UpstreamClient and through a plain
+httpx client with the Groq SDK's default retries (the previous setup). Prints success rate, latency and upstream
+request counts per scenario, and exits non-zero if the resilient client
+misses a scenario's expectation.
+
+Usage (from the VD directory):
+    python -m benchmarks.upstream_fault_injection --calls 200
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+from app.services.qa_service import QAService
+from app.services.upstream import UpstreamClient, deadline
+
+
+class Faults:
+    def __init__(self, latency=0.01, tail_prob=0.0, tail_latency=0.0, error_rate=0.0, drop_rate=0.0,
+                 rate_limit_rps=0.0, outage=False, seed=0):
+        self.latency = latency
+        self.tail_prob = tail_prob
+        self.tail_latency = tail_latency
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.rate_limit_rps = rate_limit_rps
+        self.outage = outage
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.window_start = time.monotonic()
+        self.window_count = 0
+
+    def decide(self):
+        """
+        Return (action, delay) for the next request
+        """
+        with self.lock:
+            self.requests += 1
+            roll = self.random.random()
+            slow = self.random.random() < self.tail_prob
+            if self.rate_limit_rps:
+                now = time.monotonic()
+                if now - self.window_start >= 1.0:
+                    self.window_start, self.window_count = now, 0
+                self.window_count += 1
+                if self.window_count > self.rate_limit_rps:
+                    return "rate_limited", 1.0 - (now - self.window_start)
+        if self.outage:
+            return "error", self.latency
+        if roll < self.drop_rate:
+            return "drop", self.latency
+        if roll < self.drop_rate + self.error_rate:
+            return "error", self.latency
+        return "ok", self.tail_latency if slow else self.latency
+
+
+class QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Hedges open extra connections in bursts; the default backlog of 5 drops SYNs
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address):
+        # Hedged and timed-out requests are closed by the client on purpose
+        pass
+
+
+def make_handler(faults: Faults):
+    class FakeGroq(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, body: bytes, content_type="application/json", headers=None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            action, delay = faults.decide()
+            time.sleep(max(0.0, delay) if action != "rate_limited" else 0)
+            if action == "drop":
+                self.close_connection = True
+                return
+            if action == "rate_limited":
+                reset = f"{max(delay, 0.05):.2f}s"
+                self._send(429, b'{"error": {"message": "Rate limit reached"}}', headers={
+                    "retry-after": f"{max(delay, 0.05):.2f}",
+                    "x-ratelimit-remaining-requests": "0",
+                    "x-ratelimit-reset-requests": reset,
+                })
+                return
+            if action == "error":
+                self._send(503, b'{"error": {"message": "Service unavailable"}}')
+                return
+            if self.path.endswith("/audio/transcriptions"):
+                self._send(200, b"fake transcript", content_type="text/plain")
+                return
+            self._send(200, json.dumps({
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": 0, "model": "fake",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "A fake answer."}}],
+            }).encode("utf-8"))
+
+    return FakeGroq
+
+
+SCENARIOS = {
+    # name: (server faults, client options, call deadline)
+    "healthy": (dict(), dict(), None),
+    "errors_20pct": (dict(error_rate=0.2), dict(max_attempts=4), None),
+    "dropped_10pct": (dict(drop_rate=0.1), dict(max_attempts=4), None),
+    "slow_tail": (dict(tail_prob=0.05, tail_latency=1.5), dict(hedge_after=0.3), None),
+    "rate_limited": (dict(rate_limit_rps=40), dict(max_attempts=6), None),
+    "outage": (dict(outage=True), dict(breaker_failures=5, breaker_reset_seconds=30), None),
+    # Breaker disabled so every call shows the deadline on its own
+    "deadline": (dict(latency=2.0), dict(breaker_failures=10 ** 6), 0.5),
+}
+
+
+def check(name, resilient, sdk, calls):
+    if name == "outage":
+        # The breaker should stop hammering a dead upstream and fail fast with 503
+        return resilient["upstream_requests"] < calls and resilient["statuses"].get(503, 0) > calls // 2
+    if name == "deadline":
+        return resilient["statuses"].get(504, 0) == calls and resilient["p99_ms"] < 1000
+    if name == "slow_tail":
+        return resilient["success"] == calls and resilient["p99_ms"] < sdk["p99_ms"] / 2
+    return resilient["success"] >= calls * 0.98
+
+
+def run_client(http_client, calls, concurrency, call_deadline):
+    qa = QAService("fake-key", http_client=http_client)
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+
+    def one(_):
+        start = time.perf_counter()
+        try:
+            with deadline(call_deadline):
+                qa.answer_question("What happened?", "Some transcript.")
+            status = 200
+        except Exception as e:
+            status = getattr(e, "status_code", 500)
+        with lock:
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(calls)))
+    latencies.sort()
+    return {
+        "success": statuses.get(200, 0),
+        "statuses": statuses,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    args = parser.parse_args()
+
+    failures = 0
+    print(f"{'scenario':<15} {'client':<10} {'ok':>5} {'p50 ms':>8} {'p99 ms':>8} {'upstream':>9}  statuses")
+    for name in args.scenarios:
+        fault_options, client_options, call_deadline = SCENARIOS[name]
+        results = {}
+        for label in ("sdk", "resilient"):
+            faults = Faults(**fault_options)
+            server = QuietServer(("127.0.0.1", 0), make_handler(faults))
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}"
+            options = {"backoff_base": 0.05, "backoff_max": 0.5, **client_options}
+            if label == "resilient":
+                http_client = UpstreamClient(max_connections=args.concurrency, timeout=10, **options)
+            else:
+                http_client = httpx.Client(timeout=10)
+            try:
+                result = run_client(http_client, args.calls, args.concurrency, call_deadline)
+            finally:
+                http_client.close()
+                server.shutdown()
+                server.server_close()
+            result["upstream_requests"] = faults.requests
+            results[label] = result
+            print(f"{name:<15} {label:<10} {result['success']:>5} {result['p50_ms']:>8.0f} "
+                  f"{result['p99_ms']:>8.0f} {result['upstream_requests']:>9}  {result['statuses']}")
+        if not check(name, results["resilient"], results["sdk"], args.calls):
+            failures += 1
+            print(f"  FAIL: resilient client missed the {name} expectation")
+
+    print("all scenarios passed" if not failures else f"{failures} scenario(s) failed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+"""
+Real-time latency harness for the /ws/voice voice session.
+
+Replays recordings into the WebSocket as 20 ms frames of 16 kHz PCM at
+real-time pace, followed by trailing silence, and reports for each utterance
+the time from the end of speech to the question transcript and to the first
+answer audio. These times include the endpointing silence (VOICE_END_SILENCE_MS).
+
+STT, LLM and TTS are stubbed with latency models, STT latency growing with
+the length of each clip, unless --real is given (needs GROQ_API_KEY).
+--compare runs every file a second time with transcription only at the end of
+speech, to show what incremental transcription saves.
+
+Usage (from the VD directory):
+    python -m benchmarks.voice_latency --files test_audio/test_1_simple.mp3 --compare
+"""
+import argparse
+import glob
+import json
+import os
+import queue
+import statistics
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+os.environ.setdefault("GROQ_API_KEY", "benchmark-key")
+os.environ.setdefault("UPLOAD_DIR", tempfile.mkdtemp(prefix="bench_uploads_"))
+
+import numpy as np
+from starlette.testclient import TestClient
+
+from app import main
+from app.services.preprocess import SAMPLE_RATE, decode, resample, to_mono
+from benchmarks.fakes import FakeQAService, FakeTranscriptionService, FakeTTSService, LatencyModel
+
+SESSION_ID = "voice-benchmark"
+FRAME_SECONDS = 0.02
+
+
+def load_pcm(path: str, lead_seconds: float, trail_seconds: float) -> bytes:
+    """
+    Decode to 16 kHz mono 16-bit PCM padded with quiet background noise
+    """
+    with open(path, "rb") as f:
+        samples, rate = decode(f, path)
+    samples = resample(to_mono(samples), rate, SAMPLE_RATE)
+    noise = np.random.default_rng(0).normal(0, 0.001, int((lead_seconds + trail_seconds) * SAMPLE_RATE))
+    lead = int(lead_seconds * SAMPLE_RATE)
+    padded = np.concatenate([noise[:lead], samples, noise[lead:]])
+    return (np.clip(padded, -1, 1) * 32767).astype("<i2").tobytes()
+
+
+def replay(client: TestClient, pcm: bytes, settle_seconds: float) -> List[Dict]:
+    """
+    Stream pcm in real time and return one row per answered utterance
+    """
+    received: "queue.Queue" = queue.Queue()
+
+    with client.websocket_connect(f"/ws/voice?session_id={SESSION_ID}&sample_rate={SAMPLE_RATE}") as ws:
+        def receive():
+            try:
+                while True:
+                    message = ws.receive()
+                    if message["type"] == "websocket.close":
+                        break
+                    received.put((time.perf_counter(), message))
+            except Exception:
+                pass
+
+        receiver = threading.Thread(target=receive, daemon=True)
+        receiver.start()
+
+        frame_bytes = int(FRAME_SECONDS * SAMPLE_RATE) * 2
+        start = time.perf_counter()
+        for n, offset in enumerate(range(0, len(pcm), frame_bytes)):
+            delay = start + n * FRAME_SECONDS - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            ws.send_bytes(pcm[offset:offset + frame_bytes])
+
+        # Wait until the server has been quiet for settle_seconds
+        messages = []
+        while True:
+            try:
+                messages.append(received.get(timeout=settle_seconds))
+            except queue.Empty:
+                break
+        ws.send_json({"type": "close"})
+
+    rows = []
+    for at, message in messages:
+        if message.get("text") is None:
+            if rows and rows[-1]["first_audio_ms"] is None:
+                rows[-1]["first_audio_ms"] = (at - rows[-1]["speech_end_at"]) * 1000
+            continue
+        event = json.loads(message["text"])
+        if event["type"] == "question":
+            speech_end_at = start + event["speech_end"]
+            rows.append({
+                "speech_end_s": event["speech_end"],
+                "speech_end_at": speech_end_at,
+                "question_ms": (at - speech_end_at) * 1000,
+                "first_audio_ms": None,
+            })
+        elif event["type"] == "error":
+            print(f"  error {event['status']}: {event['detail']}")
+    return rows
+
+
+def run_pass(client: TestClient, files: List[str], args) -> List[Dict]:
+    results = []
+    for path in files:
+        pcm = load_pcm(path, args.lead_silence, args.trail_silence)
+        for i, row in enumerate(replay(client, pcm, args.settle)):
+            row.update(file=os.path.basename(path), utterance=i + 1)
+            results.append(row)
+            first_audio = f"{row['first_audio_ms']:.0f}" if row["first_audio_ms"] is not None else "-"
+            print(f"{row['file']:>24} {row['utterance']:>3} {row['speech_end_s']:>9.1f} "
+                  f"{row['question_ms']:>11.0f} {first_audio:>14}")
+    return results
+
+
+def summarize(label: str, results: List[Dict]):
+    latencies = sorted(r["first_audio_ms"] for r in results if r["first_audio_ms"] is not None)
+    if not latencies:
+        print(f"{label}: no answers received")
+        return
+    print(f"{label}: end of speech to first audio over {len(latencies)} utterances: "
+          f"mean {statistics.mean(latencies):.0f} ms, p50 {statistics.median(latencies):.0f} ms, "
+          f"max {latencies[-1]:.0f} ms")
+
+
+def main_cli(args):
+    files = args.files or sorted(glob.glob(os.path.join("test_audio", "*.mp3")))
+    with TestClient(main.app) as client:
+        if not args.real:
+            main.transcription_service = FakeTranscriptionService(
+                LatencyModel(args.stt_latency), transcript="What is this recording about?",
+                seconds_per_audio_second=args.stt_per_second,
+            )
+            main.qa_service = FakeQAService(
+                LatencyModel(args.llm_latency),
+                answer="It is one of the sample recordings. It was generated for testing the voice pipeline.",
+            )
+            main.tts_service = FakeTTSService(
+                LatencyModel(args.tts_latency), output_dir=tempfile.mkdtemp(prefix="bench_outputs_")
+            )
+        main.session_store.add_transcript(SESSION_ID, "Benchmark transcript for the voice session.")
+
+        passes = [("incremental", main.VOICE_CHUNK_SECONDS)]
+        if args.compare:
+            passes.append(("end of speech only", 0))
+        for label, chunk_seconds in passes:
+            main.VOICE_CHUNK_SECONDS = chunk_seconds
+            # Every utterance asks the same question; measure the pipeline, not the answer cache
+            main.answer_cache.max_items = 0
+            print(f"\n{label} transcription")
+            print(f"{'file':>24} {'utt':>3} {'speech_end':>9} {'question_ms':>11} {'first_audio_ms':>14}")
+            summarize(label, run_pass(client, files, args))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", nargs="+", help="recordings to replay (default: test_audio/*.mp3)")
+    parser.add_argument("--compare", action="store_true", help="also run with transcription only at the end")
+    parser.add_argument("--real", action="store_true", help="use the real Groq and gTTS backends")
+    parser.add_argument("--lead-silence", type=float, default=0.5)
+    parser.add_argument("--trail-silence", type=float, default=1.5)
+    parser.add_argument("--settle", type=float, default=3.0, help="seconds without server messages before hanging up")
+    parser.add_argument("--stt-latency", type=float, default=0.3, help="fixed fake STT latency per clip")
+    parser.add_argument("--stt-per-second", type=float, default=0.03, help="fake STT latency per second of audio")
+    parser.add_argument("--llm-latency", type=float, default=0.4)
+    parser.add_argument("--tts-latency", type=float, default=0.2)
+    main_cli(parser.parse_args())
@@ -0,0 +1,306 @@
+"""
+Bulk ingestion of a directory of recordings: preprocess -> transcribe -> index.
+
+Hashing, decoding/re-encoding and passage chunking run in a process pool so
+they scale with cores; transcription runs in a thread pool whose size bounds
+the number of concurrent STT requests. Results go to a compact SQLite corpus
+store (zlib-compressed transcripts and passages, one row per distinct audio
+hash) and every input file is recorded in a manifest, so re-running after an
+interruption only processes files that are new, changed or failed.
+
+Transcripts are also written to the app's transcription cache under the same
+keys the API uses, so uploading an ingested file later skips the STT call.
+
+Usage (from the VD directory):
+    python bulk_ingest.py /data/recordings --processes 8 --api-concurrency 16
+    python bulk_ingest.py test_audio --fixtures fixtures.json
+"""
+import argparse
+import concurrent.futures
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from app.services.cache import TranscriptionCache, sha256_file
+from app.services.corpus_store import CorpusStore
+from app.services.engines import create_stt_engine, create_tts_engine
+from app.services.preprocess import AudioPreprocessor
+from app.services.retrieval import chunk_transcript
+from app.services.transcription import TranscriptionService
+from app.services.tts_service import TTSService
+from app.services.upstream import UpstreamClient
+
+load_dotenv()
+
+# Same settings (and defaults) as the API, so the transcription cache is shared
+CACHE_DIR = os.getenv("CACHE_DIR", "cache")
+CORPUS_STORE_PATH = os.getenv("CORPUS_STORE_PATH", os.path.join(CACHE_DIR, "corpus.db"))
+STT_ENGINE = os.getenv("STT_ENGINE", "groq")
+TTS_ENGINE = os.getenv("TTS_ENGINE", "gtts")
+AUDIO_PREPROCESSING = os.getenv("AUDIO_PREPROCESSING", "true").lower() in ("1", "true", "yes")
+PREPROCESS_FORMAT = os.getenv("PREPROCESS_FORMAT", "flac")
+LONG_AUDIO_THRESHOLD_BYTES = int(os.getenv("LONG_AUDIO_THRESHOLD_BYTES", str(20 * 1024 * 1024)))
+LONG_AUDIO_SEGMENT_SECONDS = float(os.getenv("LONG_AUDIO_SEGMENT_SECONDS", "300"))
+LONG_AUDIO_OVERLAP_SECONDS = float(os.getenv("LONG_AUDIO_OVERLAP_SECONDS", "2"))
+STT_DEADLINE_SECONDS = float(os.getenv("STT_DEADLINE_SECONDS", "300"))
+
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".m4a", ".ogg", ".flac")
+
+
+def find_audio_files(directory: str) -> List[str]:
+    paths = []
+    for root, _, names in os.walk(directory):
+        paths.extend(os.path.join(root, name) for name in names if name.lower().endswith(AUDIO_EXTENSIONS))
+    return sorted(os.path.abspath(path) for path in paths)
+
+
+def prepare_file(path: str, output_format: Optional[str]) -> Dict:
+    """
+    Process-pool step: hash the file, measure its duration and, for files short
+    enough to send in one request, run the preprocessor. prepared is None when
+    the original should be sent as is.
+    """
+    import soundfile as sf
+
+    with open(path, "rb") as f:
+        sha256 = sha256_file(f)
+        try:
+            duration = sf.info(f).duration
+        except Exception:
+            duration = None
+        prepared = None
+        long_audio = os.path.getsize(path) > LONG_AUDIO_THRESHOLD_BYTES
+        if output_format and not long_audio:
+            try:
+                prepared = AudioPreprocessor(output_format).process(f, os.path.basename(path))
+            except Exception:
+                prepared = None
+    return {"sha256": sha256, "duration": duration, "prepared": prepared, "long_audio": long_audio}
+
+
+def transcribe_file(service: TranscriptionService, path: str, prepared: Dict) -> Dict:
+    """
+    Thread-pool step: one STT request (or one segmented job for long recordings)
+    """
+    if prepared["long_audio"]:
+        return service.transcribe_long_audio(
+            path,
+            segment_seconds=LONG_AUDIO_SEGMENT_SECONDS,
+            overlap_seconds=LONG_AUDIO_OVERLAP_SECONDS,
+            parallelism=1,
+            audio_sha256=prepared["sha256"],
+        )
+    with open(path, "rb") as f:
+        text = service.transcribe_file(
+            f, os.path.basename(path), audio_sha256=prepared["sha256"], prepared=prepared["prepared"]
+        )
+    return {"text": text, "segments": None}
+
+
+def synthesize_fixtures(fixtures: Dict[str, str], directory: str, concurrency: int) -> int:
+    """
+    Synthesize the fixture recordings that are missing from directory.
+    Returns the number of files created.
+    """
+    missing = {name: text for name, text in fixtures.items() if not os.path.exists(os.path.join(directory, name))}
+    if not missing:
+        return 0
+    os.makedirs(directory, exist_ok=True)
+    tts = TTSService(output_dir=directory, engine=create_tts_engine(TTS_ENGINE))
+
+    def synthesize(name: str, text: str):
+        path = os.path.join(directory, name)
+        audio = tts.synthesize(text.strip())
+        # Write atomically so an interrupted run never leaves a truncated fixture behind
+        with open(path + ".part", "wb") as f:
+            f.write(audio)
+        os.replace(path + ".part", path)
+
+    with concurrent.futures.ThreadPoolExecutor(concurrency) as pool:
+        futures = {pool.submit(synthesize, name, text): name for name, text in missing.items()}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                future.result()
+                print(f"  synthesized {futures[future]}")
+            except Exception as e:
+                print(f"  failed to synthesize {futures[future]}: {e}")
+    return len(missing)
+
+
+def load_fixtures(source: str) -> Dict[str, str]:
+    """
+    Fixtures from a JSON object (filename -> text) or a directory of .txt files
+    (name.txt -> name.mp3)
+    """
+    if os.path.isdir(source):
+        fixtures = {}
+        for name in sorted(os.listdir(source)):
+            if name.endswith(".txt"):
+                with open(os.path.join(source, name), encoding="utf-8") as f:
+                    fixtures[name[:-4] + ".mp3"] = f.read()
+        return fixtures
+    with open(source, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class BulkIngest:
+    """
+    Drives files through the three stages from the main thread, which is also
+    the only writer to the corpus store. At most max_in_flight files are in
+    the pipeline at once, bounding memory for the preprocessed audio.
+    """
+
+    def __init__(self, store: CorpusStore, service: TranscriptionService, model: str,
+                 process_pool, thread_pool, max_in_flight: int):
+        self.store = store
+        self.service = service
+        self.model = model
+        self.process_pool = process_pool
+        self.thread_pool = thread_pool
+        self.max_in_flight = max_in_flight
+        self.output_format = service.preprocessor.output_format if service.preprocessor else None
+        self.pending: Dict[concurrent.futures.Future, tuple] = {}
+        # Files waiting on an in-flight file with the same content: sha256 -> [item]
+        self.duplicates: Dict[str, List[Dict]] = {}
+        self.counts = {"done": 0, "deduplicated": 0, "failed": 0}
+        self.audio_seconds = 0.0
+
+    def run(self, paths: List[str]):
+        queue = list(reversed(paths))
+        last_report = time.monotonic()
+        while queue or self.pending:
+            while queue and len(self.pending) < self.max_in_flight:
+                path = queue.pop()
+                stat = os.stat(path)
+                item = {"path": path, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+                self._submit(self.process_pool.submit(prepare_file, path, self.output_format), "prepare", item)
+
+            done, _ = concurrent.futures.wait(self.pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                stage, item = self.pending.pop(future)
+                try:
+                    self._advance(stage, item, future.result())
+                except Exception as e:
+                    self._finish(item, error=e)
+
+            if time.monotonic() - last_report >= 10:
+                last_report = time.monotonic()
+                self.report(len(paths) - len(queue) - len(self.pending), len(paths))
+
+    def _submit(self, future, stage: str, item: Dict):
+        self.pending[future] = (stage, item)
+
+    def _advance(self, stage: str, item: Dict, result):
+        if stage == "prepare":
+            item.update(result)
+            sha256 = item["sha256"]
+            if self.store.has_recording(sha256):
+                self._finish(item, deduplicated=True)
+            elif sha256 in self.duplicates:
+                self.duplicates[sha256].append(item)
+            else:
+                self.duplicates[sha256] = []
+                self._submit(self.thread_pool.submit(transcribe_file, self.service, item["path"], item), "transcribe", item)
+        elif stage == "transcribe":
+            # The preprocessed audio is no longer needed once it has been sent
+            item["prepared"] = None
+            item.update(text=result["text"], segments=result.get("segments"))
+            self._submit(self.process_pool.submit(chunk_transcript, item["text"], item["segments"]), "index", item)
+        elif stage == "index":
+            self.store.put_recording(item["sha256"], self.model, item["duration"], item["text"], item["segments"], result)
+            self._finish(item)
+
+    def _finish(self, item: Dict, error: Optional[Exception] = None, deduplicated: bool = False):
+        status = "failed" if error is not None else "done"
+        self.store.mark(item["path"], item["size"], item["mtime_ns"], status,
+                        sha256=item.get("sha256"), error=str(error) if error is not None else None)
+        if error is not None:
+            print(f"  failed {item['path']}: {error}")
+            self.counts["failed"] += 1
+        else:
+            self.counts["deduplicated" if deduplicated else "done"] += 1
+            self.audio_seconds += item.get("duration") or 0
+
+        if not deduplicated and item.get("sha256") in self.duplicates:
+            for duplicate in self.duplicates.pop(item["sha256"]):
+                if error is None:
+                    self._finish(duplicate, deduplicated=True)
+                else:
+                    self._finish(duplicate, error=error)
+
+    def report(self, finished: int, total: int):
+        print(f"  {finished}/{total} files, {self.counts['failed']} failed, "
+              f"{self.audio_seconds / 3600:.2f} h of audio")
+
+
+def main_cli(args):
+    store = CorpusStore(args.store)
+
+    if args.fixtures:
+        created = synthesize_fixtures(load_fixtures(args.fixtures), args.directory, args.api_concurrency)
+        print(f"🎵 Synthesized {created} fixture recordings")
+
+    paths = find_audio_files(args.directory)
+    finished = store.finished()
+    todo = []
+    for path in paths:
+        stat = os.stat(path)
+        if finished.get(path) != (stat.st_size, stat.st_mtime_ns):
+            todo.append(path)
+    print(f"📂 {len(paths)} recordings, {len(paths) - len(todo)} already ingested, {len(todo)} to do")
+    if not todo:
+        return
+
+    http_client = UpstreamClient(max_connections=args.api_concurrency, rate_limit=args.rate_limit)
+    preprocessor = AudioPreprocessor(PREPROCESS_FORMAT) if AUDIO_PREPROCESSING else None
+    service = TranscriptionService(
+        cache=TranscriptionCache(cache_dir=os.path.join(CACHE_DIR, "transcriptions")),
+        engine=create_stt_engine(STT_ENGINE, os.getenv("GROQ_API_KEY"), http_client),
+        preprocessor=preprocessor,
+        deadline_seconds=STT_DEADLINE_SECONDS,
+    )
+    model = service.model + (f":{preprocessor.signature}" if preprocessor else "")
+
+    start = time.perf_counter()
+    process_pool = concurrent.futures.ProcessPoolExecutor(args.processes)
+    thread_pool = concurrent.futures.ThreadPoolExecutor(args.api_concurrency)
+    ingest = BulkIngest(store, service, model, process_pool, thread_pool,
+                        max_in_flight=args.max_in_flight or 2 * (args.processes + args.api_concurrency))
+    try:
+        ingest.run(todo)
+    except KeyboardInterrupt:
+        # Every finished file is already in the manifest; the next run picks up the rest
+        print("\n⏹️  Interrupted, finished files are saved and will be skipped next time")
+    finally:
+        thread_pool.shutdown(wait=False, cancel_futures=True)
+        process_pool.shutdown(wait=False, cancel_futures=True)
+        http_client.close()
+
+    elapsed = time.perf_counter() - start
+    counts = ingest.counts
+    hours = ingest.audio_seconds / 3600
+    print(f"✅ {counts['done']} ingested, {counts['deduplicated']} duplicates, {counts['failed']} failed "
+          f"in {elapsed:.1f} s ({(counts['done'] + counts['deduplicated']) / elapsed:.2f} files/s, "
+          f"{hours * 3600 / elapsed:.1f}x real time)")
+    print(f"📦 Store: {json.dumps(store.stats())}")
+    if counts["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory", help="directory to walk for recordings")
+    parser.add_argument("--store", default=CORPUS_STORE_PATH, help="corpus store database (default: %(default)s)")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1,
+                        help="worker processes for preprocessing and indexing (default: CPU count)")
+    parser.add_argument("--api-concurrency", type=int, default=8, help="concurrent STT/TTS requests")
+    parser.add_argument("--rate-limit", type=float, default=0, help="upstream requests per second (0 = unlimited)")
+    parser.add_argument("--max-in-flight", type=int, default=0,
+                        help="files in the pipeline at once (default: 2 x (processes + api concurrency))")
+    parser.add_argument("--fixtures", help="JSON file (filename -> text) or directory of .txt files "
+                                           "to synthesize into the directory before ingesting")
+    main_cli(parser.parse_args())
@@ -1,6 +1,7 @@
 """
 Simple script to generate test audio files for the Voice Q&A application
 """
+from concurrent.futures import ThreadPoolExecutor
 from gtts import gTTS
 import os
 
@@ -57,22 +58,25 @@ def generate_test_audios():
     
     print("🎵 Generating test audio files...\n")
     
-    for filename, text in test_scripts.items():
-        try:
-            print(f"Creating: {filename}")
-            
-            # Generate speech
-            tts = gTTS(text=text.strip(), lang='en', slow=False)
-            
-            # Save to file
-            filepath = os.path.join(output_dir, filename)
-            tts.save(filepath)
-            
-            print(f"✅ Saved: {filepath}\n")
-            
-        except Exception as e:
-            print(f"❌ Error creating {filename}: {str(e)}\n")
-    
+    def generate(filename, text):
+        # Generate speech
+        tts = gTTS(text=text.strip(), lang='en', slow=False)
+
+        # Save to file
+        filepath = os.path.join(output_dir, filename)
+        tts.save(filepath)
+        return filepath
+
+    # Each file is an independent network round trip, so request them all at once
+    with ThreadPoolExecutor(max_workers=len(test_scripts)) as pool:
+        futures = {filename: pool.submit(generate, filename, text) for filename, text in test_scripts.items()}
+        for filename, future in futures.items():
+            try:
+                print(f"✅ Saved: {future.result()}")
+            except Exception as e:
+                print(f"❌ Error creating {filename}: {str(e)}")
+    print()
+
     print(f"🎉 Done! All test audio files are in the '{output_dir}' folder")
     print("\n📋 Test Audio Files Created:")
     print("  1. test_1_simple.mp3 - Simple introduction")
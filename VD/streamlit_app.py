@@ -1,8 +1,9 @@
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
 from audio_recorder_streamlit import audio_recorder
 import os
-from pathlib import Path
+import time
 
 # Page config
 st.set_page_config(
@@ -13,6 +14,36 @@ st.set_page_config(
 
 # API endpoint
 API_URL = "http://localhost:8000"
+# Seconds to wait for each API call, and for a background transcription job to finish
+API_TIMEOUT = 120
+JOB_TIMEOUT = 1800
+
+
+@st.cache_resource
+def get_http() -> requests.Session:
+    """
+    One pooled HTTP session shared by every rerun and browser session, so
+    requests reuse keep-alive connections to the API
+    """
+    http = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=16)
+    http.mount("http://", adapter)
+    http.mount("https://", adapter)
+    return http
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def fetch_response_audio(filename: str) -> bytes:
+    """
+    Download an answer's MP3 once; response files never change, so later
+    reruns play it from this bounded cache
+    """
+    response = get_http().get(f"{API_URL}/download-response/{filename}", timeout=API_TIMEOUT)
+    response.raise_for_status()
+    return response.content
+
+
+http = get_http()
 
 # Custom CSS
 st.markdown("""
@@ -47,6 +78,8 @@ if 'transcription' not in st.session_state:
     st.session_state.transcription = ""
 if 'qa_history' not in st.session_state:
     st.session_state.qa_history = []
+if 'api_session_id' not in st.session_state:
+    st.session_state.api_session_id = None
 
 # Header
 st.markdown('<div class="main-header">🎙️ Voice Audio Q&A Assistant</div>', unsafe_allow_html=True)
@@ -70,15 +103,44 @@ with col1:
         if st.button("🚀 Process Audio", type="primary", use_container_width=True):
             with st.spinner("Transcribing audio..."):
                 try:
-                    # Send file to API
+                    # Send file to API as a background job so long files don't hit request timeouts
                     files = {"file": (uploaded_file.name, uploaded_file.getvalue(), uploaded_file.type)}
-                    response = requests.post(f"{API_URL}/upload-audio/", files=files)
+                    # Each processed file starts a fresh server-side session
+                    response = http.post(
+                        f"{API_URL}/upload-audio/", params={"background": "true", "priority": 1}, files=files,
+                        timeout=API_TIMEOUT
+                    )
                     
-                    if response.status_code == 200:
-                        data = response.json()
-                        st.session_state.audio_uploaded = True
-                        st.session_state.transcription = data['transcription']
-                        st.success("✅ Audio processed successfully!")
+                    if response.status_code == 202:
+                        job_id = response.json()['job_id']
+                        progress = st.progress(0.0, text="Queued...")
+                        job = None
+                        deadline = time.monotonic() + JOB_TIMEOUT
+                        while time.monotonic() < deadline:
+                            job_response = http.get(f"{API_URL}/jobs/{job_id}", timeout=API_TIMEOUT)
+                            if job_response.status_code != 200:
+                                # Evicted, or the server restarted without the job
+                                job = None
+                                break
+                            job = job_response.json()
+                            if job['status'] in ("succeeded", "failed", "cancelled"):
+                                break
+                            progress.progress(job['progress'], text=job['status'].capitalize() + "...")
+                            time.sleep(1)
+                        progress.empty()
+                        
+                        if job is None:
+                            st.error("Error: the server no longer knows this transcription job, please try again")
+                        elif job['status'] == "succeeded":
+                            data = job['result']
+                            st.session_state.audio_uploaded = True
+                            st.session_state.transcription = data['transcription']
+                            st.session_state.api_session_id = data['session_id']
+                            st.success("✅ Audio processed successfully!")
+                        elif job['status'] in ("failed", "cancelled"):
+                            st.error(f"Error: {job['error'] or 'Transcription was cancelled'}")
+                        else:
+                            st.error(f"Error: transcription didn't finish within {JOB_TIMEOUT // 60} minutes")
                     else:
                         st.error(f"Error: {response.json()['detail']}")
                 except Exception as e:
@@ -121,15 +183,14 @@ with col2:
             if st.button("🤔 Get Answer", type="primary", use_container_width=True):
                 with st.spinner("Processing your question..."):
                     try:
-                        # Save audio bytes to file
-                        temp_file = "temp_question.wav"
-                        with open(temp_file, "wb") as f:
-                            f.write(audio_bytes)
-                        
-                        # Send to API
-                        with open(temp_file, "rb") as f:
-                            files = {"file": (temp_file, f, "audio/wav")}
-                            response = requests.post(f"{API_URL}/ask-question/", files=files)
+                        # Send the recording straight from memory
+                        files = {"file": ("question.wav", audio_bytes, "audio/wav")}
+                        response = http.post(
+                            f"{API_URL}/ask-question/",
+                            params={"session_id": st.session_state.api_session_id},
+                            files=files,
+                            timeout=API_TIMEOUT
+                        )
                         
                         if response.status_code == 200:
                             data = response.json()
@@ -141,9 +202,6 @@ with col2:
                                 'audio_file': data['audio_file']
                             })
                             
-                            # Clean up temp file
-                            os.remove(temp_file)
-                            
                             st.success("✅ Answer ready!")
                         else:
                             st.error(f"Error: {response.json()['detail']}")
@@ -156,18 +214,18 @@ if st.session_state.qa_history:
     st.header("💬 Q&A History")
     
     for i, qa in enumerate(reversed(st.session_state.qa_history)):
-        with st.expander(f"Q{len(st.session_state.qa_history) - i}: {qa['question'][:100]}..."):
+        number = len(st.session_state.qa_history) - i
+        with st.expander(f"Q{number}: {qa['question'][:100]}..."):
             st.markdown(f"**Question:** {qa['question']}")
             st.markdown(f"**Answer:** {qa['answer']}")
             
-            # Play response audio
+            # Response audio is only downloaded once asked for, then served from the cache
             filename = os.path.basename(qa['audio_file'])
-            try:
-                audio_response = requests.get(f"{API_URL}/download-response/{filename}")
-                if audio_response.status_code == 200:
-                    st.audio(audio_response.content, format="audio/mp3")
-            except:
-                st.warning("Audio response not available")
+            if st.toggle("🔊 Play response", key=f"play_{number}"):
+                try:
+                    st.audio(fetch_response_audio(filename), format="audio/mp3")
+                except requests.RequestException:
+                    st.warning("Audio response not available")
 
 # Sidebar
 with st.sidebar: